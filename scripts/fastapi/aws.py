@@ -4,20 +4,41 @@ AWS DynamoDB operations for YeetCode
 
 import os
 import time
-import boto3
-from datetime import datetime, timezone
-from typing import Dict, Optional, List, Any
-from botocore.exceptions import ClientError
+import asyncio
+import functools
+import queue
+import threading
+from collections import OrderedDict
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Optional, List, Any, Callable, Iterable, Iterator, Sequence, Tuple, Union
+from botocore.exceptions import BotoCoreError, ClientError
 from dotenv import load_dotenv
 from logger import debug, info, warning, error, duel_action, duel_check, submission_check
+from dynamodb_codec import deserialize_item, serialize_value
+from dynamodb_client import ClientMetrics, create_dynamodb_client, warm_connections
+from xp_accumulator import XPAccumulator
+from leaderboard import leaderboard, LEADERBOARD_ATTRIBUTES
 
 # Load environment variables
 load_dotenv()
 
-# Initialize DynamoDB
+# Bounded pool for blocking boto3 calls made from async route handlers
+DDB_MAX_CONCURRENCY = int(os.getenv("DDB_MAX_CONCURRENCY", "16"))
+
+# Parallel scan segments used for full-table reads
+DDB_SCAN_SEGMENTS = int(os.getenv("DDB_SCAN_SEGMENTS", "4"))
+DDB_SCAN_WORKERS = DDB_SCAN_SEGMENTS * 4
+
+# Initialize DynamoDB - one pooled connection per thread that can call it
+# (request executor, scan segment workers and the background refresh thread)
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
-dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
-ddb = boto3.client('dynamodb', region_name=AWS_REGION)
+DDB_MAX_POOL_CONNECTIONS = int(os.getenv("DDB_MAX_POOL_CONNECTIONS", str(DDB_MAX_CONCURRENCY + DDB_SCAN_WORKERS + 2)))
+DDB_WARM_CONNECTIONS = int(os.getenv("DDB_WARM_CONNECTIONS", str(min(DDB_MAX_CONCURRENCY, DDB_MAX_POOL_CONNECTIONS))))
+ddb_metrics = ClientMetrics(DDB_MAX_POOL_CONNECTIONS)
+ddb = create_dynamodb_client(AWS_REGION, DDB_MAX_POOL_CONNECTIONS, ddb_metrics)
 
 # DynamoDB Table Names
 USERS_TABLE = os.getenv("USERS_TABLE")
@@ -25,52 +46,319 @@ DAILY_TABLE = os.getenv("DAILY_TABLE")
 DUELS_TABLE = os.getenv("DUELS_TABLE")
 BOUNTIES_TABLE = os.getenv("BOUNTIES_TABLE")
 GROUPS_TABLE = os.getenv("GROUPS_TABLE")
+VERIFICATION_TABLE = os.getenv("VERIFICATION_TABLE")  # Keyed by email, native TTL on expires_at
+
+# Global secondary indexes
+GROUP_ID_INDEX = 'group_id-index'
+EMAIL_INDEX = 'email-index'
+# Errors meaning the email index doesn't exist yet or is still backfilling
+EMAIL_INDEX_UNAVAILABLE_ERRORS = ('ResourceNotFoundException', 'ValidationException')
+# Sparse index over unfinished duels: openStatus/openSince are removed when a duel completes
+DUEL_STATUS_INDEX = 'status-index'
+# Per-participant duel history, sorted by createdAt
+CHALLENGER_INDEX = 'challenger-index'
+CHALLENGEE_INDEX = 'challengee-index'
 
 DEBUG_MODE = os.getenv("DEBUG_MODE", "false").lower() == "true"
 
+# TransactWriteItems accepts at most 100 actions per call
+MAX_TRANSACTION_ACTIONS = 100
+
+# Settlement transactions cancelled by a conflicting write or throttling are retried this many times
+MAX_SETTLEMENT_ATTEMPTS = 5
+RETRYABLE_CANCELLATION_REASONS = ('TransactionConflict', 'ThrottlingError', 'ProvisionedThroughputExceeded', 'RequestLimitExceeded')
+RETRYABLE_TRANSACTION_ERRORS = ('TransactionConflictException', 'TransactionInProgressException', 'ThrottlingException',
+                                'ProvisionedThroughputExceededException', 'RequestLimitExceeded')
+
+# BatchGetItem accepts at most 100 keys per call
+MAX_BATCH_GET_KEYS = 100
+MAX_BATCH_GET_ATTEMPTS = 8
+
+# The in-process leaderboard is re-seeded from a users scan this often to pick up external writes
+LEADERBOARD_RECONCILE_SECONDS = int(os.getenv("LEADERBOARD_RECONCILE_SECONDS", "300"))
+
+# Participants of recently seen duels, so starts and submissions can skip a read
+DUEL_ROLE_MEMO_SIZE = 10000
+
+# Verification codes expire 10 minutes after they are issued
+VERIFICATION_CODE_TTL = 10 * 60
+
+# Optimistic streak updates retry when a concurrent completion wins the race
+MAX_STREAK_UPDATE_ATTEMPTS = 3
+
+# Daily problems are keyed by date, so recent ones are found by key lookups over day windows
+DAILY_LOOKUP_WINDOW_DAYS = int(os.getenv("DAILY_LOOKUP_WINDOW_DAYS", "7"))
+DAILY_MAX_LOOKBACK_DAYS = int(os.getenv("DAILY_MAX_LOOKBACK_DAYS", "60"))
+# Dates older than the lookback come from a keys-only scan, reused (even when empty) for this long
+DAILY_OLDER_DATES_TTL_SECONDS = int(os.getenv("DAILY_OLDER_DATES_TTL_SECONDS", "3600"))
+
+# A projected attribute is a top-level name or a tuple path into nested maps, e.g. ('users', 'alice')
+AttributePath = Union[str, Tuple[str, ...]]
+
+# Attributes each hot read path actually uses
+GROUP_STATS_ATTRIBUTES = ['username', 'display_name', 'easy', 'medium', 'hard', 'today', 'xp']
+STREAK_ATTRIBUTES = ['current_streak', 'longest_streak', 'last_completed_date']
+DUEL_TIMEOUT_ATTRIBUTES = ['duelId', 'challenger', 'challengee', 'startTime', 'challengerTime', 'challengeeTime']
 
-def normalize_dynamodb_item(item: Dict) -> Dict:
-    """Normalize DynamoDB data structure to regular Python dict"""
-    normalized = {}
-    for key, value in item.items():
-        if isinstance(value, dict):
-            if 'S' in value:
-                normalized[key] = value['S']
-            elif 'N' in value:
-                normalized[key] = int(float(value['N']))
-            elif 'BOOL' in value:
-                normalized[key] = value['BOOL']
-            elif 'M' in value:
-                normalized[key] = normalize_dynamodb_item(value['M'])
-            elif 'L' in value:
-                # Handle DynamoDB List
-                normalized[key] = [normalize_dynamodb_item(item) if isinstance(item, dict) else item for item in value['L']]
-            elif 'SS' in value:
-                normalized[key] = value['SS']
+db_executor = ThreadPoolExecutor(max_workers=DDB_MAX_CONCURRENCY, thread_name_prefix="ddb")
+
+
+async def run_db(func, *args, **kwargs):
+    """Run a blocking DynamoDB call on the bounded executor without stalling the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(func, *args, **kwargs))
+
+
+# Segment workers get their own pool so a scan issued from db_executor can never wait on its own threads
+scan_executor = ThreadPoolExecutor(max_workers=DDB_SCAN_WORKERS, thread_name_prefix="ddb-scan")
+
+_SEGMENT_DONE = object()
+
+
+def _scan_segment(params: Dict, segment: Optional[int] = None, total_segments: Optional[int] = None) -> Iterator[Dict]:
+    """Yield every scan page of one segment, following LastEvaluatedKey"""
+    params = dict(params)
+    if total_segments:
+        params['Segment'] = segment
+        params['TotalSegments'] = total_segments
+    
+    while True:
+        response = ddb.scan(**params)
+        yield response
+        
+        last_evaluated_key = response.get('LastEvaluatedKey')
+        if not last_evaluated_key:
+            return
+        params['ExclusiveStartKey'] = last_evaluated_key
+
+
+def projection_params(attributes: Optional[Sequence[AttributePath]], params: Optional[Dict] = None) -> Dict:
+    """Return request params with a ProjectionExpression for the given attributes merged in"""
+    params = dict(params or {})
+    if not attributes:
+        return params
+    
+    # Alias every path segment so reserved words (date, status, users, ...) are always safe
+    names = dict(params.get('ExpressionAttributeNames', {}))
+    aliases = {name: alias for alias, name in names.items()}
+    
+    def alias_for(name: str) -> str:
+        if name not in aliases:
+            alias = f"#p{len(aliases)}"
+            while alias in names:
+                alias += "_"
+            aliases[name] = alias
+            names[alias] = name
+        return aliases[name]
+    
+    paths = []
+    for attribute in attributes:
+        segments = (attribute,) if isinstance(attribute, str) else attribute
+        paths.append('.'.join(alias_for(segment) for segment in segments))
+    
+    params['ProjectionExpression'] = ', '.join(paths)
+    params['ExpressionAttributeNames'] = names
+    return params
+
+
+def scan_pages(table_name: str, segments: int = 1, attributes: Optional[Sequence[AttributePath]] = None, **scan_params) -> Iterator[Dict]:
+    """Yield complete scan pages for a table, fanning out over parallel segments when segments > 1"""
+    params = projection_params(attributes, {'TableName': table_name, **scan_params})
+    
+    if segments <= 1:
+        yield from _scan_segment(params)
+        return
+    
+    pages: queue.Queue = queue.Queue(maxsize=segments * 2)
+    stop = threading.Event()
+    
+    def put(value) -> bool:
+        # Back off while the consumer is slow, but give up once it has gone away
+        while not stop.is_set():
+            try:
+                pages.put(value, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def run_segment(segment: int) -> None:
+        try:
+            for page in _scan_segment(params, segment, segments):
+                if not put(page):
+                    return
+        except Exception as scan_error:
+            put(scan_error)
+        finally:
+            put(_SEGMENT_DONE)
+    
+    for segment in range(segments):
+        scan_executor.submit(run_segment, segment)
+    
+    try:
+        remaining = segments
+        while remaining:
+            page = pages.get()
+            if page is _SEGMENT_DONE:
+                remaining -= 1
+            elif isinstance(page, Exception):
+                raise page
             else:
-                normalized[key] = value
-        else:
-            normalized[key] = value
-    return normalized
+                yield page
+    finally:
+        stop.set()
+
+
+def scan_items(table_name: str, segments: int = 1, attributes: Optional[Sequence[AttributePath]] = None, **scan_params) -> Iterator[Dict]:
+    """Stream every raw item matching a scan, across all pages and segments"""
+    for page in scan_pages(table_name, segments, attributes, **scan_params):
+        yield from page.get('Items', [])
+
+
+def scan_all(table_name: str, segments: int = 1, attributes: Optional[Sequence[AttributePath]] = None, **scan_params) -> List[Dict]:
+    """Return every raw item matching a scan"""
+    return list(scan_items(table_name, segments, attributes, **scan_params))
+
+
+def scan_count(table_name: str, segments: int = 1, **scan_params) -> int:
+    """Count matching items across all pages (a filtered COUNT scan is paginated too)"""
+    return sum(page.get('Count', 0) for page in scan_pages(table_name, segments, Select='COUNT', **scan_params))
+
+
+def query_items(table_name: str, attributes: Optional[Sequence[AttributePath]] = None, **query_params) -> Iterator[Dict]:
+    """Stream every raw item matching a query, following LastEvaluatedKey"""
+    params = projection_params(attributes, {'TableName': table_name, **query_params})
+    while True:
+        response = ddb.query(**params)
+        yield from response.get('Items', [])
+        
+        last_evaluated_key = response.get('LastEvaluatedKey')
+        if not last_evaluated_key:
+            return
+        params['ExclusiveStartKey'] = last_evaluated_key
+
+
+def batch_get_items(table_name: str, keys: Iterable[Dict], attributes: Optional[Sequence[AttributePath]] = None,
+                    consistent: bool = False) -> List[Dict]:
+    """Fetch raw items by key in BatchGetItem chunks, retrying any unprocessed keys"""
+    keys = list(keys)
+    items = []
+    for start in range(0, len(keys), MAX_BATCH_GET_KEYS):
+        request = {table_name: projection_params(attributes, {'Keys': keys[start:start + MAX_BATCH_GET_KEYS], 'ConsistentRead': consistent})}
+        attempt = 0
+        while request:
+            if attempt >= MAX_BATCH_GET_ATTEMPTS:
+                raise Exception(f"BatchGetItem on {table_name} left keys unprocessed after {attempt} attempts")
+            if attempt:
+                time.sleep(min(0.05 * 2 ** attempt, 1.0))
+            response = ddb.batch_get_item(RequestItems=request)
+            items.extend(response.get('Responses', {}).get(table_name, []))
+            request = response.get('UnprocessedKeys') or None
+            attempt += 1
+    return items
+
+
+def transaction_retryable(transaction_error: Exception) -> bool:
+    """
+    Whether a failed TransactWriteItems may succeed if sent again unchanged: conflicts, throttling and
+    transport errors (timeouts, dropped connections) may; validation and other rejections never will.
+    """
+    if isinstance(transaction_error, BotoCoreError):
+        return True
+    if not isinstance(transaction_error, ClientError):
+        return False
+    code = transaction_error.response.get('Error', {}).get('Code')
+    if code in RETRYABLE_TRANSACTION_ERRORS or code == 'InternalServerError':
+        return True
+    if code != 'TransactionCanceledException':
+        return False
+    reasons = [
+        reason.get('Code') for reason in transaction_error.response.get('CancellationReasons', [])
+        if reason.get('Code') not in (None, 'None')
+    ]
+    return bool(reasons) and all(reason in RETRYABLE_CANCELLATION_REASONS for reason in reasons)
+
+
+def warm_dynamodb_connections() -> int:
+    """Pre-open pooled TLS connections so the first requests after a deploy skip the handshake"""
+    return warm_connections(ddb, DDB_WARM_CONNECTIONS) if DDB_WARM_CONNECTIONS > 0 else 0
+
+
+def shutdown_db_executor() -> None:
+    """Stop accepting DynamoDB work and drop anything still queued"""
+    db_executor.shutdown(wait=False, cancel_futures=True)
+    scan_executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Normalize DynamoDB data structure to regular Python dict
+normalize_dynamodb_item = deserialize_item
+
+
+@dataclass
+class ItemWrite:
+    """A committed write to one item, passed to write listeners so derived views can follow it"""
+    table: str
+    key: str  # The item's hash key value
+    attributes: Optional[Dict] = None  # New attribute values (plain Python); None when unknown
+    complete: bool = False  # attributes is the whole item (a put or ALL_NEW)
+    removed: Tuple[str, ...] = ()
+    increments: Optional[Dict[str, int]] = None  # Numbers added to, when the new totals are unknown
+    deleted: bool = False
+    
+    @property
+    def known(self) -> bool:
+        """Whether the write says enough to apply it to a copy of the item"""
+        return self.deleted or self.attributes is not None or self.increments is not None
+
+
+_write_listeners: List[Callable[[ItemWrite], None]] = []
+
+
+def add_write_listener(listener: Callable[[ItemWrite], None]) -> None:
+    """Call listener(write) after every item write these operations commit"""
+    _write_listeners.append(listener)
+
+
+def notify_write(write: ItemWrite) -> None:
+    for listener in _write_listeners:
+        try:
+            listener(write)
+        except Exception as listener_error:
+            warning(f"[DB] Write listener failed: {listener_error}")
+
+
+def select_preferred_user(users: List[Dict]) -> Optional[Dict]:
+    """Pick the most complete user record among those sharing an email"""
+    # Verification records carry the email too but are never real accounts
+    candidates = [user for user in users if not str(user.get('username', '')).startswith('verification_')]
+    if not candidates:
+        return None
+    
+    # Priority: 1) Completed onboarding (username !== email), 2) Has group_id
+    return min(candidates, key=lambda x: (x.get('username') == x.get('email'), not x.get('group_id')))
 
 
 class UserOperations:
     """User-related DynamoDB operations"""
     
     @staticmethod
-    def get_user_data(username: str) -> Optional[Dict]:
-        """Get user data from DynamoDB"""
+    def get_user_data(username: str, attributes: Optional[Sequence[AttributePath]] = None) -> Optional[Dict]:
+        """Get user data from DynamoDB, optionally only the given attributes"""
         try:
             if not USERS_TABLE:
                 raise Exception("USERS_TABLE not configured")
                 
-            response = ddb.get_item(
-                TableName=USERS_TABLE,
-                Key={'username': {'S': username.lower()}}
-            )
+            response = ddb.get_item(**projection_params(attributes, {
+                'TableName': USERS_TABLE,
+                'Key': {'username': {'S': username.lower()}}
+            }))
             
             if 'Item' in response:
-                return normalize_dynamodb_item(response['Item'])
+                user = normalize_dynamodb_item(response['Item'])
+                # Include XP that is still waiting in the accumulator
+                if attributes is None or 'xp' in attributes:
+                    user = xp_accumulator.overlay_user(user)
+                return user
             return None
         except Exception as error:
             if DEBUG_MODE:
@@ -84,28 +372,41 @@ class UserOperations:
             if not USERS_TABLE:
                 raise Exception("USERS_TABLE not configured")
             
-            # Scan the table to find user by email
-            # Note: In production, you might want to create a GSI on email
-            response = ddb.scan(
-                TableName=USERS_TABLE,
-                FilterExpression='email = :email',
-                ExpressionAttributeValues={
-                    ':email': {'S': email.lower()}
-                }
-            )
+            email_value = {':email': {'S': email.lower()}}
             
-            if 'Items' in response and response['Items']:
-                # If multiple users found, prefer the one that has completed onboarding (username !== email)
-                items = [normalize_dynamodb_item(item) for item in response['Items']]
+            # Query the email GSI first so lookups don't grow with the table
+            try:
+                response = ddb.query(
+                    TableName=USERS_TABLE,
+                    IndexName=EMAIL_INDEX,
+                    KeyConditionExpression='email = :email',
+                    ExpressionAttributeValues=email_value
+                )
+                raw_items = response.get('Items', [])
+            except ClientError as gsi_error:
+                # Only a missing or still-backfilling index falls back; a throttled one must not turn into table scans
+                if gsi_error.response.get('Error', {}).get('Code') not in EMAIL_INDEX_UNAVAILABLE_ERRORS:
+                    raise
+                if DEBUG_MODE:
+                    print(f"[DEBUG] Email GSI unavailable, falling back to scan: {gsi_error}")
                 
-                # Sort by completion status and group membership
-                # Priority: 1) Completed onboarding (username !== email), 2) Has group_id
-                items.sort(key=lambda x: (x.get('username') == x.get('email'), not x.get('group_id')))
+                raw_items = scan_all(
+                    USERS_TABLE,
+                    DDB_SCAN_SEGMENTS,
+                    FilterExpression='email = :email',
+                    ExpressionAttributeValues=email_value
+                )
+            
+            if raw_items:
+                # If multiple users found, prefer the one that has completed onboarding (username !== email)
+                items = [normalize_dynamodb_item(item) for item in raw_items]
                 
                 if DEBUG_MODE:
                     print(f"[DEBUG] Found {len(items)} users for email {email}: {items}")
                 
-                return items[0]  # Return the most complete user record
+                # Return the most complete user record, with XP still waiting in the accumulator
+                user = select_preferred_user(items)
+                return xp_accumulator.overlay_user(user) if user else None
             return None
         except Exception as error:
             if DEBUG_MODE:
@@ -114,7 +415,7 @@ class UserOperations:
     
     @staticmethod
     def update_user_data(username: str, updates: Dict) -> bool:
-        """Update user data in DynamoDB"""
+        """Update user data in DynamoDB from plain Python values"""
         try:
             if not USERS_TABLE:
                 raise Exception("USERS_TABLE not configured")
@@ -128,7 +429,7 @@ class UserOperations:
                 if value is not None:
                     update_expr += f"#{key} = :{key}, "
                     expr_attrs[f"#{key}"] = key
-                    expr_values[f":{key}"] = value
+                    expr_values[f":{key}"] = serialize_value(value)
             
             update_expr = update_expr.rstrip(", ")
             
@@ -140,10 +441,13 @@ class UserOperations:
                 'Key': {'username': {'S': username.lower()}},
                 'UpdateExpression': update_expr,
                 'ExpressionAttributeNames': expr_attrs,
-                'ExpressionAttributeValues': expr_values
+                'ExpressionAttributeValues': expr_values,
+                'ReturnValues': 'UPDATED_NEW'
             }
             
-            ddb.update_item(**params)
+            response = ddb.update_item(**params)
+            leaderboard.update_user(username, {key: value for key, value in updates.items() if value is not None})
+            notify_write(ItemWrite(USERS_TABLE, username.lower(), normalize_dynamodb_item(response.get('Attributes', {}))))
             return True
         except Exception as error:
             if DEBUG_MODE:
@@ -179,6 +483,8 @@ class UserOperations:
                 user_params['Item']['university'] = {'S': university}
             
             ddb.put_item(**user_params)
+            leaderboard.update_user(normalized_username, normalize_dynamodb_item(user_params['Item']))
+            notify_write(ItemWrite(USERS_TABLE, normalized_username, normalize_dynamodb_item(user_params['Item']), complete=True))
             
             if DEBUG_MODE:
                 print(f"[DEBUG] Created user with username {normalized_username} and email {normalized_email}, university {university}")
@@ -191,11 +497,16 @@ class UserOperations:
     
     @staticmethod
     def award_xp(username: str, xp_amount: int) -> bool:
-        """Award XP to a user"""
+        """Award XP to a user (coalesced into the next batch when the accumulator is enabled)"""
         try:
             if not USERS_TABLE:
                 raise Exception("USERS_TABLE not configured")
             
+            if xp_accumulator.enabled:
+                xp_accumulator.add(username, xp_amount)
+                leaderboard.add_xp(username, xp_amount, pending=True)
+                return True
+            
             update_params = {
                 'TableName': USERS_TABLE,
                 'Key': {'username': {'S': username.lower()}},
@@ -203,10 +514,13 @@ class UserOperations:
                 'ExpressionAttributeValues': {
                     ':zero': {'N': '0'},
                     ':xp': {'N': str(xp_amount)}
-                }
+                },
+                'ReturnValues': 'UPDATED_NEW'
             }
             
-            ddb.update_item(**update_params)
+            response = ddb.update_item(**update_params)
+            leaderboard.add_xp(username, xp_amount)
+            notify_write(ItemWrite(USERS_TABLE, username.lower(), normalize_dynamodb_item(response.get('Attributes', {}))))
             
             if DEBUG_MODE:
                 print(f"[DEBUG] Awarded {xp_amount} XP to user {username}")
@@ -217,79 +531,127 @@ class UserOperations:
                 print(f"[ERROR] Failed to award XP: {error}")
             raise error
     
+    _leaderboard_seed_lock = threading.Lock()
+    
     @staticmethod
-    def get_all_users_for_university_leaderboard() -> Dict:
-        """Get all users with their university information for leaderboard"""
+    def _seed_leaderboard() -> int:
+        """Rebuild the in-process leaderboard from a projected users scan"""
+        if not USERS_TABLE:
+            raise Exception("USERS_TABLE not configured")
+        
+        # With flushes held off, the table gains no accumulator XP mid-scan and nothing is in flight:
+        # XP pending now is overlaid and awards from here on are replayed from the journal
+        with UserOperations._leaderboard_seed_lock, xp_accumulator.paused():
+            pending = xp_accumulator.pending()
+            leaderboard.begin_seed()
+            try:
+                users = {user['username']: user for user in (normalize_dynamodb_item(item) for item in scan_items(
+                    USERS_TABLE,
+                    DDB_SCAN_SEGMENTS,
+                    LEADERBOARD_ATTRIBUTES,
+                    FilterExpression='NOT begins_with(username, :prefix)',
+                    ExpressionAttributeValues={':prefix': {'S': 'verification_'}}
+                ))}
+                # The scan may have read a user before or after an update made during it; re-read those users
+                touched, position = leaderboard.touched_since(0)
+                if touched:
+                    for item in batch_get_items(USERS_TABLE, [{'username': {'S': username}} for username in touched],
+                                                LEADERBOARD_ATTRIBUTES, consistent=True):
+                        user = normalize_dynamodb_item(item)
+                        users[user['username']] = user
+                for username, amount in pending.items():
+                    if username in users:
+                        users[username] = {**users[username], 'xp': int(users[username].get('xp', 0)) + amount}
+                # Updates after the re-read are replayed onto the new entries after the swap
+                count = leaderboard.seed(users.values(), replay_from=position)
+            except Exception:
+                leaderboard.cancel_seed()
+                raise
+        
+        if DEBUG_MODE:
+            print(f"[DEBUG] Seeded leaderboard with {count} users")
+        return count
+    
+    @staticmethod
+    def ensure_leaderboard() -> None:
+        """Seed the leaderboard on first use; re-seed stale ones in the background"""
+        if not leaderboard.seeded:
+            UserOperations._seed_leaderboard()
+        elif time.time() - leaderboard.seeded_at > LEADERBOARD_RECONCILE_SECONDS:
+            if not UserOperations._leaderboard_seed_lock.locked():
+                threading.Thread(target=UserOperations._seed_leaderboard, name="leaderboard-seed", daemon=True).start()
+    
+    @staticmethod
+    def get_leaderboard(limit: Optional[int] = None, offset: int = 0) -> Dict:
+        """Get a slice of the global leaderboard, best first"""
         try:
-            if not USERS_TABLE:
-                raise Exception("USERS_TABLE not configured")
-            
-            # Scan all users from the table
-            items = []
-            last_evaluated_key = None
-            
-            while True:
-                scan_params = {
+            UserOperations.ensure_leaderboard()
+            return {"success": True, "data": leaderboard.top(limit, offset)}
+        except Exception as error:
+            if DEBUG_MODE:
+                print(f"[ERROR] Failed to get leaderboard: {error}")
+            return {"success": False, "error": str(error)}
+    
+    @staticmethod
+    def apply_xp_increments(increments: Dict[str, int], token: str) -> None:
+        """Apply up to 100 XP increments in one idempotent transaction"""
+        if not USERS_TABLE:
+            raise Exception("USERS_TABLE not configured")
+        
+        ddb.transact_write_items(
+            TransactItems=[{
+                'Update': {
                     'TableName': USERS_TABLE,
-                    'Select': 'ALL_ATTRIBUTES'
+                    'Key': {'username': {'S': username}},
+                    'UpdateExpression': 'SET xp = if_not_exists(xp, :zero) + :xp',
+                    'ExpressionAttributeValues': {
+                        ':zero': {'N': '0'},
+                        ':xp': {'N': str(amount)}
+                    }
                 }
-                
-                if last_evaluated_key:
-                    scan_params['ExclusiveStartKey'] = last_evaluated_key
-                
-                response = ddb.scan(**scan_params)
-                items.extend(response.get('Items', []))
-                
-                last_evaluated_key = response.get('LastEvaluatedKey')
-                if not last_evaluated_key:
-                    break
-            
-            # Normalize the data
-            normalized_users = []
-            for item in items:
-                user = normalize_dynamodb_item(item)
-                # Only include users with university information
-                if user.get('university'):
-                    normalized_users.append({
-                        'username': user.get('username', ''),
-                        'university': user.get('university', ''),
-                        'easy': user.get('easy', 0),
-                        'medium': user.get('medium', 0),
-                        'hard': user.get('hard', 0),
-                        'xp': user.get('xp', 0)
-                    })
-            
-            if DEBUG_MODE:
-                print(f"[DEBUG] Found {len(normalized_users)} users with university information")
-            
-            return {"success": True, "data": normalized_users}
+            } for username, amount in increments.items()],
+            ClientRequestToken=token
+        )
+        for username, amount in increments.items():
+            notify_write(ItemWrite(USERS_TABLE, username, increments={'xp': amount}))
+    
+    @staticmethod
+    def get_university_leaderboard() -> Dict:
+        """Get per-university totals from the leaderboard's running aggregates"""
+        try:
+            UserOperations.ensure_leaderboard()
+            return {"success": True, "data": leaderboard.universities()}
         except Exception as error:
             if DEBUG_MODE:
-                print(f"[ERROR] Failed to get users for university leaderboard: {error}")
+                print(f"[ERROR] Failed to get university leaderboard: {error}")
             return {"success": False, "error": str(error)}
 
 
 class VerificationOperations:
-    """Verification code operations"""
+    """Verification code operations
+    
+    Codes live only in VERIFICATION_TABLE and are read consistently, so every worker sees a resend
+    or a consumed code at once.
+    """
     
     @staticmethod
     def store_verification_code(email: str, code: str) -> bool:
-        """Store verification code in DynamoDB with TTL"""
+        """Store verification code in DynamoDB with a TTL"""
         try:
-            if not USERS_TABLE:
-                raise Exception("USERS_TABLE not configured")
+            if not VERIFICATION_TABLE:
+                raise Exception("VERIFICATION_TABLE not configured")
                 
             # Ensure email is lowercase
             normalized_email = email.lower()
-            ttl = int(time.time()) + 10 * 60  # 10 minutes from now
+            expires_at = int(time.time()) + VERIFICATION_CODE_TTL
             
+            # DynamoDB deletes the record itself once expires_at passes
             params = {
-                'TableName': USERS_TABLE,
+                'TableName': VERIFICATION_TABLE,
                 'Item': {
-                    'username': {'S': f"verification_{normalized_email}"},
                     'email': {'S': normalized_email},
                     'verification_code': {'S': code},
-                    'ttl': {'N': str(ttl)},
+                    'expires_at': {'N': str(expires_at)},
                     'created_at': {'S': datetime.now(timezone.utc).isoformat()}
                 }
             }
@@ -301,28 +663,30 @@ class VerificationOperations:
                 print(f"[ERROR] Failed to store verification code: {error}")
             raise error
     
+    @staticmethod
+    def _get_code(email: str) -> Optional[Tuple[str, int]]:
+        """Look up (code, expires_at) with a consistent read, so a code just stored or consumed is seen"""
+        response = ddb.get_item(TableName=VERIFICATION_TABLE, Key={'email': {'S': email}}, ConsistentRead=True)
+        if 'Item' not in response:
+            return None
+        return response['Item']['verification_code']['S'], int(response['Item']['expires_at']['N'])
+    
     @staticmethod
     def verify_code_and_get_user(email: str, code: str) -> Dict:
         """Verify code and get user data"""
         try:
-            if not USERS_TABLE:
-                raise Exception("USERS_TABLE not configured")
-                
-            # Get verification record
-            params = {
-                'TableName': USERS_TABLE,
-                'Key': {'username': {'S': f"verification_{email.lower()}"}}
-            }
+            if not VERIFICATION_TABLE:
+                raise Exception("VERIFICATION_TABLE not configured")
             
-            response = ddb.get_item(**params)
+            normalized_email = email.lower()
+            entry = VerificationOperations._get_code(normalized_email)
             
-            if 'Item' not in response:
+            if not entry:
                 return {'success': False, 'error': 'Verification code not found'}
                 
-            stored_code = response['Item']['verification_code']['S']
-            stored_ttl = int(response['Item']['ttl']['N'])
+            stored_code, stored_ttl = entry
             
-            # Check if code is expired
+            # Check if code is expired (TTL deletion can lag expiry by hours)
             if time.time() > stored_ttl:
                 return {'success': False, 'error': 'Verification code expired'}
                 
@@ -330,11 +694,21 @@ class VerificationOperations:
             if stored_code != code:
                 return {'success': False, 'error': 'Invalid verification code'}
                 
-            # Get existing user data by email
-            user_data = UserOperations.get_user_by_email(email)
+            # Consume the code; the condition fails if it was already used or replaced by a resend
+            try:
+                ddb.delete_item(
+                    TableName=VERIFICATION_TABLE,
+                    Key={'email': {'S': normalized_email}},
+                    ConditionExpression='verification_code = :code',
+                    ExpressionAttributeValues={':code': {'S': code}}
+                )
+            except ClientError as delete_error:
+                if delete_error.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+                    return {'success': False, 'error': 'Verification code not found'}
+                raise
             
-            # Clean up verification record
-            ddb.delete_item(**params)
+            # Get existing user data by email
+            user_data = UserOperations.get_user_by_email(normalized_email)
             
             return {
                 'success': True,
@@ -344,53 +718,6 @@ class VerificationOperations:
             if DEBUG_MODE:
                 print(f"[ERROR] Failed to verify code: {error}")
             return {'success': False, 'error': str(error)}
-    
-    @staticmethod
-    def cleanup_expired_codes() -> Dict:
-        """Clean up expired verification codes"""
-        try:
-            if not USERS_TABLE:
-                raise Exception("USERS_TABLE not configured")
-            
-            now = int(time.time())
-            
-            # Scan for verification records that have expired
-            scan_params = {
-                'TableName': USERS_TABLE,
-                'FilterExpression': 'begins_with(username, :prefix) AND #ttl < :now',
-                'ExpressionAttributeNames': {
-                    '#ttl': 'ttl'
-                },
-                'ExpressionAttributeValues': {
-                    ':prefix': {'S': 'verification_'},
-                    ':now': {'N': str(now)},
-                },
-            }
-            
-            scan_result = ddb.scan(**scan_params)
-            expired_records = scan_result.get('Items', [])
-            
-            if expired_records:
-                if DEBUG_MODE:
-                    print(f"[DEBUG] Found {len(expired_records)} expired verification records")
-                
-                # Delete expired records
-                for record in expired_records:
-                    delete_params = {
-                        'TableName': USERS_TABLE,
-                        'Key': {'username': record['username']},
-                    }
-                    ddb.delete_item(**delete_params)
-                
-                if DEBUG_MODE:
-                    print(f"[DEBUG] Cleaned up {len(expired_records)} expired verification records")
-            
-            return {"success": True, "count": len(expired_records)}
-            
-        except Exception as error:
-            if DEBUG_MODE:
-                print(f"[ERROR] Failed to cleanup expired codes: {error}")
-            raise error
 
 
 class GroupOperations:
@@ -417,10 +744,14 @@ class GroupOperations:
                 'ExpressionAttributeValues': {
                     ':g': {'S': group_id},
                     ':name': {'S': display_name or username}
-                }
+                },
+                'ReturnValues': 'UPDATED_NEW'
             }
             
-            ddb.update_item(**update_params)
+            response = ddb.update_item(**update_params)
+            
+            leaderboard.update_user(normalized_username, {'group_id': group_id, 'display_name': display_name or username})
+            notify_write(ItemWrite(USERS_TABLE, normalized_username, normalize_dynamodb_item(response.get('Attributes', {}))))
             
             if DEBUG_MODE:
                 print(f"[DEBUG] Created group {group_id} for user {normalized_username}")
@@ -449,10 +780,14 @@ class GroupOperations:
                 'ExpressionAttributeValues': {
                     ':g': {'S': invite_code},
                     ':name': {'S': display_name or username}
-                }
+                },
+                'ReturnValues': 'UPDATED_NEW'
             }
             
-            ddb.update_item(**update_params)
+            response = ddb.update_item(**update_params)
+            
+            leaderboard.update_user(normalized_username, {'group_id': invite_code, 'display_name': display_name or username})
+            notify_write(ItemWrite(USERS_TABLE, normalized_username, normalize_dynamodb_item(response.get('Attributes', {}))))
             
             if DEBUG_MODE:
                 print(f"[DEBUG] User {normalized_username} joined group {invite_code}")
@@ -482,6 +817,9 @@ class GroupOperations:
             
             ddb.update_item(**update_params)
             
+            leaderboard.update_user(normalized_username, {'group_id': None})
+            notify_write(ItemWrite(USERS_TABLE, normalized_username, {}, removed=('group_id',)))
+            
             if DEBUG_MODE:
                 print(f"[DEBUG] User {normalized_username} left group")
             
@@ -499,16 +837,33 @@ class GroupOperations:
             if not USERS_TABLE:
                 raise Exception("USERS_TABLE not configured")
             
+            # Serve from the in-process leaderboard when it can be seeded
+            try:
+                UserOperations.ensure_leaderboard()
+                members = leaderboard.group(group_id)
+                return {"success": True, "data": [{
+                    'username': member['username'],
+                    'name': member.get('display_name') or member['username'],
+                    'easy': member.get('easy', 0),
+                    'medium': member.get('medium', 0),
+                    'hard': member.get('hard', 0),
+                    'today': member.get('today', 0),
+                    'xp': member.get('xp', 0)
+                } for member in members]}
+            except Exception as leaderboard_error:
+                if DEBUG_MODE:
+                    print(f"[DEBUG] Leaderboard unavailable, querying group directly: {leaderboard_error}")
+            
             items = []
             
             # Try querying via GSI first
             try:
-                query_params = {
+                query_params = projection_params(GROUP_STATS_ATTRIBUTES, {
                     'TableName': USERS_TABLE,
-                    'IndexName': 'group_id-index',
+                    'IndexName': GROUP_ID_INDEX,
                     'KeyConditionExpression': 'group_id = :g',
                     'ExpressionAttributeValues': {':g': {'S': group_id}}
-                }
+                })
                 
                 result = ddb.query(**query_params)
                 items = result.get('Items', [])
@@ -519,21 +874,19 @@ class GroupOperations:
                 
                 # Fall back to scan + filter
                 scan_params = {
-                    'TableName': USERS_TABLE,
                     'FilterExpression': 'group_id = :g',
                     'ExpressionAttributeValues': {':g': {'S': group_id}}
                 }
                 
                 try:
-                    scan_result = ddb.scan(**scan_params)
-                    items = scan_result.get('Items', [])
+                    items = scan_all(USERS_TABLE, DDB_SCAN_SEGMENTS, GROUP_STATS_ATTRIBUTES, **scan_params)
                 except Exception as scan_error:
                     if DEBUG_MODE:
                         print(f"[ERROR] Scan also failed: {scan_error}")
                     return {"success": True, "data": []}
             
             # Process items and build leaderboard
-            leaderboard = []
+            members = []
             for item in items:
                 normalized_username = item['username']['S'].lower()
                 display_name = item.get('display_name', {}).get('S', item['username']['S'])
@@ -556,7 +909,7 @@ class GroupOperations:
                             print(f"[ERROR] Failed to update display name: {update_error}")
                         display_name = item['username']['S']
                 
-                leaderboard.append({
+                members.append({
                     'username': normalized_username,
                     'name': display_name,
                     'easy': int(item.get('easy', {}).get('N', '0')),
@@ -567,9 +920,9 @@ class GroupOperations:
                 })
             
             if DEBUG_MODE:
-                print(f"[DEBUG] Found {len(leaderboard)} users in group {group_id}")
+                print(f"[DEBUG] Found {len(members)} users in group {group_id}")
             
-            return {"success": True, "data": leaderboard}
+            return {"success": True, "data": xp_accumulator.overlay(members)}
             
         except Exception as error:
             if DEBUG_MODE:
@@ -580,6 +933,164 @@ class GroupOperations:
 class DailyProblemOperations:
     """Daily problem operations"""
     
+    _older_dates: Optional[Tuple[str, float, List[str]]] = None  # (cutoff, scanned at, dates before it newest first)
+    
+    @staticmethod
+    def _active_streak(user: Dict, today: Optional[str] = None) -> int:
+        """Current streak from the user's counters; it lapses once a whole day is missed"""
+        last_completed = user.get('last_completed_date')
+        if not last_completed:
+            return 0
+        
+        today = today or datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        yesterday = (datetime.strptime(today, '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d')
+        return int(user.get('current_streak', 0)) if last_completed in (today, yesterday) else 0
+    
+    @staticmethod
+    def _record_streak_completion(username: str, today: str) -> int:
+        """Award the daily XP and advance the streak counters, at most once per day"""
+        yesterday = (datetime.strptime(today, '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d')
+        
+        for _ in range(MAX_STREAK_UPDATE_ATTEMPTS):
+            user = UserOperations.get_user_data(username, STREAK_ATTRIBUTES) or {}
+            last_completed = user.get('last_completed_date')
+            current_streak = int(user.get('current_streak', 0))
+            if last_completed == today:
+                return current_streak  # Already counted today
+            
+            streak = current_streak + 1 if last_completed == yesterday else 1
+            longest = max(int(user.get('longest_streak', 0)), streak)
+            
+            # Only apply if nobody else moved the counters since we read them
+            if last_completed:
+                condition = 'last_completed_date = :previousDate'
+                condition_values = {':previousDate': {'S': last_completed}}
+            else:
+                condition = 'attribute_not_exists(last_completed_date)'
+                condition_values = {}
+            
+            try:
+                response = ddb.update_item(
+                    TableName=USERS_TABLE,
+                    Key={'username': {'S': username}},
+                    UpdateExpression=(
+                        'SET today = :today, xp = if_not_exists(xp, :zero) + :xp, '
+                        'current_streak = :streak, longest_streak = :longest, last_completed_date = :date'
+                    ),
+                    ConditionExpression=condition,
+                    ExpressionAttributeValues={
+                        ':today': {'N': '1'},
+                        ':zero': {'N': '0'},
+                        ':xp': {'N': '10'},
+                        ':streak': {'N': str(streak)},
+                        ':longest': {'N': str(longest)},
+                        ':date': {'S': today},
+                        **condition_values
+                    },
+                    ReturnValues='UPDATED_NEW'
+                )
+                leaderboard.add_xp(username, 10)
+                leaderboard.update_user(username, {'today': 1})
+                notify_write(ItemWrite(USERS_TABLE, username, normalize_dynamodb_item(response.get('Attributes', {}))))
+                return streak
+            except ClientError as update_error:
+                if update_error.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                    raise
+        
+        raise Exception(f"Streak update for {username} kept conflicting with concurrent writes")
+    
+    @staticmethod
+    def _problem_items_for_dates(dates: List[str], attributes: Optional[Sequence[AttributePath]] = None) -> List[Dict]:
+        """Fetch the raw daily problems stored under the given dates, newest first"""
+        if not dates:
+            return []
+        items = batch_get_items(DAILY_TABLE, [{'date': {'S': date}} for date in dates], attributes)
+        return sorted(items, key=lambda x: x.get('date', {}).get('S', ''), reverse=True)
+    
+    @staticmethod
+    def _latest_problem_items(count: int, attributes: Optional[Sequence[AttributePath]] = None) -> List[Dict]:
+        """Fetch the `count` most recent raw daily problems, newest first"""
+        # The date is the hash key, so walk back from today with direct key lookups: first just the
+        # `count` newest days (today alone for the current problem), then windows doubling on each miss
+        today = datetime.now(timezone.utc).date()
+        found: List[Dict] = []
+        offset, size = 0, count
+        while offset < DAILY_MAX_LOOKBACK_DAYS:
+            window = range(offset, min(offset + size, DAILY_MAX_LOOKBACK_DAYS))
+            dates = [(today - timedelta(days=days_ago)).strftime('%Y-%m-%d') for days_ago in window]
+            found.extend(DailyProblemOperations._problem_items_for_dates(dates, attributes))
+            if len(found) >= count:
+                return found[:count]
+            offset += size
+            size = max(size * 2, DAILY_LOOKUP_WINDOW_DAYS, count - len(found))
+        
+        # Fewer problems than requested inside the lookback - take older dates from the keys-only scan
+        oldest = (today - timedelta(days=DAILY_MAX_LOOKBACK_DAYS - 1)).strftime('%Y-%m-%d')
+        older_dates = DailyProblemOperations._dates_before(oldest)[:count - len(found)]
+        return found + DailyProblemOperations._problem_items_for_dates(older_dates, attributes)
+    
+    @staticmethod
+    def _dates_before(oldest: str) -> List[str]:
+        """Dates of the problems older than `oldest`, newest first; the scan is reused for DAILY_OLDER_DATES_TTL_SECONDS"""
+        cached = DailyProblemOperations._older_dates
+        if cached is not None and cached[0] == oldest and time.time() - cached[1] < DAILY_OLDER_DATES_TTL_SECONDS:
+            return cached[2]
+        
+        dates = sorted(
+            (item['date']['S'] for item in scan_items(
+                DAILY_TABLE,
+                1,
+                ['date'],
+                FilterExpression='#date < :oldest',
+                ExpressionAttributeNames={'#date': 'date'},
+                ExpressionAttributeValues={':oldest': {'S': oldest}}
+            ) if 'date' in item),
+            reverse=True
+        )
+        DailyProblemOperations._older_dates = (oldest, time.time(), dates)
+        return dates
+    
+    @staticmethod
+    def get_problems_in_range(start_date: str, end_date: str, attributes: Optional[Sequence[AttributePath]] = None) -> List[Dict]:
+        """Get the normalized daily problems dated within [start_date, end_date] (YYYY-MM-DD), newest first"""
+        if not DAILY_TABLE:
+            raise Exception("DAILY_TABLE not configured")
+        
+        start = datetime.strptime(start_date, '%Y-%m-%d').date()
+        end = datetime.strptime(end_date, '%Y-%m-%d').date()
+        dates = [(end - timedelta(days=days_ago)).strftime('%Y-%m-%d') for days_ago in range((end - start).days + 1)]
+        items = DailyProblemOperations._problem_items_for_dates(dates, attributes)
+        return [normalize_dynamodb_item(item) for item in items]
+    
+    @staticmethod
+    def get_latest_problems(count: int, attributes: Optional[Sequence[AttributePath]] = None) -> List[Dict]:
+        """Get the `count` most recent normalized daily problems, newest first"""
+        if not DAILY_TABLE:
+            raise Exception("DAILY_TABLE not configured")
+        
+        return [normalize_dynamodb_item(item) for item in DailyProblemOperations._latest_problem_items(count, attributes)]
+    
+    @staticmethod
+    def get_todays_completions() -> Dict:
+        """Get who has completed the latest daily problem"""
+        try:
+            latest = DailyProblemOperations.get_latest_problems(1, ['date', 'users'])
+            if not latest:
+                return {"success": True, "data": {"users": {}}}
+            
+            return {
+                "success": True,
+                "data": {
+                    "users": latest[0].get('users', {}),
+                    "problem_date": latest[0].get('date')
+                }
+            }
+            
+        except Exception as error:
+            if DEBUG_MODE:
+                print(f"[ERROR] Failed to get daily completions: {error}")
+            raise error
+    
     @staticmethod
     def get_daily_problem_data(username: str) -> Dict:
         """Get latest problem data for a user"""
@@ -587,40 +1098,12 @@ class DailyProblemOperations:
             if not DAILY_TABLE:
                 raise Exception("DAILY_TABLE not configured")
             
-            from datetime import datetime, timezone, timedelta
-            
-            # Try to get today's problem first (most likely case)
-            today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
             latest_problem = None
             
             try:
-                # Query for today's problem directly using the date key
-                query_params = {
-                    'TableName': DAILY_TABLE,
-                    'KeyConditionExpression': '#date = :today',
-                    'ExpressionAttributeNames': {'#date': 'date'},
-                    'ExpressionAttributeValues': {':today': {'S': today}}
-                }
-                
-                query_result = ddb.query(**query_params)
-                items = query_result.get('Items', [])
-                
-                if items:
-                    latest_item = items[0]  # Today's problem found
-                else:
-                    # Fallback: scan for the most recent problem if today's not found
-                    scan_params = {
-                        'TableName': DAILY_TABLE
-                    }
-                    scan_result = ddb.scan(**scan_params)
-                    all_problems = scan_result.get('Items', [])
-                    
-                    if all_problems:
-                        # Sort by date to get the latest problem
-                        sorted_problems = sorted(all_problems, key=lambda x: x.get('date', {}).get('S', ''), reverse=True)
-                        latest_item = sorted_problems[0]
-                    else:
-                        latest_item = None
+                # Today's problem when it exists, otherwise the most recent one
+                latest_items = DailyProblemOperations._latest_problem_items(1)
+                latest_item = latest_items[0] if latest_items else None
                 
                 # Normalize the item to get proper field names if we found one
                 if latest_item:
@@ -639,23 +1122,6 @@ class DailyProblemOperations:
                 if DEBUG_MODE:
                     print(f"[DEBUG] Scan failed: {query_error}")
             
-            # Get recent problems for streak calculation
-            thirty_days_ago = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
-            scan_params = {
-                'TableName': DAILY_TABLE,
-                'FilterExpression': '#date >= :thirtyDaysAgo',
-                'ExpressionAttributeNames': {'#date': 'date'},
-                'ExpressionAttributeValues': {':thirtyDaysAgo': {'S': thirty_days_ago}}
-            }
-            
-            try:
-                scan_result = ddb.scan(**scan_params)
-                daily_problems = scan_result.get('Items', [])
-            except Exception as scan_error:
-                if DEBUG_MODE:
-                    print(f"[ERROR] Scan failed: {scan_error}")
-                daily_problems = []
-            
             # Check if user completed the latest problem
             daily_complete = False
             if latest_problem and 'users' in latest_problem:
@@ -673,31 +1139,10 @@ class DailyProblemOperations:
                     else:
                         daily_complete = True  # Default to true if user exists in the users field
             
-            # Calculate streak
-            streak = 0
-            if daily_problems:
-                sorted_problems = sorted(daily_problems, key=lambda x: x.get('date', {}).get('S', ''), reverse=True)
-                for problem in sorted_problems:
-                    problem_date = problem.get('date', {}).get('S')
-                    if problem_date and 'users' in problem:
-                        normalized_username = username.lower()
-                        users_data = problem.get('users', {})
-                        
-                        # Check if user completed this problem (same logic as daily_complete)
-                        user_completed = False
-                        if normalized_username in users_data:
-                            user_completion = users_data[normalized_username]
-                            if isinstance(user_completion, bool):
-                                user_completed = user_completion
-                            elif isinstance(user_completion, dict) and user_completion.get('BOOL'):
-                                user_completed = user_completion['BOOL']
-                            else:
-                                user_completed = True
-                        
-                        if user_completed:
-                            streak += 1
-                        else:
-                            break
+            # Streak counters are maintained on the user record by complete_daily_problem
+            streak = DailyProblemOperations._active_streak(
+                UserOperations.get_user_data(username, STREAK_ATTRIBUTES) or {}
+            )
             
             return {
                 "success": True,
@@ -717,36 +1162,12 @@ class DailyProblemOperations:
     def get_user_daily_data(username: str) -> Dict:
         """Get just the user's streak data (lightweight operation)"""
         try:
-            if not DAILY_TABLE:
-                raise Exception("DAILY_TABLE not configured")
-            
-            from datetime import datetime, timezone, timedelta
-            
-            # Get recent problems for streak calculation (last 30 days)
-            thirty_days_ago = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
-            scan_params = {
-                'TableName': DAILY_TABLE,
-                'FilterExpression': '#date >= :thirtyDaysAgo',
-                'ExpressionAttributeNames': {'#date': 'date'},
-                'ExpressionAttributeValues': {':thirtyDaysAgo': {'S': thirty_days_ago}}
+            user = UserOperations.get_user_data(username, STREAK_ATTRIBUTES) or {}
+            return {
+                'streak': DailyProblemOperations._active_streak(user),
+                'longestStreak': user.get('longest_streak', 0)
             }
             
-            recent_problems = ddb.scan(**scan_params).get('Items', [])
-            
-            # Sort by date in reverse to check streak
-            sorted_problems = sorted(recent_problems, key=lambda x: x.get('date', {}).get('S', ''), reverse=True)
-            
-            # Calculate streak
-            streak = 0
-            normalized_username = username.lower()
-            for problem in sorted_problems:
-                if 'users' in problem and normalized_username in problem.get('users', {}):
-                    streak += 1
-                else:
-                    break
-            
-            return {'streak': streak}
-            
         except Exception as error:
             if DEBUG_MODE:
                 print(f"[ERROR] Failed to get user daily data: {error}")
@@ -775,24 +1196,13 @@ class DailyProblemOperations:
             
             ddb.update_item(**update_daily_params)
             
-            # Update user stats
-            update_user_params = {
-                'TableName': USERS_TABLE,
-                'Key': {'username': {'S': normalized_username}},
-                'UpdateExpression': 'SET today = :today, xp = if_not_exists(xp, :zero) + :xp',
-                'ExpressionAttributeValues': {
-                    ':today': {'N': '1'},
-                    ':zero': {'N': '0'},
-                    ':xp': {'N': '10'}
-                }
-            }
-            
-            ddb.update_item(**update_user_params)
+            # Update user stats and streak counters in one write
+            streak = DailyProblemOperations._record_streak_completion(normalized_username, today)
             
             if DEBUG_MODE:
-                print(f"[DEBUG] User {normalized_username} completed daily problem")
+                print(f"[DEBUG] User {normalized_username} completed daily problem (streak {streak})")
             
-            return {"success": True}
+            return {"success": True, "streak": streak}
             
         except Exception as error:
             if DEBUG_MODE:
@@ -800,27 +1210,16 @@ class DailyProblemOperations:
             raise error
     
     @staticmethod
-    def get_top_daily_problems() -> Dict:
-        """Get top 2 most recent daily problems for caching"""
+    def get_top_daily_problems(count: int = 2) -> Dict:
+        """Get the most recent daily problems (top 2 by default) for caching"""
         try:
             if not DAILY_TABLE:
                 raise Exception("DAILY_TABLE not configured")
             
-            # Scan daily table to get all problems
-            scan_params = {
-                'TableName': DAILY_TABLE
-            }
-            
-            scan_result = ddb.scan(**scan_params)
-            all_problems = scan_result.get('Items', [])
+            # Get the most recent problems by date key
+            top_problems = DailyProblemOperations._latest_problem_items(count)
             
-            if all_problems:
-                # Sort by date to get the most recent problems
-                sorted_problems = sorted(all_problems, key=lambda x: x.get('date', {}).get('S', ''), reverse=True)
-                
-                # Get top 2 problems
-                top_problems = sorted_problems[:2]
-                
+            if top_problems:
                 # Normalize the data
                 normalized_problems = []
                 for item in top_problems:
@@ -864,12 +1263,7 @@ class BountyOperations:
             current_time = int(time.time())
             
             # Get all bounties
-            scan_params = {
-                'TableName': BOUNTIES_TABLE
-            }
-            
-            scan_result = ddb.scan(**scan_params)
-            all_bounties = scan_result.get('Items', [])
+            all_bounties = scan_all(BOUNTIES_TABLE)
             
             # Filter and enrich bounties with computed fields
             active_bounties = []
@@ -929,35 +1323,343 @@ class BountyOperations:
 class DuelOperations:
     """Duel-related operations"""
     
+    # duelId -> (challenger, challengee); participants never change after creation
+    _roles: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+    _roles_lock = threading.Lock()
+    
+    @staticmethod
+    def _remember_roles(duel_item: Dict) -> None:
+        """Memoize a raw duel item's participants"""
+        duel_id = duel_item.get('duelId', {}).get('S')
+        challenger = duel_item.get('challenger', {}).get('S')
+        challengee = duel_item.get('challengee', {}).get('S')
+        if not (duel_id and challenger and challengee):
+            return
+        with DuelOperations._roles_lock:
+            DuelOperations._roles[duel_id] = (challenger, challengee)
+            DuelOperations._roles.move_to_end(duel_id)
+            if len(DuelOperations._roles) > DUEL_ROLE_MEMO_SIZE:
+                DuelOperations._roles.popitem(last=False)
+    
+    @staticmethod
+    def _update_as_participant(duel_id: str, username: str, build_update) -> Tuple[Optional[str], Optional[Dict], Optional[Dict]]:
+        """
+        Apply build_update(role) to the duel as the user's side, in one conditional write.
+        
+        build_update returns update_item params whose ConditionExpression covers everything but
+        the role check. Returns (role, new item, None) on success, or (role, None, old item) when
+        the condition failed; role is None if the user is not a participant, and the old item is
+        None if the duel does not exist. A wrong role guess costs one extra write.
+        """
+        with DuelOperations._roles_lock:
+            roles = DuelOperations._roles.get(duel_id)
+        role = 'challengee' if roles and roles[1] == username else 'challenger'
+        
+        old_item = None
+        for _ in range(2):
+            params = build_update(role)
+            params['ConditionExpression'] = f"{role} = :participant AND ({params['ConditionExpression']})"
+            params['ExpressionAttributeValues'][':participant'] = {'S': username}
+            try:
+                response = ddb.update_item(
+                    **params,
+                    ReturnValues='ALL_NEW',
+                    ReturnValuesOnConditionCheckFailure='ALL_OLD'
+                )
+                duel_item = response['Attributes']
+                DuelOperations._remember_roles(duel_item)
+                notify_write(ItemWrite(DUELS_TABLE, duel_id, normalize_dynamodb_item(duel_item), complete=True))
+                return role, duel_item, None
+            except ClientError as update_error:
+                if update_error.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                    raise
+                old_item = update_error.response.get('Item')
+            
+            if not old_item:
+                return role, None, None
+            DuelOperations._remember_roles(old_item)
+            
+            if old_item.get('challenger', {}).get('S') == username:
+                actual_role = 'challenger'
+            elif old_item.get('challengee', {}).get('S') == username:
+                actual_role = 'challengee'
+            else:
+                return None, None, old_item
+            
+            if actual_role == role:
+                return role, None, old_item  # Right side - another condition failed
+            role = actual_role
+        
+        return role, None, old_item
+    
     @staticmethod
-    def get_user_duels(username: str) -> Dict:
-        """Get duels for a user"""
+    def _open_duels_since(status: str, before: str, since_field: str, attributes: Optional[Sequence[AttributePath]] = None) -> List[Dict]:
+        """Raw duels in a status whose status began before the given ISO time, oldest first"""
+        try:
+            return list(query_items(
+                DUELS_TABLE,
+                attributes,
+                IndexName=DUEL_STATUS_INDEX,
+                KeyConditionExpression='openStatus = :status AND openSince < :before',
+                ExpressionAttributeValues={':status': {'S': status}, ':before': {'S': before}}
+            ))
+        except Exception as gsi_error:
+            if DEBUG_MODE:
+                print(f"[DEBUG] Status index query failed, falling back to scan: {gsi_error}")
+            
+            # Fall back to scan + filter on the canonical attributes
+            return scan_all(
+                DUELS_TABLE,
+                DDB_SCAN_SEGMENTS,
+                attributes,
+                FilterExpression=f'#status = :status AND {since_field} < :before',
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={':status': {'S': status}, ':before': {'S': before}}
+            )
+    
+    @staticmethod
+    def _settlement_actions(settlement: Dict) -> List[Dict]:
+        """Build the duel completion action for a settlement; guarded so a duel only settles once"""
+        fields = {'status': 'COMPLETED', **settlement['fields']}
+        names = {f"#{key}": key for key in fields}
+        values = {f":{key}": serialize_value(value) for key, value in fields.items()}
+        values[':completedStatus'] = {'S': 'COMPLETED'}
+        
+        return [{
+            'Update': {
+                'TableName': DUELS_TABLE,
+                'Key': {'duelId': {'S': settlement['duel_id']}},
+                # Dropping openStatus/openSince takes the duel out of the status index
+                'UpdateExpression': 'SET ' + ', '.join(f"#{key} = :{key}" for key in fields) + ' REMOVE openStatus, openSince',
+                'ConditionExpression': '#status <> :completedStatus',
+                'ExpressionAttributeNames': names,
+                'ExpressionAttributeValues': values
+            }
+        }]
+    
+    @staticmethod
+    def _xp_actions(xp_awards: Dict[str, int]) -> List[Dict]:
+        """Build one XP increment per user (a transaction may touch each item only once)"""
+        return [{
+            'Update': {
+                'TableName': USERS_TABLE,
+                'Key': {'username': {'S': username.lower()}},
+                'UpdateExpression': 'SET xp = if_not_exists(xp, :zero) + :xp',
+                'ExpressionAttributeValues': {
+                    ':zero': {'N': '0'},
+                    ':xp': {'N': str(amount)}
+                }
+            }
+        } for username, amount in xp_awards.items() if amount]
+    
+    @staticmethod
+    def _commit_settlements(settlements: List[Dict]) -> bool:
+        """Commit a group of settlements and their merged XP awards in one transaction"""
+        xp_awards: Dict[str, int] = {}
+        actions = []
+        for settlement in settlements:
+            actions.extend(DuelOperations._settlement_actions(settlement))
+            for username, amount in settlement['xp'].items():
+                xp_awards[username.lower()] = xp_awards.get(username.lower(), 0) + amount
+        actions.extend(DuelOperations._xp_actions(xp_awards))
+        
+        for attempt in range(MAX_SETTLEMENT_ATTEMPTS):
+            if attempt:
+                time.sleep(min(0.05 * 2 ** attempt, 1.0))
+            try:
+                ddb.transact_write_items(TransactItems=actions)
+                return True
+            except ClientError as transaction_error:
+                if not DuelOperations._settlement_retryable(transaction_error, len(settlements)):
+                    return False
+                if attempt == MAX_SETTLEMENT_ATTEMPTS - 1:
+                    raise
+                if DEBUG_MODE:
+                    print(f"[DEBUG] Settlement transaction attempt {attempt + 1} cancelled, retrying: {transaction_error}")
+    
+    @staticmethod
+    def _settlement_retryable(transaction_error: ClientError, duel_actions: int) -> bool:
+        """
+        Classify a failed settlement transaction: False when a duel in it was already completed,
+        True when a conflicting write (e.g. an XP flush on the same user) or throttling cancelled it.
+        Raises anything else. The first duel_actions actions are the duel updates.
+        """
+        code = transaction_error.response.get('Error', {}).get('Code')
+        if code in RETRYABLE_TRANSACTION_ERRORS:
+            return True
+        if code != 'TransactionCanceledException':
+            raise transaction_error
+        
+        reasons = [
+            (index, reason.get('Code'))
+            for index, reason in enumerate(transaction_error.response.get('CancellationReasons', []))
+            if reason.get('Code') not in (None, 'None')
+        ]
+        if reasons and all(reason == 'ConditionalCheckFailed' and index < duel_actions for index, reason in reasons):
+            return False
+        if reasons and all(
+            reason in RETRYABLE_CANCELLATION_REASONS or (reason == 'ConditionalCheckFailed' and index < duel_actions)
+            for index, reason in reasons
+        ):
+            return True
+        raise transaction_error
+    
+    @staticmethod
+    def _finished_settlement(duel_id: str, challenger: str, challengee: str, challenger_time: int, challengee_time: int) -> Dict:
+        """Settlement for a duel both players submitted - the faster time wins, a tie rewards both"""
+        xp_award = 50  # Winner gets more XP
+        if challenger_time < challengee_time:
+            winner, xp_awards = challenger, {challenger: xp_award, challengee: 25}
+        elif challengee_time < challenger_time:
+            winner, xp_awards = challengee, {challengee: xp_award, challenger: 25}
+        else:
+            # Tie - both get winner XP
+            winner, xp_awards = None, {challenger: xp_award, challengee: xp_award}
+        return {
+            'duel_id': duel_id,
+            'fields': {
+                'winner': winner,
+                'xpAwarded': xp_award,
+                'completedAt': datetime.now(timezone.utc).isoformat()
+            },
+            'xp': xp_awards
+        }
+    
+    @staticmethod
+    def _apply_settlement(settlement: Dict) -> None:
+        """Apply a committed settlement to the leaderboard and write listeners"""
+        notify_write(ItemWrite(
+            DUELS_TABLE,
+            settlement['duel_id'],
+            {'status': 'COMPLETED', **settlement['fields']},
+            removed=('openStatus', 'openSince')
+        ))
+        for username, amount in settlement['xp'].items():
+            if amount:
+                leaderboard.add_xp(username, amount)
+                notify_write(ItemWrite(USERS_TABLE, username.lower(), increments={'xp': amount}))
+    
+    @staticmethod
+    def settle_duels(settlements: List[Dict]) -> List[str]:
+        """
+        Complete duels and award their XP atomically, grouping many duels per transaction.
+        
+        Each settlement is {'duel_id': str, 'fields': {attr: value}, 'xp': {username: amount}}.
+        Returns the ids of the duels that were settled by this call; duels already
+        completed elsewhere are skipped without awarding XP again.
+        """
+        if not DUELS_TABLE or not USERS_TABLE:
+            raise Exception("Tables not configured")
+        
+        # Pack settlements into groups that fit within one transaction
+        groups: List[List[Dict]] = []
+        group: List[Dict] = []
+        group_users: set = set()
+        for settlement in settlements:
+            users = {username.lower() for username, amount in settlement['xp'].items() if amount}
+            if group and len(group) + 1 + len(group_users | users) > MAX_TRANSACTION_ACTIONS:
+                groups.append(group)
+                group, group_users = [], set()
+            group.append(settlement)
+            group_users |= users
+        if group:
+            groups.append(group)
+        
+        settled = []
+        for group in groups:
+            if DuelOperations._commit_settlements(group):
+                settled.extend(settlement['duel_id'] for settlement in group)
+                for settlement in group:
+                    DuelOperations._apply_settlement(settlement)
+                continue
+            
+            if len(group) == 1:
+                continue  # Already settled elsewhere
+            
+            # Something in the group was already settled - retry the duels one by one
+            for settlement in group:
+                if DuelOperations._commit_settlements([settlement]):
+                    settled.append(settlement['duel_id'])
+                    DuelOperations._apply_settlement(settlement)
+                elif DEBUG_MODE:
+                    print(f"[DEBUG] Duel {settlement['duel_id']} was already settled")
+        
+        return settled
+    
+    @staticmethod
+    def filter_duels(duels: List[Dict], username: str, status: Optional[str] = None,
+                     since: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+        """Select a user's normalized duels, newest first, by optional status and createdAt >= since"""
+        normalized_username = username.lower()
+        selected = [
+            duel for duel in duels
+            if normalized_username in (duel.get('challenger'), duel.get('challengee'))
+            and (not status or duel.get('status') == status)
+            and (not since or duel.get('createdAt', '') >= since)
+        ]
+        selected.sort(key=lambda duel: duel.get('createdAt', ''), reverse=True)
+        return selected[:limit] if limit else selected
+    
+    @staticmethod
+    def _participant_duels(index_name: str, role: str, username: str, status: Optional[str],
+                           since: Optional[str], limit: Optional[int]) -> List[Dict]:
+        """Raw duels from one participant index, newest first"""
+        key_condition = f'{role} = :username'
+        values = {':username': {'S': username}}
+        if since:
+            key_condition += ' AND createdAt >= :since'
+            values[':since'] = {'S': since}
+        
+        params = {
+            'IndexName': index_name,
+            'KeyConditionExpression': key_condition,
+            'ExpressionAttributeValues': values,
+            'ScanIndexForward': False
+        }
+        if status:
+            params['FilterExpression'] = '#status = :status'
+            params['ExpressionAttributeNames'] = {'#status': 'status'}
+            values[':status'] = {'S': status}
+        
+        # Limit is applied before the status filter server-side, so stop client-side instead
+        return list(islice(query_items(DUELS_TABLE, **params), limit))
+    
+    @staticmethod
+    def get_user_duels(username: str, status: Optional[str] = None,
+                       since: Optional[str] = None, limit: Optional[int] = None) -> Dict:
+        """Get duels for a user, newest first, optionally by status and createdAt >= since"""
         try:
             if not DUELS_TABLE:
                 raise Exception("DUELS_TABLE not configured")
             
             normalized_username = username.lower()
             
-            # Get user's duels
-            scan_params = {
-                'TableName': DUELS_TABLE,
-                'FilterExpression': 'challenger = :username OR challengee = :username',
-                'ExpressionAttributeValues': {':username': {'S': normalized_username}}
-            }
-            
             try:
-                scan_result = ddb.scan(**scan_params)
-                raw_duels = scan_result.get('Items', [])
-                
-                # Normalize DynamoDB data for duels
-                duels = [normalize_dynamodb_item(duel) for duel in raw_duels]
-                    
-            except Exception as scan_error:
+                # Query both participant indexes; each is bounded by the user's own history
+                raw_duels = (
+                    DuelOperations._participant_duels(CHALLENGER_INDEX, 'challenger', normalized_username, status, since, limit)
+                    + DuelOperations._participant_duels(CHALLENGEE_INDEX, 'challengee', normalized_username, status, since, limit)
+                )
+            except Exception as gsi_error:
                 if DEBUG_MODE:
-                    print(f"[ERROR] Duel scan failed: {scan_error}")
-                duels = []
+                    print(f"[DEBUG] Participant index query failed, falling back to scan: {gsi_error}")
+                
+                # Fall back to scan + filter
+                scan_params = {
+                    'FilterExpression': 'challenger = :username OR challengee = :username',
+                    'ExpressionAttributeValues': {':username': {'S': normalized_username}}
+                }
+                
+                try:
+                    raw_duels = scan_all(DUELS_TABLE, DDB_SCAN_SEGMENTS, **scan_params)
+                except Exception as scan_error:
+                    if DEBUG_MODE:
+                        print(f"[ERROR] Duel scan failed: {scan_error}")
+                    raw_duels = []
             
-            return {"success": True, "data": duels}
+            # Normalize, drop the duplicate of a self-duel and merge the two newest-first lists
+            duels = list({duel['duelId']: duel for duel in map(normalize_dynamodb_item, raw_duels)}.values())
+            return {"success": True, "data": DuelOperations.filter_duels(duels, normalized_username, status, since, limit)}
             
         except Exception as error:
             if DEBUG_MODE:
@@ -976,6 +1678,7 @@ class DuelOperations:
             duel_id = str(uuid.uuid4())
             normalized_username = username.lower()
             normalized_opponent = opponent.lower()
+            created_at = datetime.now(timezone.utc).isoformat()
             
             # Create duel record
             put_params = {
@@ -986,7 +1689,9 @@ class DuelOperations:
                     'challengee': {'S': normalized_opponent},
                     'problemSlug': {'S': problem_slug},
                     'status': {'S': 'PENDING'},
-                    'createdAt': {'S': datetime.now(timezone.utc).isoformat()},
+                    'createdAt': {'S': created_at},
+                    'openStatus': {'S': 'PENDING'},
+                    'openSince': {'S': created_at},
                     'expires_at': {'N': str(int(time.time()) + 3600)},  # 1 hour
                     'challengerTime': {'N': '-1'},  # -1 means not started
                     'challengeeTime': {'N': '-1'}   # -1 means not started
@@ -998,6 +1703,8 @@ class DuelOperations:
                 put_params['Item']['difficulty'] = {'S': difficulty}
             
             ddb.put_item(**put_params)
+            DuelOperations._remember_roles(put_params['Item'])
+            notify_write(ItemWrite(DUELS_TABLE, duel_id, normalize_dynamodb_item(put_params['Item']), complete=True))
             
             duel_action(f"Created duel {duel_id}", challenger=normalized_username, challengee=normalized_opponent, problem=problem_slug)
             
@@ -1019,15 +1726,17 @@ class DuelOperations:
             update_params = {
                 'TableName': DUELS_TABLE,
                 'Key': {'duelId': {'S': duel_id}},
-                'UpdateExpression': 'SET #status = :status, acceptedAt = :acceptedAt',
+                'UpdateExpression': 'SET #status = :status, openStatus = :status, acceptedAt = :acceptedAt, openSince = :acceptedAt',
                 'ExpressionAttributeNames': {'#status': 'status'},
                 'ExpressionAttributeValues': {
                     ':status': {'S': 'ACCEPTED'},
                     ':acceptedAt': {'S': datetime.now(timezone.utc).isoformat()}
-                }
+                },
+                'ReturnValues': 'UPDATED_NEW'
             }
             
-            ddb.update_item(**update_params)
+            response = ddb.update_item(**update_params)
+            notify_write(ItemWrite(DUELS_TABLE, duel_id, normalize_dynamodb_item(response.get('Attributes', {}))))
             
             duel_action(f"User {username} accepted duel {duel_id}")
             
@@ -1047,42 +1756,33 @@ class DuelOperations:
             
             normalized_username = username.lower()
             
-            # First get the duel to determine if user is challenger or challengee
-            get_params = {
-                'TableName': DUELS_TABLE,
-                'Key': {'duelId': {'S': duel_id}}
-            }
-            
-            response = ddb.get_item(**get_params)
-            if 'Item' not in response:
-                raise Exception("Duel not found")
-            
-            duel = response['Item']
-            challenger = duel.get('challenger', {}).get('S')
-            challengee = duel.get('challengee', {}).get('S')
-            
-            # Determine which time field to update
-            if normalized_username == challenger:
-                time_field = 'challengerTime'
-            elif normalized_username == challengee:
-                time_field = 'challengeeTime'
-            else:
-                raise Exception("User is not part of this duel")
-            
-            # Update the user's time to 0 and set status to ACTIVE (only first time)
-            update_params = {
+            # Set the user's time to 0 and the status to ACTIVE (start time only the first time),
+            # unless the duel is over or the user already submitted
+            role, duel_item, old_item = DuelOperations._update_as_participant(duel_id, normalized_username, lambda role: {
                 'TableName': DUELS_TABLE,
                 'Key': {'duelId': {'S': duel_id}},
-                'UpdateExpression': f'SET {time_field} = :time, #status = :status, startTime = if_not_exists(startTime, :startTime)',
+                'UpdateExpression': (
+                    f'SET {role}Time = :time, #status = :status, openStatus = :status, '
+                    'startTime = if_not_exists(startTime, :startTime), openSince = if_not_exists(startTime, :startTime)'
+                ),
+                'ConditionExpression': f'#status <> :completed AND (attribute_not_exists({role}Time) OR {role}Time <= :time)',
                 'ExpressionAttributeNames': {'#status': 'status'},
                 'ExpressionAttributeValues': {
                     ':time': {'N': '0'},
                     ':status': {'S': 'ACTIVE'},
+                    ':completed': {'S': 'COMPLETED'},
                     ':startTime': {'S': datetime.now(timezone.utc).isoformat()}
                 }
-            }
+            })
             
-            ddb.update_item(**update_params)
+            if duel_item is None:
+                if old_item is None:
+                    raise Exception("Duel not found")
+                if role is None:
+                    raise Exception("User is not part of this duel")
+                if old_item.get('status', {}).get('S') == 'COMPLETED':
+                    raise Exception("Duel already completed")
+                raise Exception("User already submitted a time for this duel")
             
             duel_action(f"User {username} started duel {duel_id}")
             
@@ -1107,6 +1807,7 @@ class DuelOperations:
             }
             
             ddb.delete_item(**delete_params)
+            notify_write(ItemWrite(DUELS_TABLE, duel_id, deleted=True))
             
             if DEBUG_MODE:
                 print(f"[DEBUG] Duel {duel_id} rejected and deleted")
@@ -1127,115 +1828,52 @@ class DuelOperations:
             
             normalized_username = username.lower()
             
-            # Get current duel details
-            get_params = {
-                'TableName': DUELS_TABLE,
-                'Key': {'duelId': {'S': duel_id}}
-            }
-            
-            get_result = ddb.get_item(**get_params)
-            if 'Item' not in get_result:
-                return {"success": False, "error": "Duel not found"}
+            if elapsed_ms <= 0:
+                return {"success": False, "error": "Elapsed time must be positive"}
             
-            duel_item = get_result['Item']
-            challenger = duel_item.get('challenger', {}).get('S')
-            challengee = duel_item.get('challengee', {}).get('S')
-            current_status = duel_item.get('status', {}).get('S')
-            
-            # Don't allow submissions on already completed duels
-            if current_status == 'COMPLETED':
-                return {"success": False, "error": "Duel already completed"}
-            
-            # Determine if user is challenger or challengee
-            is_challenger = normalized_username == challenger
-            if not is_challenger and normalized_username != challengee:
-                return {"success": False, "error": "User not part of this duel"}
-            
-            # Get existing times
-            current_challenger_time = duel_item.get('challengerTime', {}).get('N')
-            current_challengee_time = duel_item.get('challengeeTime', {}).get('N')
-            
-            # Don't overwrite if user already has a time recorded
-            if is_challenger and current_challenger_time and current_challenger_time != '0':
-                return {"success": False, "error": "Challenger time already recorded"}
-            if not is_challenger and current_challengee_time and current_challengee_time != '0':
-                return {"success": False, "error": "Challengee time already recorded"}
-            
-            # Update the appropriate user's time
-            if is_challenger:
-                update_expression = 'SET challengerTime = :time'
-                expression_values = {':time': {'N': str(elapsed_ms)}}
-                new_challenger_time = elapsed_ms
-                new_challengee_time = int(current_challengee_time) if current_challengee_time and current_challengee_time != '0' else None
-            else:
-                update_expression = 'SET challengeeTime = :time'
-                expression_values = {':time': {'N': str(elapsed_ms)}}
-                new_challenger_time = int(current_challenger_time) if current_challenger_time and current_challenger_time != '0' else None
-                new_challengee_time = elapsed_ms
-            
-            # Update the time
-            update_params = {
+            # Record the time only for a participant, on an unfinished duel, if not recorded yet
+            # (0 means started and -1 not started; only a positive time counts as recorded)
+            role, duel_item, old_item = DuelOperations._update_as_participant(duel_id, normalized_username, lambda role: {
                 'TableName': DUELS_TABLE,
                 'Key': {'duelId': {'S': duel_id}},
-                'UpdateExpression': update_expression,
-                'ExpressionAttributeValues': expression_values
-            }
-            
-            ddb.update_item(**update_params)
+                'UpdateExpression': f'SET {role}Time = :time',
+                'ConditionExpression': f'#status <> :completed AND (attribute_not_exists({role}Time) OR {role}Time <= :zero)',
+                'ExpressionAttributeNames': {'#status': 'status'},
+                'ExpressionAttributeValues': {
+                    ':time': {'N': str(elapsed_ms)},
+                    ':completed': {'S': 'COMPLETED'},
+                    ':zero': {'N': '0'}
+                }
+            })
+            
+            if duel_item is None:
+                if old_item is None:
+                    return {"success": False, "error": "Duel not found"}
+                if old_item.get('status', {}).get('S') == 'COMPLETED':
+                    return {"success": False, "error": "Duel already completed"}
+                if role is None:
+                    return {"success": False, "error": "User not part of this duel"}
+                return {"success": False, "error": f"{role.capitalize()} time already recorded"}
+            
+            # The updated item carries both sides' times, so no second read is needed
+            challenger = duel_item.get('challenger', {}).get('S')
+            challengee = duel_item.get('challengee', {}).get('S')
+            challenger_time = int(duel_item.get('challengerTime', {}).get('N', '0'))
+            challengee_time = int(duel_item.get('challengeeTime', {}).get('N', '0'))
             
-            # Check if we should complete the duel (both users have times or one user completed and timeout passed)
+            # Complete the duel once both users have times; with one time the background job handles timeouts
             should_complete_duel = False
             winner = None
-            xp_award = 25  # Base XP for participation
-            
-            if new_challenger_time is not None and new_challengee_time is not None:
-                # Both users completed - determine winner
-                should_complete_duel = True
-                if new_challenger_time < new_challengee_time:
-                    winner = challenger
-                    xp_award = 50  # Winner gets more XP
-                elif new_challengee_time < new_challenger_time:
-                    winner = challengee
-                    xp_award = 50  # Winner gets more XP
-                else:
-                    # Tie - both get winner XP
-                    winner = None  # No single winner
-                    xp_award = 50
-                    
-            elif (new_challenger_time is not None or new_challengee_time is not None):
-                # Only one user completed - check if enough time has passed for timeout
-                # For now, don't auto-complete. Let background job handle timeouts
-                should_complete_duel = False
-            
-            if should_complete_duel:
-                # Complete the duel
-                complete_params = {
-                    'TableName': DUELS_TABLE,
-                    'Key': {'duelId': {'S': duel_id}},
-                    'UpdateExpression': 'SET #status = :status, winner = :winner, xpAwarded = :xp, completedAt = :completed',
-                    'ExpressionAttributeNames': {'#status': 'status'},
-                    'ExpressionAttributeValues': {
-                        ':status': {'S': 'COMPLETED'},
-                        ':winner': {'S': winner} if winner else {'NULL': True},
-                        ':xp': {'N': str(xp_award)},
-                        ':completed': {'S': datetime.now(timezone.utc).isoformat()}
-                    }
-                }
-                
-                ddb.update_item(**complete_params)
-                
-                # Award XP to participants
-                if winner:
-                    UserOperations.award_xp(winner, xp_award)
-                    # Award participation XP to loser
-                    loser = challengee if winner == challenger else challenger
-                    UserOperations.award_xp(loser, 25)
-                else:
-                    # Tie - both get winner XP
-                    UserOperations.award_xp(challenger, xp_award)
-                    UserOperations.award_xp(challengee, xp_award)
+            if challenger_time > 0 and challengee_time > 0:
+                # Complete the duel and award XP in a single transaction
+                settlement = DuelOperations._finished_settlement(duel_id, challenger, challengee, challenger_time, challengee_time)
+                winner = settlement['fields']['winner']
+                settled = DuelOperations.settle_duels([settlement])
                 
-                duel_action(f"Duel {duel_id} completed", winner=winner or 'TIE')
+                # A concurrent submission or the timeout sweeper may have settled it first
+                should_complete_duel = bool(settled)
+                if should_complete_duel:
+                    duel_action(f"Duel {duel_id} completed", winner=winner or 'TIE')
             
             duel_action(f"User {normalized_username} recorded time", duel_id=duel_id, time_ms=elapsed_ms)
             
@@ -1263,6 +1901,7 @@ class DuelOperations:
                 return {"success": False, "error": "Duel not found"}
             
             duel_item = result['Item']
+            DuelOperations._remember_roles(duel_item)
             duel = {
                 'duelId': duel_item.get('duelId', {}).get('S'),
                 'challenger': duel_item.get('challenger', {}).get('S'),
@@ -1293,27 +1932,15 @@ class DuelOperations:
             if not DUELS_TABLE:
                 raise Exception("DUELS_TABLE not configured")
             
-            now = int(time.time())
-            three_hours_ago = now - 3 * 60 * 60  # 3 hours for pending duels
-            two_hours_ago = now - 2 * 60 * 60    # 2 hours for active duels
+            now = datetime.now(timezone.utc)
+            three_hours_ago = (now - timedelta(hours=3)).isoformat()  # 3 hours for pending duels
+            two_hours_ago = (now - timedelta(hours=2)).isoformat()    # 2 hours for active duels
             
-            # Scan for expired duels
-            scan_params = {
-                'TableName': DUELS_TABLE,
-                'FilterExpression': '(#status = :pending AND createdAt < :threeHoursAgo) OR (#status = :active AND startTime < :twoHoursAgo)',
-                'ExpressionAttributeNames': {
-                    '#status': 'status',
-                },
-                'ExpressionAttributeValues': {
-                    ':pending': {'S': 'PENDING'},
-                    ':active': {'S': 'ACTIVE'},
-                    ':threeHoursAgo': {'S': datetime.fromtimestamp(three_hours_ago).isoformat()},
-                    ':twoHoursAgo': {'S': datetime.fromtimestamp(two_hours_ago).isoformat()},
-                },
-            }
-            
-            scan_result = ddb.scan(**scan_params)
-            expired_duels = scan_result.get('Items', [])
+            # Query the status index for expired duels only
+            expired_duels = (
+                DuelOperations._open_duels_since('PENDING', three_hours_ago, 'createdAt', ['duelId', 'status'])
+                + DuelOperations._open_duels_since('ACTIVE', two_hours_ago, 'startTime', ['duelId', 'status'])
+            )
             
             if expired_duels:
                 if DEBUG_MODE:
@@ -1326,6 +1953,7 @@ class DuelOperations:
                         'Key': {'duelId': duel['duelId']},
                     }
                     ddb.delete_item(**delete_params)
+                    notify_write(ItemWrite(DUELS_TABLE, duel['duelId']['S'], deleted=True))
                     
                     if DEBUG_MODE:
                         print(f"[DEBUG] Deleted expired duel: {duel['duelId']['S']} (status: {duel['status']['S']})")
@@ -1341,26 +1969,19 @@ class DuelOperations:
             raise error
     
     @staticmethod
-    async def handle_duel_timeouts() -> Dict:
+    def handle_duel_timeouts() -> Dict:
         """Handle duel timeouts - complete duels where only one person solved and timeout period passed"""
         try:
             if not DUELS_TABLE:
                 raise Exception("DUELS_TABLE not configured")
             
-            # Get all active duels
-            scan_params = {
-                'TableName': DUELS_TABLE,
-                'FilterExpression': '#status = :active',
-                'ExpressionAttributeNames': {'#status': 'status'},
-                'ExpressionAttributeValues': {':active': {'S': 'ACTIVE'}}
-            }
-            
-            scan_result = ddb.scan(**scan_params)
-            active_duels = scan_result.get('Items', [])
-            
             now = int(time.time())
             timeout_threshold = 30 * 60  # 30 minutes after one person solves
-            completed_duels = 0
+            settlements = []
+            
+            # Only active duels started before the shortest timeout can be due
+            due_before = datetime.fromtimestamp(now - timeout_threshold, tz=timezone.utc).isoformat()
+            active_duels = DuelOperations._open_duels_since('ACTIVE', due_before, 'startTime', DUEL_TIMEOUT_ATTRIBUTES)
             
             for duel_item in active_duels:
                 duel_id = duel_item.get('duelId', {}).get('S')
@@ -1368,17 +1989,18 @@ class DuelOperations:
                 challengee = duel_item.get('challengee', {}).get('S')
                 start_time_str = duel_item.get('startTime', {}).get('S')
                 
-                challenger_time = duel_item.get('challengerTime', {}).get('N')
-                challengee_time = duel_item.get('challengeeTime', {}).get('N')
+                # Only a positive time is a submission (0 = started, -1 = not started)
+                challenger_time = int(duel_item.get('challengerTime', {}).get('N', '0'))
+                challengee_time = int(duel_item.get('challengeeTime', {}).get('N', '0'))
+                challenger_completed = challenger_time > 0
+                challengee_completed = challengee_time > 0
                 
-                # Skip if both already have times (should have been completed already)
-                if challenger_time and challenger_time != '0' and challengee_time and challengee_time != '0':
+                # Both submitted but the submission's settlement didn't commit - settle it as a finished duel
+                if challenger_completed and challengee_completed:
+                    duel_action(f"Completing finished duel {duel_id} left unsettled")
+                    settlements.append(DuelOperations._finished_settlement(duel_id, challenger, challengee, challenger_time, challengee_time))
                     continue
                 
-                # Check if only one person has completed
-                challenger_completed = challenger_time and challenger_time != '0'
-                challengee_completed = challengee_time and challengee_time != '0'
-                
                 if challenger_completed or challengee_completed:
                     # Someone completed - check if enough time has passed for timeout
                     if start_time_str:
@@ -1391,29 +2013,17 @@ class DuelOperations:
                             loser = challengee if challenger_completed else challenger
                             duel_action(f"Completing duel {duel_id} due to timeout", winner=winner, loser=loser)
                             
-                            complete_params = {
-                                'TableName': DUELS_TABLE,
-                                'Key': {'duelId': {'S': duel_id}},
-                                'UpdateExpression': 'SET #status = :status, winner = :winner, xpAwarded = :xp, completedAt = :completed, completionReason = :reason',
-                                'ExpressionAttributeNames': {'#status': 'status'},
-                                'ExpressionAttributeValues': {
-                                    ':status': {'S': 'COMPLETED'},
-                                    ':winner': {'S': winner},
-                                    ':xp': {'N': '75'},  # Winner by timeout gets bonus XP
-                                    ':completed': {'S': datetime.now(timezone.utc).isoformat()},
-                                    ':reason': {'S': 'TIMEOUT'}
-                                }
-                            }
-                            
-                            ddb.update_item(**complete_params)
-                            
-                            # Award XP
-                            UserOperations.award_xp(winner, 75)  # Winner gets more for persistence
-                            UserOperations.award_xp(loser, 15)   # Loser gets something for participation
-                            
-                            completed_duels += 1
-                            if DEBUG_MODE:
-                                print(f"[DEBUG] Completed duel {duel_id} due to timeout. Winner: {winner}")
+                            settlements.append({
+                                'duel_id': duel_id,
+                                'fields': {
+                                    'winner': winner,
+                                    'xpAwarded': 75,  # Winner by timeout gets bonus XP
+                                    'completedAt': datetime.now(timezone.utc).isoformat(),
+                                    'completionReason': 'TIMEOUT'
+                                },
+                                # Winner gets more for persistence, loser gets something for participation
+                                'xp': {winner: 75, loser: 15}
+                            })
                 
                 # Also handle cases where no one solved and total duel time exceeded (2 hours)
                 elif start_time_str:
@@ -1423,26 +2033,55 @@ class DuelOperations:
                     
                     if time_since_start > max_duel_time:
                         # End duel with no winner
-                        complete_params = {
-                            'TableName': DUELS_TABLE,
-                            'Key': {'duelId': {'S': duel_id}},
-                            'UpdateExpression': 'SET #status = :status, completedAt = :completed, completionReason = :reason',
-                            'ExpressionAttributeNames': {'#status': 'status'},
-                            'ExpressionAttributeValues': {
-                                ':status': {'S': 'COMPLETED'},
-                                ':completed': {'S': datetime.now(timezone.utc).isoformat()},
-                                ':reason': {'S': 'EXPIRED'}
-                            }
-                        }
-                        
-                        ddb.update_item(**complete_params)
-                        completed_duels += 1
-                        if DEBUG_MODE:
-                            print(f"[DEBUG] Expired duel {duel_id} - no winner")
-            
-            return {"success": True, "completed_duels": completed_duels}
+                        settlements.append({
+                            'duel_id': duel_id,
+                            'fields': {
+                                'completedAt': datetime.now(timezone.utc).isoformat(),
+                                'completionReason': 'EXPIRED'
+                            },
+                            'xp': {}
+                        })
+            
+            # Settle every due duel in grouped transactions
+            settled = DuelOperations.settle_duels(settlements) if settlements else []
+            if DEBUG_MODE and settled:
+                print(f"[DEBUG] Settled {len(settled)} timed-out duels: {settled}")
+            
+            return {"success": True, "due_duels": len(active_duels), "completed_duels": len(settled)}
             
         except Exception as error:
             if DEBUG_MODE:
                 print(f"[ERROR] Failed to handle duel timeouts: {error}")
-            return {"success": False, "error": str(error)}
\ No newline at end of file
+            return {"success": False, "error": str(error)}
+
+
+# Coalesces award_xp writes; flushed in batches of one transaction each
+xp_accumulator = XPAccumulator(UserOperations.apply_xp_increments, MAX_TRANSACTION_ACTIONS, transaction_retryable)
+
+
+class AsyncOperations:
+    """Awaitable view over an operations class - every call runs on the DynamoDB executor"""
+    
+    def __init__(self, operations):
+        self._operations = operations
+    
+    def __getattr__(self, name):
+        operation = getattr(self._operations, name)
+        if not callable(operation):
+            return operation
+        
+        @functools.wraps(operation)
+        async def run(*args, **kwargs):
+            return await run_db(operation, *args, **kwargs)
+        
+        # Memoize so repeated lookups skip __getattr__
+        setattr(self, name, run)
+        return run
+
+
+AsyncUserOperations = AsyncOperations(UserOperations)
+AsyncVerificationOperations = AsyncOperations(VerificationOperations)
+AsyncGroupOperations = AsyncOperations(GroupOperations)
+AsyncDailyProblemOperations = AsyncOperations(DailyProblemOperations)
+AsyncBountyOperations = AsyncOperations(BountyOperations)
+AsyncDuelOperations = AsyncOperations(DuelOperations)
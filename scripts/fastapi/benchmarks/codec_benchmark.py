@@ -0,0 +1,119 @@
+"""
+Micro-benchmark for DynamoDB item deserialization
+
+Compares dynamodb_codec.deserialize_item against the previous recursive
+normalize_dynamodb_item on realistic user, duel and daily-problem items.
+Run from scripts/fastapi:  python -m benchmarks.codec_benchmark
+"""
+
+import argparse
+import timeit
+from typing import Callable, Dict, List
+
+from dynamodb_codec import deserialize_item, serialize_item
+
+
+def legacy_normalize_dynamodb_item(item: Dict) -> Dict:
+    """The pre-codec implementation, kept verbatim as the baseline"""
+    normalized = {}
+    for key, value in item.items():
+        if isinstance(value, dict):
+            if 'S' in value:
+                normalized[key] = value['S']
+            elif 'N' in value:
+                normalized[key] = int(float(value['N']))
+            elif 'BOOL' in value:
+                normalized[key] = value['BOOL']
+            elif 'M' in value:
+                normalized[key] = legacy_normalize_dynamodb_item(value['M'])
+            elif 'L' in value:
+                normalized[key] = [legacy_normalize_dynamodb_item(item) if isinstance(item, dict) else item for item in value['L']]
+            elif 'SS' in value:
+                normalized[key] = value['SS']
+            else:
+                normalized[key] = value
+        else:
+            normalized[key] = value
+    return normalized
+
+
+def user_item(index: int = 0) -> Dict:
+    return {
+        'username': {'S': f'user{index}'},
+        'email': {'S': f'user{index}@example.edu'},
+        'display_name': {'S': f'User {index}'},
+        'university': {'S': 'University of Somewhere'},
+        'group_id': {'S': '48213'},
+        'easy': {'N': '142'},
+        'medium': {'N': '87'},
+        'hard': {'N': '19'},
+        'today': {'N': '1'},
+        'xp': {'N': '1375'},
+        'current_streak': {'N': '12'},
+        'longest_streak': {'N': '30'},
+        'last_completed_date': {'S': '2025-07-14'},
+        'created_at': {'S': '2025-01-03T18:22:41.512934+00:00'},
+        'updated_at': {'S': '2025-07-14T09:01:12.004512+00:00'},
+    }
+
+
+def duel_item(index: int = 0) -> Dict:
+    return {
+        'duelId': {'S': f'0b7c1e9a-4f4e-4a53-9d6a-{index:012d}'},
+        'challenger': {'S': 'alice'},
+        'challengee': {'S': 'bob'},
+        'problemSlug': {'S': 'two-sum'},
+        'difficulty': {'S': 'Easy'},
+        'status': {'S': 'COMPLETED'},
+        'createdAt': {'S': '2025-07-14T09:01:12.004512+00:00'},
+        'startTime': {'S': '2025-07-14T09:03:40.114220+00:00'},
+        'expires_at': {'N': '1752487272'},
+        'challengerTime': {'N': '412233'},
+        'challengeeTime': {'N': '530871'},
+        'winner': {'S': 'alice'},
+        'xpAwarded': {'N': '50'},
+        'completedAt': {'S': '2025-07-14T09:12:31.870021+00:00'},
+    }
+
+
+def daily_problem_item(completions: int = 2000) -> Dict:
+    return {
+        'date': {'S': '2025-07-14'},
+        'slug': {'S': 'longest-substring-without-repeating-characters'},
+        'title': {'S': 'Longest Substring Without Repeating Characters'},
+        'frontendId': {'S': '3'},
+        'difficulty': {'S': 'Medium'},
+        'tags': {'L': [{'S': 'Hash Table'}, {'S': 'String'}, {'S': 'Sliding Window'}]},
+        'content': {'S': '<p>Given a string <code>s</code>, find the length of the longest substring.</p>' * 40},
+        'users': {'M': {f'user{index}': {'BOOL': True} for index in range(completions)}},
+    }
+
+
+def _time(func: Callable, items: List[Dict], repeat: int, number: int) -> float:
+    """Best-of-repeat seconds per item"""
+    best = min(timeit.repeat(lambda: [func(item) for item in items], repeat=repeat, number=number))
+    return best / (number * len(items))
+
+
+def run(repeat: int = 5, number: int = 20) -> None:
+    workloads = {
+        'user': [user_item(index) for index in range(500)],
+        'duel': [duel_item(index) for index in range(500)],
+        'daily_problem': [daily_problem_item() for _ in range(5)],
+    }
+
+    print(f"{'workload':<15}{'legacy (us)':>14}{'codec (us)':>14}{'speedup':>10}{'round-trip (us)':>18}")
+    for name, items in workloads.items():
+        legacy = _time(legacy_normalize_dynamodb_item, items, repeat, number)
+        codec = _time(deserialize_item, items, repeat, number)
+        plain = [deserialize_item(item) for item in items]
+        round_trip = _time(lambda item: deserialize_item(serialize_item(item)), plain, repeat, number)
+        print(f"{name:<15}{legacy * 1e6:>14.2f}{codec * 1e6:>14.2f}{legacy / codec:>9.2f}x{round_trip * 1e6:>18.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+    run(args.repeat, args.number)
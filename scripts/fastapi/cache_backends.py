@@ -0,0 +1,272 @@
+"""
+Shared cache tier for running several server workers
+
+The cache manager keeps a per-process copy of every entry (L1). A backend
+adds a second tier (L2) that every worker on the host or cluster reads and
+writes, a short lock so only one worker loads a missing key from DynamoDB,
+and a channel that broadcasts invalidations and item writes to the others.
+
+CACHE_BACKEND selects it:
+- memory: no shared tier; each process caches on its own (the default)
+- sqlite: one SQLite file on tmpfs (CACHE_SQLITE_PATH) for workers on one host
+- redis: a Redis server (CACHE_REDIS_URL) for any number of hosts; needs the redis package
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from logger import debug, warning
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+CACHE_NAMESPACE = os.getenv("CACHE_NAMESPACE", "yeetcode-cache")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", "/dev/shm/yeetcode-cache.sqlite3")
+CACHE_BROADCAST_POLL_INTERVAL = float(os.getenv("CACHE_BROADCAST_POLL_INTERVAL", "0.5"))
+
+# (data, loaded at, ttl) as stored by the loading worker
+SharedEntry = Tuple[Any, float, int]
+MessageHandler = Callable[[Dict], None]
+
+
+def _encode(value: Any) -> str:
+    return json.dumps(value, separators=(',', ':'), default=str)
+
+
+class SharedCacheBackend(ABC):
+    """Cross-process cache tier; subclasses store entries, hold load locks and broadcast messages"""
+    
+    def __init__(self):
+        self.origin = uuid.uuid4().hex  # Identifies this process's own broadcasts
+        self._handler: Optional[MessageHandler] = None
+    
+    @abstractmethod
+    def get(self, key: str) -> Optional[SharedEntry]:
+        ...
+    
+    @abstractmethod
+    def set(self, key: str, data: Any, timestamp: float, ttl: int, retention: int) -> None:
+        """Store an entry; the backend may drop it after retention seconds"""
+    
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+    
+    @abstractmethod
+    def delete_all(self, base_key: str) -> None:
+        """Delete base_key and every key under it (base_key:identifier)"""
+    
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+    
+    @abstractmethod
+    def acquire_lock(self, key: str, seconds: float) -> Optional[str]:
+        """Token for a lock on loading key, or None if another worker holds it"""
+    
+    @abstractmethod
+    def release_lock(self, key: str, token: str) -> None:
+        ...
+    
+    @abstractmethod
+    def publish(self, message: Dict) -> None:
+        """Send message to every other worker"""
+    
+    @abstractmethod
+    def subscribe(self, handler: MessageHandler) -> None:
+        """Call handler(message) for every message another worker publishes"""
+    
+    def close(self) -> None:
+        pass
+    
+    def _deliver(self, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+            if message.get('origin') != self.origin and self._handler is not None:
+                self._handler(message)
+        except Exception as delivery_error:
+            warning(f"[CACHE] Dropped broadcast message: {delivery_error}")
+
+
+class RedisBackend(SharedCacheBackend):
+    """Entries as JSON strings with a TTL, SET NX locks and a pub/sub channel"""
+    
+    # Delete a lock only while it still holds our token, so an expired lock retaken by another worker survives
+    _RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+    
+    def __init__(self, url: str = CACHE_REDIS_URL, namespace: str = CACHE_NAMESPACE):
+        super().__init__()
+        if redis is None:
+            raise Exception("CACHE_BACKEND=redis requires the redis package")
+        self._client = redis.Redis.from_url(url)
+        self._namespace = namespace
+        self._channel = f"{namespace}:broadcast"
+        self._release = self._client.register_script(self._RELEASE_SCRIPT)
+        self._listener = None
+    
+    def _key(self, key: str) -> str:
+        return f"{self._namespace}:entry:{key}"
+    
+    def get(self, key: str) -> Optional[SharedEntry]:
+        payload = self._client.get(self._key(key))
+        if payload is None:
+            return None
+        entry = json.loads(payload)
+        return entry['data'], entry['timestamp'], entry['ttl']
+    
+    def set(self, key: str, data: Any, timestamp: float, ttl: int, retention: int) -> None:
+        payload = _encode({'data': data, 'timestamp': timestamp, 'ttl': ttl})
+        self._client.set(self._key(key), payload, ex=max(1, int(retention)))
+    
+    def delete(self, key: str) -> None:
+        self._client.delete(self._key(key))
+    
+    def delete_all(self, base_key: str) -> None:
+        keys = [self._key(base_key)]
+        keys.extend(self._client.scan_iter(match=f"{self._key(base_key)}:*", count=500))
+        self._client.delete(*keys)
+    
+    def clear(self) -> None:
+        keys = list(self._client.scan_iter(match=f"{self._namespace}:entry:*", count=500))
+        if keys:
+            self._client.delete(*keys)
+    
+    def acquire_lock(self, key: str, seconds: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        if self._client.set(f"{self._namespace}:lock:{key}", token, nx=True, px=int(seconds * 1000)):
+            return token
+        return None
+    
+    def release_lock(self, key: str, token: str) -> None:
+        self._release(keys=[f"{self._namespace}:lock:{key}"], args=[token])
+    
+    def publish(self, message: Dict) -> None:
+        self._client.publish(self._channel, _encode({**message, 'origin': self.origin}))
+    
+    def subscribe(self, handler: MessageHandler) -> None:
+        self._handler = handler
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{self._channel: lambda message: self._deliver(message['data'])})
+        self._listener = pubsub.run_in_thread(sleep_time=1, daemon=True)
+    
+    def close(self) -> None:
+        if self._listener is not None:
+            self._listener.stop()
+        self._client.close()
+
+
+class SQLiteBackend(SharedCacheBackend):
+    """One SQLite database on tmpfs shared by the workers on a host; broadcasts are polled from a log table"""
+    
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS locks (key TEXT PRIMARY KEY, token TEXT NOT NULL, expires_at REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS broadcasts (id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL, created_at REAL NOT NULL)",
+    )
+    # Broadcasts older than this are pruned; a worker that stalls longer misses them and relies on TTLs
+    BROADCAST_RETENTION_SECONDS = 60
+    
+    def __init__(self, path: str = CACHE_SQLITE_PATH, poll_interval: float = CACHE_BROADCAST_POLL_INTERVAL):
+        super().__init__()
+        self._poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=OFF")  # tmpfs: nothing to make durable
+        for statement in self._SCHEMA:
+            self._connection.execute(statement)
+        self._last_broadcast = self._query("SELECT COALESCE(MAX(id), 0) FROM broadcasts")[0][0]
+        self._stop_event = threading.Event()
+        self._poller: Optional[threading.Thread] = None
+    
+    def _execute(self, statement: str, parameters: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._connection.execute(statement, parameters)
+    
+    def _query(self, statement: str, parameters: tuple = ()) -> List[tuple]:
+        # Rows are fetched under the lock too: the connection is shared by every thread
+        with self._lock:
+            return self._connection.execute(statement, parameters).fetchall()
+    
+    def get(self, key: str) -> Optional[SharedEntry]:
+        rows = self._query("SELECT payload FROM entries WHERE key = ? AND expires_at > ?", (key, time.time()))
+        if not rows:
+            return None
+        entry = json.loads(rows[0][0])
+        return entry['data'], entry['timestamp'], entry['ttl']
+    
+    def set(self, key: str, data: Any, timestamp: float, ttl: int, retention: int) -> None:
+        payload = _encode({'data': data, 'timestamp': timestamp, 'ttl': ttl})
+        self._execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", (key, payload, time.time() + retention))
+    
+    def delete(self, key: str) -> None:
+        self._execute("DELETE FROM entries WHERE key = ?", (key,))
+    
+    def delete_all(self, base_key: str) -> None:
+        prefix = f"{base_key}:"
+        self._execute("DELETE FROM entries WHERE key = ? OR substr(key, 1, ?) = ?", (base_key, len(prefix), prefix))
+    
+    def clear(self) -> None:
+        self._execute("DELETE FROM entries")
+    
+    def acquire_lock(self, key: str, seconds: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        now = time.time()
+        # Take the lock if it is free or its holder's time ran out
+        cursor = self._execute(
+            "INSERT INTO locks VALUES (?, ?, ?) ON CONFLICT(key) DO UPDATE SET token = excluded.token, "
+            "expires_at = excluded.expires_at WHERE locks.expires_at <= ?",
+            (key, token, now + seconds, now)
+        )
+        return token if cursor.rowcount == 1 else None
+    
+    def release_lock(self, key: str, token: str) -> None:
+        self._execute("DELETE FROM locks WHERE key = ? AND token = ?", (key, token))
+    
+    def publish(self, message: Dict) -> None:
+        now = time.time()
+        self._execute("INSERT INTO broadcasts (payload, created_at) VALUES (?, ?)", (_encode({**message, 'origin': self.origin}), now))
+        self._execute("DELETE FROM broadcasts WHERE created_at < ?", (now - self.BROADCAST_RETENTION_SECONDS,))
+    
+    def subscribe(self, handler: MessageHandler) -> None:
+        self._handler = handler
+        self._poller = threading.Thread(target=self._poll_worker, name="cache-broadcast", daemon=True)
+        self._poller.start()
+    
+    def _poll_worker(self) -> None:
+        while not self._stop_event.wait(self._poll_interval):
+            try:
+                rows = self._query("SELECT id, payload FROM broadcasts WHERE id > ? ORDER BY id", (self._last_broadcast,))
+            except sqlite3.Error as poll_error:
+                debug(f"[CACHE] Broadcast poll failed: {poll_error}")
+                continue
+            for broadcast_id, payload in rows:
+                self._last_broadcast = broadcast_id
+                self._deliver(payload)
+    
+    def close(self) -> None:
+        self._stop_event.set()
+        if self._poller is not None:
+            self._poller.join()
+        self._connection.close()
+
+
+def create_backend(name: str = CACHE_BACKEND) -> Optional[SharedCacheBackend]:
+    """The configured shared tier, or None to cache per process"""
+    if name == "memory":
+        return None
+    if name == "redis":
+        return RedisBackend()
+    if name == "sqlite":
+        return SQLiteBackend()
+    raise Exception(f"Unknown CACHE_BACKEND '{name}' (expected memory, redis or sqlite)")
@@ -2,14 +2,23 @@
 Cache Manager for FastAPI - Server-side caching system
 """
 
+import asyncio
+import gzip
+import json
 import os
+import sys
 import time
 import threading
+from bisect import bisect_left
+from collections import OrderedDict
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Any, Optional, List
-from dataclasses import dataclass
+from typing import Dict, Any, Callable, Optional, List, Tuple
+from dataclasses import dataclass, asdict
 from enum import Enum
-from logger import debug, info, cache_operation
+from logger import debug, info, warning, cache_operation
+from leaderboard import leaderboard
+from cache_backends import CACHE_BACKEND, create_backend
+from scheduler import Scheduler, CronTrigger, IntervalTrigger
 
 # Import AWS operations and utilities
 from aws import (
@@ -19,14 +28,38 @@ from aws import (
     DuelOperations,
     GroupOperations,
     normalize_dynamodb_item,
+    select_preferred_user,
     USERS_TABLE,
     GROUPS_TABLE,
     DUELS_TABLE,
-    ddb
+    DDB_SCAN_SEGMENTS,
+    scan_items,
+    run_db,
+    add_write_listener,
+    ItemWrite
 )
 
 DEBUG_MODE = os.getenv("DEBUG_MODE", "false").lower() == "true"
 
+# How often expired entries are swept out of memory
+CACHE_SWEEP_INTERVAL = int(os.getenv("CACHE_SWEEP_INTERVAL", "30"))
+
+# How often recently read entries are checked for refresh-ahead, and how far into its TTL an entry is reloaded
+CACHE_REFRESH_AHEAD_INTERVAL = int(os.getenv("CACHE_REFRESH_AHEAD_INTERVAL", "5"))
+REFRESH_AHEAD_FRACTION = 0.8
+
+# How long one worker may hold the shared lock on loading a key, and how often the others check for its result
+CACHE_LOAD_LOCK_SECONDS = float(os.getenv("CACHE_LOAD_LOCK_SECONDS", "30"))
+SHARED_LOAD_POLL_SECONDS = 0.05
+
+# Where long-lived entries and the leaderboard are saved for warm restarts, and how often
+CACHE_SNAPSHOT_PATH = os.getenv("CACHE_SNAPSHOT_PATH", "cache_snapshot.json.gz")
+CACHE_SNAPSHOT_INTERVAL = int(os.getenv("CACHE_SNAPSHOT_INTERVAL", "300"))
+SNAPSHOT_VERSION = 1
+
+# Upper bounds (seconds) of the load latency histogram buckets
+LOAD_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
 
 class CacheType(Enum):
     BOUNTIES = "bounties"
@@ -36,7 +69,6 @@ class CacheType(Enum):
     USERS = "users"
     DUELS = "duels"
     GROUPS = "groups"
-    UNIVERSITY_LEADERBOARD = "university_leaderboard"
     USER_DAILY_DATA = "user_daily_data"  # Cache for user streak data
 
 
@@ -45,31 +77,149 @@ class CacheEntry:
     data: Any
     timestamp: float
     ttl: int  # Time to live in seconds
+    cache_type: Optional[CacheType] = None
+    size: int = 0  # Approximate bytes held by data
+    loader: Optional[Callable[[], Any]] = None  # How to reload the entry in the background
+    last_access: float = 0.0
+    refreshing: bool = False
+    indexes: Optional[Dict[str, Dict[Any, List[Dict]]]] = None  # field -> value -> items, for collections
+
+
+def _index_key(value: Any) -> Any:
+    """Indexed values are matched case-insensitively"""
+    return value.lower() if isinstance(value, str) else value
+
+
+class LatencyHistogram:
+    """Load durations counted into fixed buckets, in the cumulative form Prometheus scrapes"""
+    
+    def __init__(self, buckets: Tuple[float, ...] = LOAD_LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+    
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+    
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(upper bound, observations at or under it) for every bucket, ending with +Inf"""
+        bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+        totals, running = [], 0
+        for bound, count in zip(bounds, self.counts):
+            running += count
+            totals.append((bound, running))
+        return totals
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th observation; None when empty or past the last bound"""
+        if not self.count:
+            return None
+        target = q * self.count
+        for bound, (_, total) in zip(self.buckets, self.cumulative()):
+            if total >= target:
+                return bound
+        return None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_seconds": self.sum / self.count if self.count else None,
+            "p50_seconds": self.quantile(0.5),
+            "p99_seconds": self.quantile(0.99),
+            "buckets": dict(self.cumulative()),
+        }
+
+
+def _budget(cache_type: CacheType, default_mb: int) -> int:
+    """Memory budget in bytes, overridable per type with CACHE_<TYPE>_MAX_MB"""
+    return int(float(os.getenv(f"CACHE_{cache_type.name}_MAX_MB", str(default_mb))) * 1024 * 1024)
+
+
+def deep_sizeof(value: Any) -> int:
+    """Approximate memory held by a JSON-like value, counting nested containers"""
+    seen = set()
+    size = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set)):
+            stack.extend(item)
+    return size
 
 
 class CacheManager:
     def __init__(self):
-        self._cache: Dict[str, CacheEntry] = {}
+        self._cache: "OrderedDict[str, CacheEntry]" = OrderedDict()  # Least recently used first
         self._lock = threading.RLock()
-        self._refresh_thread = None
-        self._stop_refresh = False
-        self._last_daily_refresh = None  # Track last daily refresh
+        self._type_bytes: Dict[CacheType, int] = {cache_type: 0 for cache_type in CacheType}
+        self._evictions: Dict[CacheType, int] = {cache_type: 0 for cache_type in CacheType}
+        self._expirations: Dict[CacheType, int] = {cache_type: 0 for cache_type in CacheType}
+        self._coalesced: Dict[CacheType, int] = {cache_type: 0 for cache_type in CacheType}
+        self._stale_hits: Dict[CacheType, int] = {cache_type: 0 for cache_type in CacheType}
+        self._refreshed_ahead: Dict[CacheType, int] = {cache_type: 0 for cache_type in CacheType}
+        self._patches: Dict[CacheType, int] = {cache_type: 0 for cache_type in CacheType}
+        self._shared_hits: Dict[CacheType, int] = {cache_type: 0 for cache_type in CacheType}
+        self._hits: Dict[CacheType, int] = {cache_type: 0 for cache_type in CacheType}
+        self._misses: Dict[CacheType, int] = {cache_type: 0 for cache_type in CacheType}
+        self._load_errors: Dict[CacheType, int] = {cache_type: 0 for cache_type in CacheType}
+        self._load_latency: Dict[CacheType, LatencyHistogram] = {cache_type: LatencyHistogram() for cache_type in CacheType}
+        self._loading: Dict[str, "asyncio.Future"] = {}  # Cache key -> the one load in progress for it
         
-        # Cache configuration
+        # Cache configuration; max_bytes is the type's memory budget, enforced least-recently-used first.
+        # stale_ttl is how long past its TTL get_or_load still serves an entry while reloading it in the
+        # background; refresh_ahead reloads recently read entries before they expire; persist saves the
+        # type's entries in the snapshot restored on startup
         self._cache_config = {
-            CacheType.BOUNTIES: {"ttl": 86400, "refresh_interval": 86400},  # 24 hours
-            CacheType.BOUNTY_COMPETITIONS: {"ttl": 60, "refresh_interval": None},  # 1 minute, no auto-refresh
-            CacheType.DAILY_PROBLEM: {"ttl": 86400, "refresh_interval": 86400},  # 24 hours (refreshed at 12:02 AM UTC)
-            CacheType.DAILY_COMPLETIONS: {"ttl": 60, "refresh_interval": None},  # 1 minute, no auto-refresh
-            CacheType.USERS: {"ttl": 60, "refresh_interval": None},  # 1 minute, no auto-refresh
-            CacheType.DUELS: {"ttl": 60, "refresh_interval": None},  # 1 minute, no auto-refresh
-            CacheType.GROUPS: {"ttl": 60, "refresh_interval": None},  # 1 minute, no auto-refresh
-            CacheType.UNIVERSITY_LEADERBOARD: {"ttl": 60, "refresh_interval": None},  # 1 minute, no auto-refresh
-            CacheType.USER_DAILY_DATA: {"ttl": 60, "refresh_interval": None},  # 1 minute, no auto-refresh
+            CacheType.BOUNTIES: {"ttl": 86400, "stale_ttl": 3600, "refresh_ahead": False, "refresh_interval": 86400, "persist": True, "max_bytes": _budget(CacheType.BOUNTIES, 4)},  # 24 hours
+            CacheType.BOUNTY_COMPETITIONS: {"ttl": 60, "stale_ttl": 120, "refresh_ahead": True, "refresh_interval": None, "persist": False, "max_bytes": _budget(CacheType.BOUNTY_COMPETITIONS, 4)},  # 1 minute
+            CacheType.DAILY_PROBLEM: {"ttl": 86400, "stale_ttl": 300, "refresh_ahead": False, "refresh_interval": 86400, "persist": True, "max_bytes": _budget(CacheType.DAILY_PROBLEM, 1)},  # 24 hours (refreshed at 12:02 AM UTC)
+            CacheType.DAILY_COMPLETIONS: {"ttl": 60, "stale_ttl": 60, "refresh_ahead": True, "refresh_interval": None, "persist": False, "max_bytes": _budget(CacheType.DAILY_COMPLETIONS, 4)},  # 1 minute
+            CacheType.USERS: {"ttl": 60, "stale_ttl": 300, "refresh_ahead": True, "refresh_interval": None, "persist": False, "max_bytes": _budget(CacheType.USERS, 128)},  # 1 minute
+            CacheType.DUELS: {"ttl": 60, "stale_ttl": 60, "refresh_ahead": True, "refresh_interval": None, "persist": False, "max_bytes": _budget(CacheType.DUELS, 32)},  # 1 minute
+            CacheType.GROUPS: {"ttl": 60, "stale_ttl": 300, "refresh_ahead": True, "refresh_interval": None, "persist": False, "max_bytes": _budget(CacheType.GROUPS, 16)},  # 1 minute
+            CacheType.USER_DAILY_DATA: {"ttl": 60, "stale_ttl": 60, "refresh_ahead": False, "refresh_interval": None, "persist": False, "max_bytes": _budget(CacheType.USER_DAILY_DATA, 16)},  # 1 minute, one key per user so not refreshed ahead
         }
         
-        # Start background refresh thread
-        self._start_refresh_thread()
+        # Default loaders for get_or_load and the background refresh, for types keyed without an identifier
+        self._loaders: Dict[CacheType, Callable[[], Any]] = {
+            CacheType.BOUNTIES: self._load_bounties,
+            CacheType.BOUNTY_COMPETITIONS: self._load_bounty_competitions,
+            CacheType.DAILY_PROBLEM: self._load_daily_problem,
+            CacheType.DAILY_COMPLETIONS: self._load_daily_completions,
+            CacheType.USERS: self._load_users,
+            CacheType.DUELS: self._load_duels,
+            CacheType.GROUPS: self._load_groups,
+        }
+        
+        # Attributes indexed in each cached collection ({"data": [items]}), rebuilt on set and kept current on patch
+        self._index_fields = {
+            CacheType.USERS: ('username', 'email', 'group_id'),
+            CacheType.DUELS: ('duelId',),
+            CacheType.GROUPS: ('id',),
+        }
+        
+        # Cached collections that follow committed item writes: table -> (cache type, key attribute)
+        self._collections = {
+            USERS_TABLE: (CacheType.USERS, 'username'),
+            DUELS_TABLE: (CacheType.DUELS, 'duelId'),
+        }
+        add_write_listener(self._on_item_written)
+        
+        # Cross-process tier (CACHE_BACKEND): entries loaded by one worker are reused by the others,
+        # and invalidations and item writes are broadcast to them
+        self._backend = create_backend()
+        if self._backend is not None:
+            self._backend.subscribe(self._on_broadcast)
     
     def _get_cache_key(self, cache_type: CacheType, identifier: str = "") -> str:
         """Generate cache key for given type and identifier"""
@@ -79,6 +229,11 @@ class CacheManager:
         """Check if cache entry is expired"""
         return time.time() - entry.timestamp > entry.ttl
     
+    def _is_dead(self, entry: CacheEntry) -> bool:
+        """Expired and past its stale-while-revalidate window, so no longer worth keeping"""
+        stale_ttl = self._cache_config[entry.cache_type]["stale_ttl"] if entry.cache_type else 0
+        return time.time() - entry.timestamp > entry.ttl + stale_ttl
+    
     def get(self, cache_type: CacheType, identifier: str = "") -> Optional[Any]:
         """Get cached data if not expired"""
         with self._lock:
@@ -86,295 +241,710 @@ class CacheManager:
             entry = self._cache.get(key)
             
             if entry and not self._is_expired(entry):
+                self._cache.move_to_end(key)
+                entry.last_access = time.time()
+                self._hits[cache_type] += 1
                 cache_operation("Hit", key)
                 return entry.data
             
+            # Stale entries stay for get_or_load to serve while it revalidates
+            if entry and self._is_dead(entry):
+                self._remove(key)
+                self._expirations[cache_type] += 1
+            self._misses[cache_type] += 1
             cache_operation("Miss", key)
             return None
     
-    def set(self, cache_type: CacheType, data: Any, identifier: str = "", ttl: Optional[int] = None) -> None:
-        """Set cache data with TTL"""
+    def set(self, cache_type: CacheType, data: Any, identifier: str = "", ttl: Optional[int] = None,
+            loader: Optional[Callable[[], Any]] = None) -> None:
+        """Set cache data with TTL, evicting least recently used entries of the type past its budget"""
+        timestamp = time.time()
+        if self._set_local(cache_type, data, identifier, ttl, loader, timestamp):
+            self._share(cache_type, self._get_cache_key(cache_type, identifier), data, timestamp, ttl)
+    
+    def _set_local(self, cache_type: CacheType, data: Any, identifier: str, ttl: Optional[int],
+                   loader: Optional[Callable[[], Any]], timestamp: float) -> bool:
+        """Store an entry in this process only; False when it is too large to cache"""
+        size = deep_sizeof(data)
         with self._lock:
             key = self._get_cache_key(cache_type, identifier)
             ttl = ttl if ttl is not None else self._cache_config[cache_type]["ttl"]
-            entry = CacheEntry(data=data, timestamp=time.time(), ttl=ttl)
-            self._cache[key] = entry
+            previous = self._remove(key)
+            if loader is None:
+                loader = previous.loader if previous else (None if identifier else self._loaders.get(cache_type))
+            
+            max_bytes = self._cache_config[cache_type]["max_bytes"]
+            if size > max_bytes:
+                warning(f"[CACHE] {key} is {size} bytes, over the {cache_type.value} budget of {max_bytes}; not cached")
+                return False
+            
+            self._cache[key] = CacheEntry(
+                data=data, timestamp=timestamp, ttl=ttl, cache_type=cache_type, size=size,
+                loader=loader, last_access=previous.last_access if previous else 0.0,
+                indexes=self._build_indexes(cache_type, data) if not identifier else None
+            )
+            self._type_bytes[cache_type] += size
+            self._evict(cache_type, max_bytes)
             
             cache_operation("Set", key, ttl=ttl)
+        return True
     
-    def invalidate(self, cache_type: CacheType, identifier: str = "") -> None:
-        """Invalidate specific cache entry"""
+    def _share(self, cache_type: CacheType, key: str, data: Any, timestamp: float, ttl: Optional[int]) -> None:
+        """Write an entry to the shared tier, kept there through its stale window"""
+        if self._backend is None:
+            return
+        config = self._cache_config[cache_type]
+        ttl = ttl if ttl is not None else config["ttl"]
+        try:
+            self._backend.set(key, data, timestamp, ttl, ttl + config["stale_ttl"])
+        except Exception as e:
+            warning(f"[CACHE] Could not share {key}: {e}")
+    
+    def _read_shared(self, key: str) -> Optional[Tuple[Any, float]]:
+        """(data, loaded at) from the shared tier, unless it is missing or already due for a reload"""
+        shared = self._backend.get(key)
+        if shared is None:
+            return None
+        data, timestamp, ttl = shared
+        if time.time() - timestamp >= ttl * REFRESH_AHEAD_FRACTION:
+            return None
+        return data, timestamp
+    
+    def _fetch(self, cache_type: CacheType, identifier: str, loader: Callable[[], Any],
+               ttl: Optional[int]) -> Tuple[Any, float]:
+        """
+        Load a key, returning (data, loaded at).
+        
+        With a shared tier, a result another worker loaded recently is reused, and only the worker
+        holding the key's lock runs the loader while the others wait for its result.
+        """
+        if self._backend is None:
+            return self._run_loader(cache_type, loader)
+        
+        key = self._get_cache_key(cache_type, identifier)
+        token = None
+        try:
+            deadline = time.time() + CACHE_LOAD_LOCK_SECONDS
+            shared = self._read_shared(key)
+            if shared is None:
+                token = self._backend.acquire_lock(key, CACHE_LOAD_LOCK_SECONDS)
+            while shared is None and token is None and time.time() < deadline:
+                time.sleep(SHARED_LOAD_POLL_SECONDS)
+                shared = self._read_shared(key)
+                if shared is None:
+                    token = self._backend.acquire_lock(key, CACHE_LOAD_LOCK_SECONDS)
+            if shared is not None:
+                self._shared_hits[cache_type] += 1
+                cache_operation("Shared", key)
+                return shared
+        except Exception as e:
+            warning(f"[CACHE] Shared tier unavailable for {key}: {e}")
+        
+        try:
+            data, timestamp = self._run_loader(cache_type, loader)
+            if self._is_cacheable(data):
+                self._share(cache_type, key, data, timestamp, ttl)
+            return data, timestamp
+        finally:
+            if token is not None:
+                self._backend.release_lock(key, token)
+    
+    def _run_loader(self, cache_type: CacheType, loader: Callable[[], Any]) -> Tuple[Any, float]:
+        """Call a loader, recording its latency and whether it failed"""
+        started = time.perf_counter()
+        try:
+            data = loader()
+        except Exception:
+            with self._lock:
+                self._load_errors[cache_type] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._load_latency[cache_type].observe(elapsed)
+        if not self._is_cacheable(data):
+            with self._lock:
+                self._load_errors[cache_type] += 1
+        return data, time.time()
+    
+    def _build_indexes(self, cache_type: CacheType, data: Any) -> Optional[Dict[str, Dict[Any, List[Dict]]]]:
+        fields = self._index_fields.get(cache_type)
+        items = data.get('data') if isinstance(data, dict) else None
+        if not fields or not isinstance(items, list):
+            return None
+        indexes = {field: {} for field in fields}
+        for item in items:
+            self._index_item(indexes, item)
+        return indexes
+    
+    @staticmethod
+    def _index_item(indexes: Dict[str, Dict[Any, List[Dict]]], item: Dict) -> None:
+        for field, index in indexes.items():
+            value = item.get(field)
+            if value is not None:
+                index.setdefault(_index_key(value), []).append(item)
+    
+    @staticmethod
+    def _unindex_item(indexes: Dict[str, Dict[Any, List[Dict]]], item: Dict) -> None:
+        for field, index in indexes.items():
+            value = item.get(field)
+            if value is None:
+                continue
+            key = _index_key(value)
+            remaining = [indexed for indexed in index.get(key, []) if indexed is not item]
+            if remaining:
+                index[key] = remaining
+            else:
+                index.pop(key, None)
+    
+    async def lookup(self, cache_type: CacheType, field: str, value: Any, load: bool = True) -> Optional[List[Dict]]:
+        """
+        Items of a cached collection whose indexed field equals value, in O(1).
+        
+        Loads the collection through get_or_load first unless load is False. Returns None when the
+        collection is not cached, so callers can fall back to DynamoDB.
+        """
+        if load:
+            await self.get_or_load(cache_type)
         with self._lock:
-            key = self._get_cache_key(cache_type, identifier)
-            if key in self._cache:
-                del self._cache[key]
-                if DEBUG_MODE:
-                    print(f"[CACHE] Invalidated {key}")
+            entry = self._cache.get(self._get_cache_key(cache_type))
+            if entry is None or entry.indexes is None or self._is_dead(entry):
+                return None
+            if not load and self._is_expired(entry):
+                return None
+            return list(entry.indexes[field].get(_index_key(value), []))
     
-    def invalidate_all(self, cache_type: CacheType) -> None:
-        """Invalidate all entries of a specific cache type"""
+    async def get_or_load(self, cache_type: CacheType, identifier: str = "",
+                          loader: Optional[Callable[[], Any]] = None, ttl: Optional[int] = None) -> Any:
+        """Get cached data, or load and cache it - concurrent misses on a key share a single load.
+        
+        An expired entry still inside its type's stale window is returned as is while one background
+        load replaces it.
+        """
+        key = self._get_cache_key(cache_type, identifier)
+        loader = loader or self._loaders[cache_type]
         with self._lock:
-            prefix = f"{cache_type.value}:"
-            keys_to_remove = [key for key in self._cache.keys() if key.startswith(prefix)]
-            for key in keys_to_remove:
-                del self._cache[key]
-            if DEBUG_MODE:
-                print(f"[CACHE] Invalidated all {cache_type.value} entries")
+            entry = self._cache.get(key)
+            if entry and not self._is_dead(entry):
+                self._cache.move_to_end(key)
+                entry.last_access = time.time()
+                entry.loader = loader
+                if not self._is_expired(entry):
+                    self._hits[cache_type] += 1
+                    cache_operation("Hit", key)
+                    return entry.data
+                
+                self._stale_hits[cache_type] += 1
+                cache_operation("Stale", key)
+                if not entry.refreshing:
+                    self._start_load(cache_type, identifier, loader, ttl)
+                return entry.data
+            self._misses[cache_type] += 1
+        
+        cache_operation("Miss", key)
+        # Shielded so one cancelled request doesn't cancel the load for everyone waiting on it
+        return await asyncio.shield(self._start_load(cache_type, identifier, loader, ttl))
     
-    def _should_refresh_daily_cache(self) -> bool:
-        """Check if daily cache should be refreshed (12:02 AM UTC)"""
-        now = datetime.now(timezone.utc)
-        today_refresh = now.replace(hour=0, minute=2, second=0, microsecond=0)
+    def _start_load(self, cache_type: CacheType, identifier: str, loader: Callable[[], Any], ttl: Optional[int]) -> "asyncio.Future":
+        """The key's load in progress, starting one if there is none"""
+        key = self._get_cache_key(cache_type, identifier)
+        pending = self._loading.get(key)
+        if pending is not None:
+            self._coalesced[cache_type] += 1
+            cache_operation("Coalesced", key)
+            return pending
         
-        # Check if we already refreshed today
-        if self._last_daily_refresh:
-            last_refresh_date = datetime.fromtimestamp(self._last_daily_refresh, tz=timezone.utc)
-            if last_refresh_date.date() == now.date():
-                return False
+        pending = asyncio.ensure_future(self._load(cache_type, identifier, loader, ttl))
+        self._loading[key] = pending
+        pending.add_done_callback(lambda done: self._finish_load(key, done))
+        return pending
+    
+    def _finish_load(self, key: str, done: "asyncio.Future") -> None:
+        self._loading.pop(key, None)
+        # Background revalidations have no awaiting caller to see their error
+        if not done.cancelled() and done.exception() is not None:
+            debug(f"[CACHE] Load of {key} failed: {done.exception()}")
+    
+    async def _load(self, cache_type: CacheType, identifier: str, loader: Callable[[], Any], ttl: Optional[int]) -> Any:
+        data, timestamp = await run_db(self._fetch, cache_type, identifier, loader, ttl)
+        if self._is_cacheable(data):
+            self._set_local(cache_type, data, identifier, ttl, loader, timestamp)
+        return data
+    
+    def refresh_ahead(self) -> int:
+        """Reload entries read within their last TTL that are past REFRESH_AHEAD_FRACTION of it"""
+        now = time.time()
+        with self._lock:
+            due = [
+                (key, entry) for key, entry in self._cache.items()
+                if entry.loader and not entry.refreshing and key not in self._loading
+                and self._cache_config[entry.cache_type]["refresh_ahead"]
+                and now - entry.last_access <= entry.ttl
+                and now - entry.timestamp >= entry.ttl * REFRESH_AHEAD_FRACTION
+            ]
+            for _, entry in due:
+                entry.refreshing = True
         
-        # Check if we have a cached daily problem and if it's from today
-        daily_cache = self.get(CacheType.DAILY_PROBLEM)
-        if daily_cache and daily_cache.get('date'):
+        for key, entry in due:
             try:
-                cached_date = datetime.fromisoformat(daily_cache['date'].replace('Z', '+00:00'))
-                # Only refresh if the cached problem is not from today
-                return cached_date.date() < now.date()
-            except:
-                pass
-        
-        # If no cache or invalid date, refresh if it's past 12:02 AM UTC today
-        return now >= today_refresh
+                identifier = key[len(entry.cache_type.value) + 1:]
+                data, timestamp = self._fetch(entry.cache_type, identifier, entry.loader, entry.ttl)
+                if self._is_cacheable(data):
+                    self._set_local(entry.cache_type, data, identifier, entry.ttl, entry.loader, timestamp)
+                    self._refreshed_ahead[entry.cache_type] += 1
+            except Exception as e:
+                debug(f"[CACHE] Refresh-ahead of {key} failed: {e}")
+            finally:
+                entry.refreshing = False
+        return len(due)
     
-    def _refresh_bounties(self):
-        """Refresh bounties cache"""
-        try:
-            if DEBUG_MODE:
-                print("[CACHE] Refreshing bounties cache")
-            
-            # Get all bounties (using a dummy username since get_user_bounties returns all active bounties)
-            bounties = BountyOperations.get_user_bounties("dummy")
-            self.set(CacheType.BOUNTIES, bounties)
-            
-        except Exception as e:
-            if DEBUG_MODE:
-                print(f"[CACHE] Error refreshing bounties: {e}")
+    @staticmethod
+    def _is_cacheable(data: Any) -> bool:
+        """Empty results and failed operation responses are not cached"""
+        return data is not None and not (isinstance(data, dict) and data.get("success") is False)
     
-    def _refresh_bounty_competitions(self):
-        """Refresh bounty competitions cache"""
-        try:
+    def _remove(self, key: str) -> Optional[CacheEntry]:
+        """Drop an entry and release its bytes from its type's usage"""
+        entry = self._cache.pop(key, None)
+        if entry is None:
+            return None
+        if entry.cache_type is not None:
+            self._type_bytes[entry.cache_type] -= entry.size
+        return entry
+    
+    def _evict(self, cache_type: CacheType, max_bytes: int) -> None:
+        """Evict the type's least recently used entries until it fits its budget"""
+        if self._type_bytes[cache_type] <= max_bytes:
+            return
+        for key in [key for key, entry in self._cache.items() if entry.cache_type == cache_type]:
+            if self._type_bytes[cache_type] <= max_bytes:
+                break
+            self._remove(key)
+            self._evictions[cache_type] += 1
             if DEBUG_MODE:
-                print("[CACHE] Refreshing bounty competitions cache")
-            
-            # Get all active bounties and their user progress
-            bounties = BountyOperations.get_user_bounties("dummy")
-            competitions = {}
-            
-            if bounties.get('success') and bounties.get('data'):
-                for bounty in bounties['data']:
-                    bounty_id = bounty.get('id')
-                    if bounty_id:
-                        # For now, just store the bounty data as competition data
-                        # In a real implementation, you'd have a separate method to get progress
-                        competitions[bounty_id] = {"success": True, "data": bounty}
-            
-            self.set(CacheType.BOUNTY_COMPETITIONS, competitions)
-            
-        except Exception as e:
+                print(f"[CACHE] Evicted {key} to stay within the {cache_type.value} budget")
+    
+    def sweep_expired(self) -> int:
+        """Remove every expired entry; returns how many were reclaimed"""
+        with self._lock:
+            expired = [key for key, entry in self._cache.items() if self._is_dead(entry)]
+            for key in expired:
+                entry = self._remove(key)
+                if entry.cache_type is not None:
+                    self._expirations[entry.cache_type] += 1
+        if expired:
+            debug(f"[CACHE] Swept {len(expired)} expired entries")
+        return len(expired)
+    
+    def invalidate(self, cache_type: CacheType, identifier: str = "") -> None:
+        """Invalidate specific cache entry, in every worker"""
+        key = self._get_cache_key(cache_type, identifier)
+        with self._lock:
+            if self._remove(key) is not None and DEBUG_MODE:
+                print(f"[CACHE] Invalidated {key}")
+        self._broadcast({"op": "invalidate", "key": key}, lambda backend: backend.delete(key))
+    
+    def invalidate_all(self, cache_type: CacheType) -> None:
+        """Invalidate all entries of a specific cache type, in every worker"""
+        self._drop_type(cache_type)
+        self._broadcast({"op": "invalidate_type", "cache_type": cache_type.value},
+                        lambda backend: backend.delete_all(cache_type.value))
+    
+    def _drop_type(self, cache_type: CacheType) -> None:
+        with self._lock:
+            keys_to_remove = [key for key, entry in self._cache.items() if entry.cache_type == cache_type]
+            for key in keys_to_remove:
+                self._remove(key)
             if DEBUG_MODE:
-                print(f"[CACHE] Error refreshing bounty competitions: {e}")
+                print(f"[CACHE] Invalidated all {cache_type.value} entries")
+    
+    def clear(self) -> None:
+        """Drop every entry, in every worker"""
+        self._drop_all()
+        self._broadcast({"op": "clear"}, lambda backend: backend.clear())
     
-    def _refresh_daily_problem(self):
-        """Refresh daily problem cache"""
+    def _drop_all(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._type_bytes = {cache_type: 0 for cache_type in CacheType}
+    
+    def _broadcast(self, message: Dict, apply_shared: Callable[[Any], None]) -> None:
+        """Apply a change to the shared tier and tell the other workers about it"""
+        if self._backend is None:
+            return
         try:
-            if DEBUG_MODE:
-                print("[CACHE] Refreshing daily problem cache")
-            
-            # Get the latest daily problem using get_top_daily_problems and take the first one
-            daily_problems = DailyProblemOperations.get_top_daily_problems()
-            if daily_problems.get('success') and daily_problems.get('data'):
-                latest_problem = daily_problems['data'][0] if daily_problems['data'] else None
-                self.set(CacheType.DAILY_PROBLEM, latest_problem)
-                # Update last refresh timestamp
-                self._last_daily_refresh = time.time()
-            else:
-                self.set(CacheType.DAILY_PROBLEM, None)
-            
+            apply_shared(self._backend)
+            self._backend.publish(message)
         except Exception as e:
-            if DEBUG_MODE:
-                print(f"[CACHE] Error refreshing daily problem: {e}")
+            warning(f"[CACHE] Could not broadcast {message['op']}: {e}")
     
-    def _refresh_daily_completions(self):
-        """Refresh daily completions cache"""
-        try:
-            if DEBUG_MODE:
-                print("[CACHE] Refreshing daily completions cache")
+    def _on_broadcast(self, message: Dict) -> None:
+        """Apply another worker's invalidation or item write to this process's entries"""
+        op = message.get("op")
+        if op == "invalidate":
+            with self._lock:
+                self._remove(message["key"])
+        elif op == "invalidate_type":
+            self._drop_type(CacheType(message["cache_type"]))
+        elif op == "clear":
+            self._drop_all()
+        elif op == "write":
+            write = ItemWrite(**{**message["write"], "removed": tuple(message["write"]["removed"])})
+            cache_type, key_field = self._collections[write.table]
+            if not self._patch_item(cache_type, key_field, write):
+                self._drop_type(cache_type)
+            if write.table == USERS_TABLE:
+                self._apply_to_leaderboard(write)
+    
+    def _on_item_written(self, write: ItemWrite) -> None:
+        """Patch a written item inside its cached collection, invalidating the collection if that fails"""
+        collection = self._collections.get(write.table)
+        if collection is None:
+            return
+        cache_type, key_field = collection
+        patched = self._patch_item(cache_type, key_field, write)
+        if not patched:
+            self._drop_type(cache_type)
+        # Other workers patch or drop their own copies and follow user writes on their leaderboards;
+        # the shared copy is dropped and reloaded once by whichever worker needs it
+        key = self._get_cache_key(cache_type)
+        self._broadcast({"op": "write", "write": asdict(write)},
+                        lambda backend: backend.delete(key) if patched else backend.delete_all(cache_type.value))
+    
+    @staticmethod
+    def _apply_to_leaderboard(write: ItemWrite) -> None:
+        """Follow another worker's user write on this process's leaderboard"""
+        if write.deleted:
+            return
+        changes = {field: None for field in write.removed}
+        changes.update(write.attributes or {})
+        if changes:
+            leaderboard.update_user(write.key, changes)
+        if write.increments and write.increments.get('xp'):
+            leaderboard.add_xp(write.key, write.increments['xp'])
+    
+    def _patch_item(self, cache_type: CacheType, key_field: str, write: ItemWrite) -> bool:
+        """
+        Apply one item write to the cached collection; False when it cannot be applied.
+        
+        Copy-on-write: cached items and lists are never modified, since routes serialize the objects
+        they were handed without the lock. The entry gets a new item and a new data list instead.
+        """
+        if not write.known:
+            return False
+        
+        with self._lock:
+            entry = self._cache.get(self._get_cache_key(cache_type))
+            if entry is None:
+                return True  # Nothing cached to go stale
+            indexes = entry.indexes
+            if indexes is None or key_field not in indexes:
+                return False
+            items = entry.data['data']
             
-            # Get the latest daily problem to see who completed it
-            daily_problems = DailyProblemOperations.get_top_daily_problems()
-            if daily_problems.get('success') and daily_problems.get('data'):
-                latest_problem = daily_problems['data'][0] if daily_problems['data'] else None
-                if latest_problem:
-                    completions = {
-                        "success": True,
-                        "data": {
-                            "users": latest_problem.get('users', {}),
-                            "problem_date": latest_problem.get('date')
-                        }
-                    }
-                    self.set(CacheType.DAILY_COMPLETIONS, completions)
-                else:
-                    self.set(CacheType.DAILY_COMPLETIONS, {"success": True, "data": {"users": {}}})
+            matches = indexes[key_field].get(_index_key(write.key), [])
+            if not matches:
+                if write.deleted:
+                    return True
+                if not write.complete:
+                    return False  # A partial update of an item the collection doesn't hold
+                item = dict(write.attributes)
+                new_items = [*items, item]
+                self._index_item(indexes, item)
+                size_delta = deep_sizeof(item)
+            elif write.deleted:
+                previous = matches[0]
+                self._unindex_item(indexes, previous)
+                new_items = [existing for existing in items if existing is not previous]
+                size_delta = -deep_sizeof(previous)
             else:
-                self.set(CacheType.DAILY_COMPLETIONS, {"success": True, "data": {"users": {}}})
+                previous = matches[0]
+                item = {} if write.complete else dict(previous)
+                item.update(write.attributes or {})
+                for name in write.removed:
+                    item.pop(name, None)
+                for name, amount in (write.increments or {}).items():
+                    item[name] = item.get(name, 0) + amount
+                self._unindex_item(indexes, previous)
+                self._index_item(indexes, item)
+                new_items = [item if existing is previous else existing for existing in items]
+                size_delta = deep_sizeof(item) - deep_sizeof(previous)
             
-        except Exception as e:
-            if DEBUG_MODE:
-                print(f"[CACHE] Error refreshing daily completions: {e}")
+            entry.data = {**entry.data, 'data': new_items}
+            entry.size += size_delta
+            self._type_bytes[cache_type] += size_delta
+            self._patches[cache_type] += 1
+            cache_operation("Patch", entry.cache_type.value)
+        return True
     
-    def _refresh_users(self):
-        """Refresh users cache"""
-        try:
-            if DEBUG_MODE:
-                print("[CACHE] Refreshing users cache")
-            
-            # Scan all users from DynamoDB
-            if not USERS_TABLE:
-                raise Exception("USERS_TABLE not configured")
-            
-            scan_result = ddb.scan(TableName=USERS_TABLE)
-            all_users = scan_result.get('Items', [])
-            
-            # Normalize user data
-            normalized_users = [normalize_dynamodb_item(user) for user in all_users]
-            
-            users_data = {"success": True, "data": normalized_users}
-            self.set(CacheType.USERS, users_data)
-            
-        except Exception as e:
-            if DEBUG_MODE:
-                print(f"[CACHE] Error refreshing users: {e}")
+    async def get_user_by_email(self, email: str) -> Optional[Dict]:
+        """Look up a user in the cached users by email, preferring the completed-onboarding record"""
+        matches = await self.lookup(CacheType.USERS, 'email', email)
+        return select_preferred_user(matches) if matches else None
     
-    def _refresh_duels(self):
-        """Refresh duels cache (last 48 hours)"""
-        try:
-            if DEBUG_MODE:
-                print("[CACHE] Refreshing duels cache")
-            
-            # Scan all duels from DynamoDB
-            if not DUELS_TABLE:
-                raise Exception("DUELS_TABLE not configured")
-            
-            scan_result = ddb.scan(TableName=DUELS_TABLE)
-            all_duels = scan_result.get('Items', [])
-            
-            # Filter for recent duels (last 48 hours)
-            current_time = int(time.time())
-            recent_duels = []
-            for duel in all_duels:
-                created_time = int(duel.get('created_at', {}).get('N', '0'))
-                if current_time - created_time < 48 * 60 * 60:  # 48 hours
-                    recent_duels.append(duel)
-            
-            # Normalize duel data
-            normalized_duels = [normalize_dynamodb_item(duel) for duel in recent_duels]
-            
-            duels_data = {"success": True, "data": normalized_duels}
-            self.set(CacheType.DUELS, duels_data)
-            
-        except Exception as e:
-            if DEBUG_MODE:
-                print(f"[CACHE] Error refreshing duels: {e}")
+    def _load_bounties(self) -> Dict:
+        # get_user_bounties returns every active bounty whatever the username
+        return BountyOperations.get_user_bounties("dummy")
+    
+    def _load_bounty_competitions(self) -> Dict:
+        # Get all active bounties and their user progress
+        bounties = BountyOperations.get_user_bounties("dummy")
+        competitions = {}
+        
+        if bounties.get('success') and bounties.get('data'):
+            for bounty in bounties['data']:
+                bounty_id = bounty.get('id')
+                if bounty_id:
+                    # For now, just store the bounty data as competition data
+                    # In a real implementation, you'd have a separate method to get progress
+                    competitions[bounty_id] = {"success": True, "data": bounty}
+        return competitions
     
-    def _refresh_groups(self):
-        """Refresh groups cache"""
+    def _load_daily_problem(self) -> Optional[Dict]:
+        # Get the latest daily problem by date key rather than the top-2 listing
+        daily_problems = DailyProblemOperations.get_top_daily_problems(1)
+        if daily_problems.get('success') and daily_problems.get('data'):
+            return daily_problems['data'][0]
+        return None
+    
+    def _load_daily_completions(self) -> Dict:
+        # Only the latest problem's date and users map are read
+        return DailyProblemOperations.get_todays_completions()
+    
+    def _load_users(self) -> Dict:
+        if not USERS_TABLE:
+            raise Exception("USERS_TABLE not configured")
+        
+        # Normalize user data as pages stream in from the parallel scan
+        return {"success": True, "data": [normalize_dynamodb_item(user) for user in scan_items(USERS_TABLE, DDB_SCAN_SEGMENTS)]}
+    
+    def _load_duels(self) -> Dict:
+        """Duels created in the last 48 hours"""
+        if not DUELS_TABLE:
+            raise Exception("DUELS_TABLE not configured")
+        
+        # Filter server-side; createdAt is an ISO-8601 UTC string
+        cutoff = (datetime.now(timezone.utc) - timedelta(hours=48)).isoformat()
+        recent_duels = scan_items(
+            DUELS_TABLE,
+            DDB_SCAN_SEGMENTS,
+            FilterExpression='createdAt >= :cutoff',
+            ExpressionAttributeValues={':cutoff': {'S': cutoff}}
+        )
+        return {"success": True, "data": [normalize_dynamodb_item(duel) for duel in recent_duels]}
+    
+    def _load_groups(self) -> Dict:
+        if not GROUPS_TABLE:
+            raise Exception("GROUPS_TABLE not configured")
+        
+        return {"success": True, "data": [normalize_dynamodb_item(group) for group in scan_items(GROUPS_TABLE, DDB_SCAN_SEGMENTS)]}
+    
+    def refresh(self, cache_type: CacheType) -> None:
+        """Reload a collection cache type from DynamoDB"""
         try:
             if DEBUG_MODE:
-                print("[CACHE] Refreshing groups cache")
-            
-            # Scan all groups from DynamoDB
-            if not GROUPS_TABLE:
-                raise Exception("GROUPS_TABLE not configured")
-            
-            scan_result = ddb.scan(TableName=GROUPS_TABLE)
-            all_groups = scan_result.get('Items', [])
-            
-            # Normalize group data
-            normalized_groups = [normalize_dynamodb_item(group) for group in all_groups]
+                print(f"[CACHE] Refreshing {cache_type.value} cache")
             
-            groups_data = {"success": True, "data": normalized_groups}
-            self.set(CacheType.GROUPS, groups_data)
+            loader = self._loaders[cache_type]
+            data, timestamp = self._fetch(cache_type, "", loader, None)
+            if not self._is_cacheable(data):
+                raise Exception(f"No {cache_type.value} data to cache")
+            self._set_local(cache_type, data, "", None, loader, timestamp)
             
         except Exception as e:
             if DEBUG_MODE:
-                print(f"[CACHE] Error refreshing groups: {e}")
+                print(f"[CACHE] Error refreshing {cache_type.value}: {e}")
+            raise e
     
-    def _refresh_worker(self):
-        """Background worker that refreshes cache based on schedule"""
-        while not self._stop_refresh:
-            try:
-                current_time = time.time()
-                
-                # Check each cache type for refresh
-                for cache_type, config in self._cache_config.items():
-                    key = self._get_cache_key(cache_type)
-                    entry = self._cache.get(key)
-                    
-                    # Check if refresh is needed
-                    needs_refresh = False
-                    if not entry:
-                        needs_refresh = True
-                    elif self._is_expired(entry):
-                        needs_refresh = True
-                    elif cache_type == CacheType.DAILY_PROBLEM and self._should_refresh_daily_cache():
-                        needs_refresh = True
-                    elif config["refresh_interval"] and current_time - entry.timestamp > config["refresh_interval"]:
-                        needs_refresh = True
-                    
-                    if needs_refresh:
-                        if cache_type == CacheType.BOUNTIES:
-                            self._refresh_bounties()
-                        elif cache_type == CacheType.DAILY_PROBLEM:
-                            self._refresh_daily_problem()
-                        # Other caches refresh on-demand when expired
-                
-                # Sleep for 5 minutes before next check
-                time.sleep(300)
-                
-            except Exception as e:
-                if DEBUG_MODE:
-                    print(f"[CACHE] Error in refresh worker: {e}")
-                time.sleep(300)
-    
-    def _start_refresh_thread(self):
-        """Start the background refresh thread"""
-        self._refresh_thread = threading.Thread(target=self._refresh_worker, daemon=True)
-        self._refresh_thread.start()
-        if DEBUG_MODE:
-            print("[CACHE] Background refresh thread started")
+    def refresh_daily_problem(self) -> None:
+        """Load the new daily problem at the 00:02 UTC rollover"""
+        self.refresh(CacheType.DAILY_PROBLEM)
+    
+    def register_jobs(self, scheduler: Scheduler) -> None:
+        """Schedule the daily rollover, the bounty refresh and cache maintenance"""
+        scheduler.add_job("daily-problem-refresh", self.refresh_daily_problem, CronTrigger("2 0 * * *"), run_now=True)
+        scheduler.add_job(
+            "bounties-refresh",
+            lambda: self.refresh(CacheType.BOUNTIES),
+            IntervalTrigger(self._cache_config[CacheType.BOUNTIES]["refresh_interval"], jitter=60),
+            run_now=True
+        )
+        scheduler.add_job("cache-refresh-ahead", self.refresh_ahead, IntervalTrigger(CACHE_REFRESH_AHEAD_INTERVAL, jitter=1))
+        scheduler.add_job("cache-sweep", self.sweep_expired, IntervalTrigger(CACHE_SWEEP_INTERVAL, jitter=5))
+        scheduler.add_job("cache-snapshot", self.save_snapshot, IntervalTrigger(CACHE_SNAPSHOT_INTERVAL, jitter=30))
+    
+    def save_snapshot(self, path: str = CACHE_SNAPSHOT_PATH) -> int:
+        """Write the persisted types' live entries and the leaderboard to a gzipped JSON file; returns entries saved"""
+        with self._lock:
+            entries = [
+                {"cache_type": entry.cache_type.value, "key": key, "data": entry.data, "timestamp": entry.timestamp, "ttl": entry.ttl}
+                for key, entry in self._cache.items()
+                if entry.cache_type and self._cache_config[entry.cache_type]["persist"] and not self._is_dead(entry)
+            ]
+            payload = json.dumps(
+                {"version": SNAPSHOT_VERSION, "saved_at": time.time(), "entries": entries, "leaderboard": leaderboard.snapshot()},
+                separators=(',', ':'), default=str
+            ).encode()
+        
+        # Write beside the target and swap it in, so a crash mid-write never leaves a torn snapshot
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(temporary_path, "wb", compresslevel=6) as snapshot_file:
+            snapshot_file.write(payload)
+        os.replace(temporary_path, path)
+        debug(f"[CACHE] Saved {len(entries)} entries to {path}")
+        return len(entries)
+    
+    def load_snapshot(self, path: str = CACHE_SNAPSHOT_PATH) -> int:
+        """
+        Restore entries saved by save_snapshot with their original load times, so remaining TTLs carry over.
+        
+        Expired entries still inside their stale window are served while get_or_load reloads them, and the
+        restored leaderboard reconciles with the table on first read. Returns entries restored.
+        """
+        try:
+            with gzip.open(path, "rb") as snapshot_file:
+                snapshot = json.loads(snapshot_file.read())
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            warning(f"[CACHE] Ignoring unreadable snapshot {path}: {e}")
+            return 0
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            warning(f"[CACHE] Ignoring snapshot {path} with version {snapshot.get('version')}")
+            return 0
+        
+        restored = 0
+        for saved in snapshot["entries"]:
+            cache_type = CacheType(saved["cache_type"])
+            if not self._cache_config[cache_type]["persist"]:
+                continue
+            identifier = saved["key"][len(cache_type.value) + 1:]
+            with self._lock:
+                if self._get_cache_key(cache_type, identifier) in self._cache:
+                    continue
+                probe = CacheEntry(data=None, timestamp=saved["timestamp"], ttl=saved["ttl"], cache_type=cache_type)
+                if self._is_dead(probe):
+                    continue
+                if self._set_local(cache_type, saved["data"], identifier, saved["ttl"], None, saved["timestamp"]):
+                    restored += 1
+        
+        if snapshot.get("leaderboard"):
+            leaderboard.restore(snapshot["leaderboard"])
+        return restored
     
     def stop(self):
         """Stop the cache manager"""
-        self._stop_refresh = True
-        if self._refresh_thread:
-            self._refresh_thread.join()
+        if self._backend is not None:
+            self._backend.close()
         if DEBUG_MODE:
             print("[CACHE] Cache manager stopped")
     
+    def _counters(self) -> Dict[str, Dict[CacheType, int]]:
+        """Every per-type counter by name"""
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "stale_hits": self._stale_hits,
+            "coalesced": self._coalesced,
+            "shared_hits": self._shared_hits,
+            "load_errors": self._load_errors,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "refreshed_ahead": self._refreshed_ahead,
+            "patches": self._patches,
+        }
+    
     def get_cache_stats(self) -> Dict[str, Any]:
         """Get cache statistics for monitoring"""
         with self._lock:
             stats = {
                 "total_entries": len(self._cache),
                 "cache_types": {},
-                "memory_usage": "N/A"  # Could implement actual memory tracking
+                "memory_usage": sum(self._type_bytes.values()),  # Approximate bytes
+                "backend": CACHE_BACKEND
             }
             
+            counters = self._counters()
             for cache_type in CacheType:
-                prefix = f"{cache_type.value}:"
-                count = len([k for k in self._cache.keys() if k.startswith(prefix)])
-                stats["cache_types"][cache_type.value] = count
+                sizes = [entry.size for entry in self._cache.values() if entry.cache_type == cache_type]
+                reads = self._hits[cache_type] + self._stale_hits[cache_type] + self._misses[cache_type]
+                type_stats = {
+                    "entries": len(sizes),
+                    "bytes": self._type_bytes[cache_type],
+                    "max_bytes": self._cache_config[cache_type]["max_bytes"],
+                    "largest_entry_bytes": max(sizes, default=0),
+                    "hit_ratio": (self._hits[cache_type] + self._stale_hits[cache_type]) / reads if reads else None,
+                    "load_latency": self._load_latency[cache_type].to_dict(),
+                }
+                type_stats.update({name: counter[cache_type] for name, counter in counters.items()})
+                stats["cache_types"][cache_type.value] = type_stats
             
             return stats
+    
+    def prometheus_metrics(self) -> str:
+        """The cache statistics in the Prometheus text exposition format"""
+        lines = []
+        
+        def metric(name: str, kind: str, help_text: str, samples: List[Tuple[str, Any]]) -> None:
+            lines.append(f"# HELP yeetcode_cache_{name} {help_text}")
+            lines.append(f"# TYPE yeetcode_cache_{name} {kind}")
+            lines.extend(f"yeetcode_cache_{name}{labels} {value}" for labels, value in samples)
+        
+        def by_type(values: Dict[CacheType, Any]) -> List[Tuple[str, Any]]:
+            return [(f'{{cache_type="{cache_type.value}"}}', values[cache_type]) for cache_type in CacheType]
+        
+        with self._lock:
+            entries = {cache_type: 0 for cache_type in CacheType}
+            for entry in self._cache.values():
+                if entry.cache_type is not None:
+                    entries[entry.cache_type] += 1
+            
+            metric("entries", "gauge", "Entries held", by_type(entries))
+            metric("bytes", "gauge", "Approximate bytes held", by_type(self._type_bytes))
+            metric("max_bytes", "gauge", "Memory budget", by_type({cache_type: config["max_bytes"] for cache_type, config in self._cache_config.items()}))
+            for name, counter in self._counters().items():
+                metric(f"{name}_total", "counter", name.replace("_", " ").capitalize(), by_type(counter))
+            
+            samples = []
+            for cache_type in CacheType:
+                histogram = self._load_latency[cache_type]
+                samples.extend(
+                    (f'_bucket{{cache_type="{cache_type.value}",le="{bound}"}}', total) for bound, total in histogram.cumulative()
+                )
+                samples.append((f'_sum{{cache_type="{cache_type.value}"}}', histogram.sum))
+                samples.append((f'_count{{cache_type="{cache_type.value}"}}', histogram.count))
+            metric("load_duration_seconds", "histogram", "Time taken by loads from DynamoDB", samples)
+        
+        return "\n".join(lines) + "\n"
+    
+    def _describe(self, key: str, entry: CacheEntry) -> Dict[str, Any]:
+        return {
+            "key": key,
+            "cache_type": entry.cache_type.value if entry.cache_type else None,
+            "bytes": entry.size,
+            "age_seconds": time.time() - entry.timestamp,
+            "ttl": entry.ttl,
+            "expired": self._is_expired(entry),
+            "last_access": entry.last_access or None,
+            "refreshing": entry.refreshing,
+            "items": len(entry.data["data"]) if entry.indexes is not None else None,
+        }
+    
+    def inspect(self, cache_type: Optional[CacheType] = None) -> List[Dict[str, Any]]:
+        """Metadata of every entry, or of one type's entries, least recently used first"""
+        with self._lock:
+            return [
+                self._describe(key, entry) for key, entry in self._cache.items()
+                if cache_type is None or entry.cache_type == cache_type
+            ]
+    
+    def inspect_key(self, key: str) -> Optional[Dict[str, Any]]:
+        """One entry's metadata and data, or None if it isn't cached"""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            return {**self._describe(key, entry), "data": entry.data}
 
 
 # Global cache manager instance
@@ -0,0 +1,126 @@
+"""
+DynamoDB client factory with a sized connection pool, adaptive retries and request metrics
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any
+
+import boto3
+from botocore.config import Config
+from logger import debug, warning
+
+DDB_MAX_ATTEMPTS = int(os.getenv("DDB_MAX_ATTEMPTS", "5"))
+DDB_CONNECT_TIMEOUT = float(os.getenv("DDB_CONNECT_TIMEOUT", "2"))
+DDB_READ_TIMEOUT = float(os.getenv("DDB_READ_TIMEOUT", "10"))
+
+THROTTLING_ERRORS = {
+    'ThrottlingException',
+    'ProvisionedThroughputExceededException',
+    'RequestLimitExceeded',
+}
+
+
+class ClientMetrics:
+    """Thread-safe request counters fed by botocore's event hooks"""
+    
+    def __init__(self, max_pool_connections: int):
+        self._lock = threading.Lock()
+        self.max_pool_connections = max_pool_connections
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.saturated_requests = 0  # Started while every pooled connection was busy
+        self.retries = 0
+        self.throttles = 0
+        self.errors = 0
+    
+    def _request_started(self, **kwargs) -> None:
+        with self._lock:
+            if self.in_flight >= self.max_pool_connections:
+                self.saturated_requests += 1
+            self.in_flight += 1
+            self.requests += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+    
+    def _request_finished(self, parsed: Dict = None, **kwargs) -> None:
+        # Fires for every HTTP response, including error responses that become ClientErrors
+        parsed = parsed or {}
+        retry_attempts = parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+        error_code = parsed.get('Error', {}).get('Code')
+        with self._lock:
+            self.in_flight -= 1
+            self.retries += retry_attempts
+            if error_code:
+                self.errors += 1
+                if error_code in THROTTLING_ERRORS:
+                    self.throttles += 1
+    
+    def _request_failed(self, **kwargs) -> None:
+        # Fires instead of after-call when no response was received (connection errors, timeouts)
+        with self._lock:
+            self.in_flight -= 1
+            self.errors += 1
+    
+    def register(self, client) -> None:
+        """Hook the counters into a client's API call lifecycle"""
+        events = client.meta.events
+        events.register('before-call.dynamodb', self._request_started)
+        events.register('after-call.dynamodb', self._request_finished)
+        events.register('after-call-error.dynamodb', self._request_failed)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Point-in-time copy of the counters for monitoring"""
+        with self._lock:
+            return {
+                "max_pool_connections": self.max_pool_connections,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "pool_utilization": round(self.in_flight / self.max_pool_connections, 3),
+                "requests": self.requests,
+                "saturated_requests": self.saturated_requests,
+                "retries": self.retries,
+                "throttles": self.throttles,
+                "errors": self.errors,
+            }
+
+
+def create_dynamodb_client(region: str, max_pool_connections: int, metrics: ClientMetrics):
+    """Create a DynamoDB client whose pool matches the worker's concurrency"""
+    config = Config(
+        region_name=region,
+        max_pool_connections=max_pool_connections,
+        retries={'mode': 'adaptive', 'max_attempts': DDB_MAX_ATTEMPTS},
+        connect_timeout=DDB_CONNECT_TIMEOUT,
+        read_timeout=DDB_READ_TIMEOUT,
+        tcp_keepalive=True,
+    )
+    client = boto3.client('dynamodb', config=config)
+    metrics.register(client)
+    return client
+
+
+def warm_connections(client, connections: int) -> int:
+    """Open up to `connections` pooled TLS connections ahead of the first real requests"""
+    barrier = threading.Barrier(connections)
+    
+    def open_connection() -> bool:
+        # Hold every worker until all are ready so each call needs its own connection
+        try:
+            barrier.wait(timeout=5)
+        except threading.BrokenBarrierError:
+            pass
+        try:
+            client.describe_endpoints()
+            return True
+        except Exception as warm_error:
+            debug(f"[DDB] Connection warm-up call failed: {warm_error}")
+            return False
+    
+    with ThreadPoolExecutor(max_workers=connections, thread_name_prefix="ddb-warm") as pool:
+        warmed = sum(pool.map(lambda _: open_connection(), range(connections)))
+    
+    if warmed < connections:
+        warning(f"[DDB] Warmed {warmed}/{connections} DynamoDB connections")
+    return warmed
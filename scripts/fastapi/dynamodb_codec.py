@@ -0,0 +1,167 @@
+"""
+Conversion between DynamoDB attribute values and plain Python values
+
+Every scanned item passes through here. The common S/N/BOOL tags are tested
+inline, everything else goes through type-dispatch tables, and numbers are
+parsed exactly instead of via float.
+"""
+
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Union
+
+Number = Union[int, float]
+
+
+def _deserialize_number(text: str) -> Number:
+    """Parse a DynamoDB number exactly - integers stay ints, fractions become floats"""
+    try:
+        return int(text)
+    except ValueError:
+        value = Decimal(text)
+        # Integral values written in exponent or decimal form, e.g. '1E+3' or '5.0'
+        if value == value.to_integral_value():
+            return int(value)
+        return float(value)
+
+
+def _deserialize_list(values: list) -> list:
+    return [deserialize_value(value) for value in values]
+
+
+def _deserialize_number_set(values: Iterable[str]) -> list:
+    return [_deserialize_number(value) for value in values]
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _null(_: Any) -> None:
+    return None
+
+
+def _deserialize_other(value: Dict) -> Any:
+    """Dispatch the less common type tags through the table"""
+    if len(value) == 1:
+        for type_tag in value:
+            deserializer = _DESERIALIZERS.get(type_tag)
+            if deserializer is not None:
+                return deserializer(value[type_tag])
+    # Not a typed value (e.g. a computed field) - pass through unchanged
+    return value
+
+
+def deserialize_value(value: Any) -> Any:
+    """Convert one DynamoDB attribute value to a plain Python value"""
+    if value.__class__ is not dict:
+        return value
+    # S, N and BOOL make up nearly every attribute, so test them before the table
+    if 'S' in value:
+        return value['S']
+    if 'N' in value:
+        return _deserialize_number(value['N'])
+    if 'BOOL' in value:
+        return value['BOOL']
+    return _deserialize_other(value)
+
+
+def deserialize_item(item: Dict) -> Dict:
+    """Convert a DynamoDB item (attribute name -> typed value) to a plain dict"""
+    # deserialize_value inlined - the per-attribute call is a large share of the cost
+    return {
+        key: (
+            value['S'] if 'S' in value
+            else (int(number) if (number := value['N']).isdigit() else _deserialize_number(number)) if 'N' in value
+            else value['BOOL'] if 'BOOL' in value
+            else _deserialize_other(value)
+        ) if value.__class__ is dict else value
+        for key, value in item.items()
+    }
+
+
+def _deserialize_map(attributes: Dict) -> Dict:
+    """Deserialize an M value, taking a single-tag fast path for large uniform maps"""
+    # Maps like the daily problem's users map hold thousands of values of one type
+    if len(attributes) >= _UNIFORM_MAP_THRESHOLD:
+        first = next(iter(attributes.values()))
+        if first.__class__ is dict and len(first) == 1:
+            type_tag = next(iter(first))
+            try:
+                if type_tag == 'BOOL' or type_tag == 'S':
+                    return {key: value[type_tag] for key, value in attributes.items()}
+                if type_tag == 'N':
+                    return {key: _deserialize_number(value['N']) for key, value in attributes.items()}
+            except (KeyError, TypeError):
+                pass  # Mixed types after all - take the general path
+    return deserialize_item(attributes)
+
+
+_UNIFORM_MAP_THRESHOLD = 32
+
+_DESERIALIZERS = {
+    'S': _identity,
+    'N': _deserialize_number,
+    'BOOL': _identity,
+    'NULL': _null,
+    'M': _deserialize_map,
+    'L': _deserialize_list,
+    'B': bytes,
+    'SS': list,
+    'NS': _deserialize_number_set,
+    'BS': list,
+}
+
+
+def _serialize_number(value: Union[int, float, Decimal]) -> Dict:
+    if isinstance(value, float) and (value != value or value in (float('inf'), float('-inf'))):
+        raise ValueError(f"DynamoDB numbers must be finite, got {value}")
+    return {'N': str(value)}
+
+
+def _serialize_set(values: Union[set, frozenset]) -> Dict:
+    if not values:
+        raise ValueError("DynamoDB does not support empty sets")
+    sample = next(iter(values))
+    if isinstance(sample, str):
+        return {'SS': list(values)}
+    if isinstance(sample, (bytes, bytearray)):
+        return {'BS': [bytes(value) for value in values]}
+    if isinstance(sample, (int, float, Decimal)) and not isinstance(sample, bool):
+        return {'NS': [_serialize_number(value)['N'] for value in values]}
+    raise TypeError(f"Unsupported set element type: {type(sample).__name__}")
+
+
+_SERIALIZERS = {
+    str: lambda value: {'S': value},
+    bool: lambda value: {'BOOL': value},
+    int: _serialize_number,
+    float: _serialize_number,
+    Decimal: _serialize_number,
+    type(None): lambda value: {'NULL': True},
+    bytes: lambda value: {'B': value},
+    bytearray: lambda value: {'B': bytes(value)},
+    dict: lambda value: {'M': serialize_item(value)},
+    list: lambda value: {'L': [serialize_value(item) for item in value]},
+    tuple: lambda value: {'L': [serialize_value(item) for item in value]},
+    set: _serialize_set,
+    frozenset: _serialize_set,
+}
+
+
+def serialize_value(value: Any) -> Dict:
+    """Convert a plain Python value to a DynamoDB attribute value"""
+    serializer = _SERIALIZERS.get(value.__class__)
+    if serializer is None:
+        # Subclasses (IntEnum, OrderedDict, ...) fall back to their nearest supported base
+        for base, candidate in _SERIALIZERS.items():
+            if isinstance(value, base):
+                serializer = candidate
+                break
+        else:
+            raise TypeError(f"Cannot serialize {type(value).__name__} to DynamoDB")
+    return serializer(value)
+
+
+def serialize_item(item: Dict) -> Dict:
+    """Convert a plain dict to a DynamoDB item"""
+    return {key: serialize_value(value) for key, value in item.items()}
@@ -0,0 +1,304 @@
+"""
+In-process ranked leaderboards
+
+Users are kept ordered by total XP (solved problems weighted by difficulty plus
+bonus xp) with the username as a stable tie-break, globally and per group.
+Per-university running totals and top students are kept alongside.
+The structure is seeded from one users scan and then updated in place by the
+operations that change a user, so reads are O(K) slices and writes are a
+bisect instead of a rescan. Updates made while a reseed is scanning are
+journaled and replayed onto the new structure, so the swap doesn't lose them.
+"""
+
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Attributes a leaderboard entry carries (the projection used to seed it)
+LEADERBOARD_ATTRIBUTES = ['username', 'display_name', 'group_id', 'university', 'easy', 'medium', 'hard', 'today', 'xp']
+
+# Fields that change a user's score
+SCORE_FIELDS = ('easy', 'medium', 'hard', 'xp')
+
+# University values left out of the university leaderboard
+EXCLUDED_UNIVERSITIES = ('', 'undefined', 'Other')
+
+
+def total_xp(user: Dict) -> int:
+    """Leaderboard score - matches the desktop client's XP formula"""
+    return (int(user.get('easy', 0)) * 100
+            + int(user.get('medium', 0)) * 300
+            + int(user.get('hard', 0)) * 500
+            + int(user.get('xp', 0)))
+
+
+class RankedSet:
+    """Usernames kept sorted by descending score, then username"""
+    
+    def __init__(self):
+        self._keys: List[Tuple[int, str]] = []
+        self._scores: Dict[str, int] = {}
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+    
+    def set(self, username: str, score: int) -> None:
+        previous = self._scores.get(username)
+        if previous == score:
+            return
+        if previous is not None:
+            del self._keys[bisect_left(self._keys, (-previous, username))]
+        insort(self._keys, (-score, username))
+        self._scores[username] = score
+    
+    def discard(self, username: str) -> None:
+        previous = self._scores.pop(username, None)
+        if previous is not None:
+            del self._keys[bisect_left(self._keys, (-previous, username))]
+    
+    def slice(self, offset: int = 0, limit: Optional[int] = None) -> List[str]:
+        end = None if limit is None else offset + limit
+        return [username for _, username in self._keys[offset:end]]
+    
+    def score(self, username: str) -> Optional[int]:
+        return self._scores.get(username)
+    
+    def rank(self, username: str) -> Optional[int]:
+        """1-based position, or None if absent"""
+        score = self._scores.get(username)
+        if score is None:
+            return None
+        return bisect_left(self._keys, (-score, username)) + 1
+
+
+class UniversityStats:
+    """Running sums for one university and its students ranked by XP"""
+    
+    def __init__(self, university: str):
+        self.university = university
+        self.easy = 0
+        self.medium = 0
+        self.hard = 0
+        self.total_xp = 0
+        self.students = RankedSet()
+    
+    def apply(self, entry: Dict, sign: int) -> None:
+        """Add (sign=1) or remove (sign=-1) a user's contribution"""
+        self.easy += sign * int(entry.get('easy', 0))
+        self.medium += sign * int(entry.get('medium', 0))
+        self.hard += sign * int(entry.get('hard', 0))
+        self.total_xp += sign * entry['total_xp']
+        if sign > 0:
+            self.students.set(entry['username'], entry['total_xp'])
+        else:
+            self.students.discard(entry['username'])
+    
+    def to_dict(self) -> Dict:
+        top_student, top_student_xp = None, 0
+        if self.students:
+            top_student = self.students.slice(0, 1)[0]
+            top_student_xp = self.students.score(top_student)
+            if top_student_xp <= 0:
+                top_student, top_student_xp = None, 0
+        return {
+            "university": self.university,
+            "students": len(self.students),
+            "easy": self.easy,
+            "medium": self.medium,
+            "hard": self.hard,
+            "total": self.easy + self.medium + self.hard,
+            "total_xp": self.total_xp,
+            "top_student": top_student,
+            "top_student_xp": top_student_xp
+        }
+
+
+def _tally(universities: Dict[str, UniversityStats], entry: Dict, sign: int) -> None:
+    university = entry.get('university')
+    if not university or university in EXCLUDED_UNIVERSITIES:
+        return
+    stats = universities.get(university)
+    if stats is None:
+        stats = universities[university] = UniversityStats(university)
+    stats.apply(entry, sign)
+    if not stats.students:
+        del universities[university]
+
+
+class Leaderboard:
+    """Global and per-group rankings over a materialized copy of the user fields they need"""
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._users: Dict[str, Dict] = {}
+        self._global = RankedSet()
+        self._groups: Dict[str, RankedSet] = {}
+        self._universities: Dict[str, UniversityStats] = {}
+        self._journal: Optional[List[Tuple[str, str, object]]] = None  # ('set' | 'xp' | 'pending', username, change) during a seed
+        self.seeded_at: Optional[float] = None
+    
+    @property
+    def seeded(self) -> bool:
+        return self.seeded_at is not None
+    
+    def begin_seed(self) -> None:
+        """Start journaling updates, for a seed whose scan starts now to replay"""
+        with self._lock:
+            self._journal = []
+    
+    def cancel_seed(self) -> None:
+        """Stop journaling after a failed seed"""
+        with self._lock:
+            self._journal = None
+    
+    def touched_since(self, position: int) -> Tuple[Set[str], int]:
+        """Usernames whose table item changed since a journal position, and the current position"""
+        with self._lock:
+            if self._journal is None:
+                return set(), position
+            return {username for kind, username, _ in self._journal[position:] if kind != 'pending'}, len(self._journal)
+    
+    def seed(self, users: Iterable[Dict], replay_from: Optional[int] = None) -> int:
+        """Replace the whole leaderboard with a fresh snapshot of users
+        
+        With replay_from, journaled updates from that position on are applied
+        after the swap and journaling stops. Pending XP awards (not yet in the
+        table, so never in the scan) are all replayed.
+        """
+        entries: Dict[str, Dict] = {}
+        ranking = RankedSet()
+        groups: Dict[str, RankedSet] = {}
+        universities: Dict[str, UniversityStats] = {}
+        for user in users:
+            username = str(user.get('username', '')).lower()
+            if not username:
+                continue
+            entry = {field: user[field] for field in LEADERBOARD_ATTRIBUTES if field in user}
+            entry['username'] = username
+            entry['total_xp'] = total_xp(entry)
+            entries[username] = entry
+            ranking.set(username, entry['total_xp'])
+            if entry.get('group_id'):
+                groups.setdefault(entry['group_id'], RankedSet()).set(username, entry['total_xp'])
+        for entry in entries.values():
+            _tally(universities, entry, 1)
+        
+        with self._lock:
+            self._users, self._global, self._groups = entries, ranking, groups
+            self._universities = universities
+            self.seeded_at = time.time()
+            if replay_from is not None and self._journal is not None:
+                for position, (kind, username, change) in enumerate(self._journal):
+                    if kind == 'pending':
+                        self._add_xp(username, change)
+                    elif position < replay_from:
+                        continue
+                    elif kind == 'xp':
+                        self._add_xp(username, change)
+                    else:
+                        self._update(username, change)
+                self._journal = None
+        return len(entries)
+    
+    def update_user(self, username: str, changes: Dict) -> None:
+        """Merge changed fields into a user's entry and re-rank them (None removes a field)"""
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append(('set', username.lower(), dict(changes)))
+            if self.seeded:
+                self._update(username.lower(), changes)
+    
+    def add_xp(self, username: str, amount: int, pending: bool = False) -> None:
+        """Apply an XP award to a user's entry (pending: buffered, not yet written to the table)"""
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append(('pending' if pending else 'xp', username.lower(), amount))
+            if self.seeded:
+                self._add_xp(username.lower(), amount)
+    
+    def _add_xp(self, username: str, amount: int) -> None:
+        self._update(username, {'xp': int(self._users.get(username, {}).get('xp', 0)) + amount})
+    
+    def _update(self, username: str, changes: Dict) -> None:
+        # Callers hold the lock
+        previous = self._users.get(username, {'username': username})
+        entry = {**previous}
+        for field, value in changes.items():
+            if field not in LEADERBOARD_ATTRIBUTES or field == 'username':
+                continue
+            if value is None:
+                entry.pop(field, None)
+            else:
+                entry[field] = value
+        entry['total_xp'] = total_xp(entry)
+        self._users[username] = entry
+        self._global.set(username, entry['total_xp'])
+        _tally(self._universities, previous, -1)
+        _tally(self._universities, entry, 1)
+        
+        previous_group, group = previous.get('group_id'), entry.get('group_id')
+        if previous_group and previous_group != group:
+            self._groups[previous_group].discard(username)
+            if not self._groups[previous_group]:
+                del self._groups[previous_group]
+        if group:
+            self._groups.setdefault(group, RankedSet()).set(username, entry['total_xp'])
+    
+    def _entries(self, usernames: List[str], offset: int) -> List[Dict]:
+        return [{**self._users[username], 'rank': offset + position + 1} for position, username in enumerate(usernames)]
+    
+    def top(self, limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        """Global ranking slice, best first"""
+        with self._lock:
+            return self._entries(self._global.slice(offset, limit), offset)
+    
+    def group(self, group_id: str, limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        """One group's ranking slice, best first"""
+        with self._lock:
+            ranking = self._groups.get(group_id)
+            if ranking is None:
+                return []
+            return self._entries(ranking.slice(offset, limit), offset)
+    
+    def universities(self) -> List[Dict]:
+        """Per-university totals, highest total XP first"""
+        with self._lock:
+            rows = [stats.to_dict() for stats in self._universities.values()]
+        rows.sort(key=lambda row: row["total_xp"], reverse=True)
+        return rows
+    
+    def rank_of(self, username: str) -> Optional[int]:
+        """A user's global rank"""
+        with self._lock:
+            return self._global.rank(username.lower())
+    
+    def snapshot(self) -> Optional[Dict]:
+        """The seeded entries and when they were seeded, for restoring after a restart"""
+        with self._lock:
+            if not self.seeded:
+                return None
+            users = [{field: entry[field] for field in LEADERBOARD_ATTRIBUTES if field in entry} for entry in self._users.values()]
+            return {"users": users, "seeded_at": self.seeded_at}
+    
+    def restore(self, snapshot: Dict) -> int:
+        """Seed from a snapshot, keeping its age so the next read reconciles it with the table"""
+        with self._lock:
+            if self.seeded:
+                return 0
+            count = self.seed(snapshot["users"])
+            self.seeded_at = snapshot["seeded_at"]
+            return count
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "groups": len(self._groups),
+                "universities": len(self._universities),
+                "seeded_at": self.seeded_at,
+            }
+
+
+# Global leaderboard instance
+leaderboard = Leaderboard()
@@ -19,14 +19,21 @@ from routes.auth import router as auth_router
 from routes.users import router as users_router
 from routes.groups import router as groups_router
 from routes.daily import router as daily_router
-from aws import VerificationOperations
 from routes.bounties import router as bounties_router
 from routes.duels import router as duels_router
+from routes.cache import router as cache_router
 
 # Import cache manager and AWS operations
 from cache_manager import cache_manager
-from aws import DuelOperations
-from logger import debug, info, warning, error
+from scheduler import scheduler, IntervalTrigger
+from aws import (
+    AsyncDuelOperations,
+    ddb_metrics,
+    shutdown_db_executor,
+    warm_dynamodb_connections,
+    xp_accumulator
+)
+from logger import debug, info, warning, error, duel_check, duel_action
 
 # Lifespan event handler
 @asynccontextmanager
@@ -35,18 +42,39 @@ async def lifespan(app: FastAPI):
     # Startup
     info("Starting FastAPI server with background tasks")
     
-    # Start background tasks
-    duel_task = asyncio.create_task(monitor_active_duels())
-    cleanup_task = asyncio.create_task(cleanup_expired_codes_task())
+    # Open DynamoDB connections before traffic arrives
+    warmed = await asyncio.to_thread(warm_dynamodb_connections)
+    info(f"Warmed {warmed} DynamoDB connections")
+    
+    # Serve long-lived entries and the leaderboard from the last snapshot while the jobs below revalidate them
+    restored = await asyncio.to_thread(cache_manager.load_snapshot)
+    info(f"Restored {restored} cache entries from snapshot")
+    
+    # Start background jobs
+    scheduler.add_job("duel-timeouts", check_duel_timeouts, IntervalTrigger(30, jitter=3))
+    cache_manager.register_jobs(scheduler)
+    scheduler.start()
     
     yield
     
     # Shutdown
     info("Shutting down FastAPI server")
     
-    # Cancel background tasks
-    duel_task.cancel()
-    cleanup_task.cancel()
+    # Stop background jobs
+    await scheduler.stop()
+    
+    # Write any XP still waiting in the accumulator while the shared cache can still broadcast the writes
+    await asyncio.to_thread(xp_accumulator.stop)
+    
+    # Save the cache for the next start, then close the shared tier
+    try:
+        await asyncio.to_thread(cache_manager.save_snapshot)
+    except Exception as snapshot_error:
+        warning(f"Could not save cache snapshot: {snapshot_error}")
+    cache_manager.stop()
+    
+    # Release the DynamoDB worker threads
+    shutdown_db_executor()
 
 app = FastAPI(
     title="YeetCode Email API",
@@ -76,6 +104,10 @@ HOST = os.getenv("HOST")
 if not HOST:
     raise ValueError("HOST environment variable is required")
 
+# Verification codes are stored only in their own table
+if not os.getenv("VERIFICATION_TABLE"):
+    raise ValueError("VERIFICATION_TABLE environment variable is required; create the table with python -m migrations.verification_store")
+
 # Include routers
 app.include_router(auth_router)
 app.include_router(users_router)
@@ -83,6 +115,7 @@ app.include_router(groups_router)
 app.include_router(daily_router)
 app.include_router(bounties_router)
 app.include_router(duels_router)
+app.include_router(cache_router)
 
 if DEBUG_MODE:
     print("[DEBUG] Registered routes:")
@@ -99,71 +132,30 @@ async def root():
 
 
 
-@app.get("/cache/stats")
-async def get_cache_stats():
-    """Get cache statistics"""
-    return cache_manager.get_cache_stats()
+@app.get("/db/stats")
+async def get_db_stats():
+    """Get DynamoDB connection pool, retry and XP write-coalescing statistics"""
+    return {**ddb_metrics.snapshot(), "xp_accumulator": xp_accumulator.stats()}
 
 
-@app.post("/cache/clear")
-async def clear_cache():
-    """Clear all cache (admin only)"""
-    # In a real app, you'd add authentication here
-    cache_manager._cache.clear()
-    return {"success": True, "message": "Cache cleared"}
+@app.get("/scheduler/stats")
+async def get_scheduler_stats():
+    """Get background job run counts, durations and last successes"""
+    return scheduler.stats()
 
 
-# Background task for monitoring active duels
-async def monitor_active_duels():
-    """Background task to monitor active duels for timeouts and completion"""
-    info("Starting duel monitoring background task")
-    
-    while True:
-        try:
-            # First check if there are any active duels before processing
-            scan_params = {
-                'TableName': os.getenv('DUELS_TABLE'),
-                'FilterExpression': '#status = :active',
-                'ExpressionAttributeNames': {'#status': 'status'},
-                'ExpressionAttributeValues': {':active': {'S': 'ACTIVE'}},
-                'Select': 'COUNT'  # Only count, don't return data
-            }
-            
-            from aws import ddb
-            scan_result = ddb.scan(**scan_params)
-            active_duels_count = scan_result.get('Count', 0)
-            
-            if active_duels_count > 0:
-                from logger import duel_check, duel_action
-                duel_check(f"Checking {active_duels_count} active duels for timeouts")
-                # Only process timeouts if there are active duels
-                result = await DuelOperations.handle_duel_timeouts()
-                if result.get('completed_duels', 0) > 0:
-                    duel_action(f"Processed {result['completed_duels']} duel timeouts ({active_duels_count} active duels)")
-            
-        except Exception as error:
-            error(f"Duel monitoring error: {error}")
-        
-        # Check every 30 seconds
-        await asyncio.sleep(30)
-
-# Background task for cleaning up expired verification codes
-async def cleanup_expired_codes_task():
-    """Background task to clean up expired verification codes every 5 minutes"""
-    debug("Starting cleanup expired codes background task")
+# Background job for monitoring active duels
+async def check_duel_timeouts():
+    """Complete active duels whose timeout has passed"""
+    # The status index query only returns active duels old enough to time out
+    result = await AsyncDuelOperations.handle_duel_timeouts()
+    if not result.get('success'):
+        raise Exception(result.get('error', 'Duel timeout check failed'))
     
-    while True:
-        try:
-            result = VerificationOperations.cleanup_expired_codes()
-            if result.get('count', 0) > 0:
-                info(f"Cleaned up {result.get('count', 0)} expired verification codes")
-        except Exception as error:
-            error(f"Cleanup expired codes error: {error}")
-        
-        # Check every 5 minutes
-        await asyncio.sleep(5 * 60)
-
-
+    if result.get('due_duels', 0) > 0:
+        duel_check(f"Checked {result['due_duels']} active duels for timeouts")
+        if result.get('completed_duels', 0) > 0:
+            duel_action(f"Processed {result['completed_duels']} duel timeouts ({result['due_duels']} due duels)")
 
 
 if __name__ == "__main__":
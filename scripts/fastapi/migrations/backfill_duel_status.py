@@ -0,0 +1,74 @@
+"""
+One-off backfill of the duel status index attributes
+
+Duels created before the status index existed lack openStatus/openSince, so
+the index cannot see them. This copies them onto every unfinished duel.
+Run from scripts/fastapi after migrations.indexes:  python -m migrations.backfill_duel_status
+"""
+
+from typing import Dict, Optional
+
+from botocore.exceptions import ClientError
+
+from aws import ddb, scan_items, DDB_SCAN_SEGMENTS, DUELS_TABLE
+from logger import info
+
+# The timestamp each open status is measured from, matching create/accept/start_duel
+OPEN_SINCE_FIELDS = {
+    'PENDING': 'createdAt',
+    'ACCEPTED': 'acceptedAt',
+    'ACTIVE': 'startTime',
+}
+
+
+def _open_since(duel: Dict, status: str) -> Optional[str]:
+    field = OPEN_SINCE_FIELDS[status]
+    return duel.get(field, {}).get('S') or duel.get('createdAt', {}).get('S')
+
+
+def backfill_duel_status() -> int:
+    """Tag every unfinished duel that is missing its status index attributes"""
+    if not DUELS_TABLE:
+        raise Exception("DUELS_TABLE not configured")
+    
+    duels = scan_items(
+        DUELS_TABLE,
+        DDB_SCAN_SEGMENTS,
+        ['duelId', 'status', 'createdAt', 'acceptedAt', 'startTime'],
+        FilterExpression='#status IN (:pending, :accepted, :active) AND attribute_not_exists(openStatus)',
+        ExpressionAttributeNames={'#status': 'status'},
+        ExpressionAttributeValues={
+            ':pending': {'S': 'PENDING'},
+            ':accepted': {'S': 'ACCEPTED'},
+            ':active': {'S': 'ACTIVE'},
+        }
+    )
+    
+    updated = 0
+    for duel in duels:
+        status = duel['status']['S']
+        open_since = _open_since(duel, status)
+        if not open_since:
+            continue
+        
+        try:
+            # Skip duels whose status moved on since the scan
+            ddb.update_item(
+                TableName=DUELS_TABLE,
+                Key={'duelId': duel['duelId']},
+                UpdateExpression='SET openStatus = :status, openSince = :since',
+                ConditionExpression='#status = :status',
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={':status': {'S': status}, ':since': {'S': open_since}}
+            )
+            updated += 1
+        except ClientError as update_error:
+            if update_error.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                raise
+    
+    info(f"Tagged {updated} open duels for the status index")
+    return updated
+
+
+if __name__ == "__main__":
+    backfill_duel_status()
@@ -0,0 +1,102 @@
+"""
+One-off backfill of the streak counters kept on user records
+
+Walks the full daily-problem history once and writes current_streak,
+longest_streak and last_completed_date for every user who has completed a
+problem. Users who completed a problem after the scan keep their newer values.
+Run from scripts/fastapi:  python -m migrations.backfill_streaks [--dry-run]
+"""
+
+import argparse
+from datetime import datetime, timedelta
+from typing import Dict, List, Set
+
+from botocore.exceptions import ClientError
+
+from aws import ddb, scan_items, DAILY_TABLE, USERS_TABLE
+from logger import info, warning
+
+
+def _completed(value: Dict) -> bool:
+    """A users-map entry counts unless it is an explicit false"""
+    return value.get('BOOL', True) is not False
+
+
+def collect_completions() -> Dict[str, Set[str]]:
+    """Map each username to the set of dates on which they completed the daily problem"""
+    completions: Dict[str, Set[str]] = {}
+    for item in scan_items(DAILY_TABLE, 1, ['date', 'users']):
+        date = item.get('date', {}).get('S')
+        if not date:
+            continue
+        for username, value in item.get('users', {}).get('M', {}).items():
+            if _completed(value):
+                completions.setdefault(username.lower(), set()).add(date)
+    return completions
+
+
+def compute_streaks(dates: Set[str]) -> Dict:
+    """Current streak (ending at the last completion), longest streak and last completion date"""
+    ordered: List[str] = sorted(dates)
+    longest = current = 0
+    previous = None
+    for date in ordered:
+        day = datetime.strptime(date, '%Y-%m-%d')
+        current = current + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+        longest = max(longest, current)
+        previous = day
+    return {'current_streak': current, 'longest_streak': longest, 'last_completed_date': ordered[-1]}
+
+
+def write_streaks(username: str, streaks: Dict) -> bool:
+    """Store the counters unless the user has completed a newer problem since the scan"""
+    try:
+        ddb.update_item(
+            TableName=USERS_TABLE,
+            Key={'username': {'S': username}},
+            UpdateExpression='SET current_streak = :current, longest_streak = :longest, last_completed_date = :last',
+            ConditionExpression=(
+                'attribute_exists(username) AND '
+                '(attribute_not_exists(last_completed_date) OR last_completed_date <= :last)'
+            ),
+            ExpressionAttributeValues={
+                ':current': {'N': str(streaks['current_streak'])},
+                ':longest': {'N': str(streaks['longest_streak'])},
+                ':last': {'S': streaks['last_completed_date']},
+            }
+        )
+        return True
+    except ClientError as update_error:
+        if update_error.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+def backfill_streaks(dry_run: bool = False) -> int:
+    """Compute and store streak counters for every user with a completion"""
+    if not DAILY_TABLE or not USERS_TABLE:
+        raise Exception("Tables not configured")
+    
+    completions = collect_completions()
+    info(f"Found completions for {len(completions)} users")
+    
+    updated = 0
+    for username, dates in completions.items():
+        streaks = compute_streaks(dates)
+        if dry_run:
+            info(f"{username}: {streaks}")
+            continue
+        if write_streaks(username, streaks):
+            updated += 1
+        else:
+            warning(f"Skipped {username}: missing user or newer completion recorded")
+    
+    info(f"Backfilled streaks for {updated} users")
+    return updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="print the computed counters without writing")
+    args = parser.parse_args()
+    backfill_streaks(args.dry_run)
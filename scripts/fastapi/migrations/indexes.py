@@ -0,0 +1,94 @@
+"""
+Global secondary indexes used by the YeetCode API
+
+Creates any missing index and waits for it to become ACTIVE.
+Run from scripts/fastapi:  python -m migrations.indexes
+"""
+
+import time
+from typing import Dict, List, Optional
+
+from aws import (
+    ddb,
+    USERS_TABLE,
+    DUELS_TABLE,
+    GROUP_ID_INDEX,
+    EMAIL_INDEX,
+    DUEL_STATUS_INDEX,
+    CHALLENGER_INDEX,
+    CHALLENGEE_INDEX,
+)
+from logger import info, warning
+
+# (table, index name, hash key, range key)
+INDEXES = [
+    (USERS_TABLE, GROUP_ID_INDEX, 'group_id', None),
+    (USERS_TABLE, EMAIL_INDEX, 'email', None),
+    (DUELS_TABLE, DUEL_STATUS_INDEX, 'openStatus', 'openSince'),
+    (DUELS_TABLE, CHALLENGER_INDEX, 'challenger', 'createdAt'),
+    (DUELS_TABLE, CHALLENGEE_INDEX, 'challengee', 'createdAt'),
+]
+
+
+def _wait_until_active(table_name: str, index_name: Optional[str] = None, poll_seconds: int = 10) -> None:
+    """Block until the table (and optionally one of its indexes) has finished updating"""
+    while True:
+        table = ddb.describe_table(TableName=table_name)['Table']
+        indexes = {gsi['IndexName']: gsi for gsi in table.get('GlobalSecondaryIndexes', [])}
+        
+        table_ready = table['TableStatus'] == 'ACTIVE'
+        index_ready = index_name is None or indexes.get(index_name, {}).get('IndexStatus') == 'ACTIVE'
+        if table_ready and index_ready:
+            return
+        time.sleep(poll_seconds)
+
+
+def ensure_index(table_name: str, index_name: str, hash_key: str, range_key: Optional[str] = None) -> bool:
+    """Create a string-keyed GSI projecting all attributes if it doesn't exist yet"""
+    table = ddb.describe_table(TableName=table_name)['Table']
+    existing = {gsi['IndexName'] for gsi in table.get('GlobalSecondaryIndexes', [])}
+    if index_name in existing:
+        info(f"Index {index_name} already exists on {table_name}")
+        return False
+    
+    key_schema: List[Dict] = [{'AttributeName': hash_key, 'KeyType': 'HASH'}]
+    attribute_definitions: List[Dict] = [{'AttributeName': hash_key, 'AttributeType': 'S'}]
+    if range_key:
+        key_schema.append({'AttributeName': range_key, 'KeyType': 'RANGE'})
+        attribute_definitions.append({'AttributeName': range_key, 'AttributeType': 'S'})
+    
+    create = {
+        'IndexName': index_name,
+        'KeySchema': key_schema,
+        'Projection': {'ProjectionType': 'ALL'},
+    }
+    
+    # Provisioned tables need explicit capacity for the new index
+    if table.get('BillingModeSummary', {}).get('BillingMode') != 'PAY_PER_REQUEST':
+        create['ProvisionedThroughput'] = {'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
+    
+    # Only one index can be created per UpdateTable call, and not while another is building
+    _wait_until_active(table_name)
+    ddb.update_table(
+        TableName=table_name,
+        AttributeDefinitions=attribute_definitions,
+        GlobalSecondaryIndexUpdates=[{'Create': create}]
+    )
+    info(f"Creating index {index_name} on {table_name}")
+    
+    _wait_until_active(table_name, index_name)
+    info(f"Index {index_name} is active on {table_name}")
+    return True
+
+
+def ensure_indexes() -> None:
+    """Create every index the API expects"""
+    for table_name, index_name, hash_key, range_key in INDEXES:
+        if not table_name:
+            warning(f"Skipping {index_name}: table not configured")
+            continue
+        ensure_index(table_name, index_name, hash_key, range_key)
+
+
+if __name__ == "__main__":
+    ensure_indexes()
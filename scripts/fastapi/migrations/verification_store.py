@@ -0,0 +1,86 @@
+"""
+Move verification codes out of the users table into their own TTL table
+
+Creates VERIFICATION_TABLE (hash key email, on-demand billing) if needed,
+enables native TTL on expires_at, copies every still-valid verification_<email>
+row across and deletes all of them from USERS_TABLE.
+Run from scripts/fastapi:  python -m migrations.verification_store [--dry-run]
+"""
+
+import argparse
+import time
+
+from aws import ddb, scan_items, DDB_SCAN_SEGMENTS, USERS_TABLE, VERIFICATION_TABLE
+from logger import info
+
+TTL_ATTRIBUTE = 'expires_at'
+
+
+def ensure_table() -> None:
+    """Create the verification table and turn on TTL expiry"""
+    try:
+        ddb.describe_table(TableName=VERIFICATION_TABLE)
+    except ddb.exceptions.ResourceNotFoundException:
+        ddb.create_table(
+            TableName=VERIFICATION_TABLE,
+            AttributeDefinitions=[{'AttributeName': 'email', 'AttributeType': 'S'}],
+            KeySchema=[{'AttributeName': 'email', 'KeyType': 'HASH'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        ddb.get_waiter('table_exists').wait(TableName=VERIFICATION_TABLE)
+        info(f"Created table {VERIFICATION_TABLE}")
+    
+    ttl = ddb.describe_time_to_live(TableName=VERIFICATION_TABLE)['TimeToLiveDescription']
+    if ttl.get('TimeToLiveStatus') in ('ENABLED', 'ENABLING'):
+        info(f"TTL already enabled on {VERIFICATION_TABLE}.{ttl.get('AttributeName')}")
+        return
+    ddb.update_time_to_live(
+        TableName=VERIFICATION_TABLE,
+        TimeToLiveSpecification={'Enabled': True, 'AttributeName': TTL_ATTRIBUTE}
+    )
+    info(f"Enabled TTL on {VERIFICATION_TABLE}.{TTL_ATTRIBUTE}")
+
+
+def move_verification_rows(dry_run: bool = False) -> int:
+    """Copy live codes to the verification table and delete every code row from the users table"""
+    now = int(time.time())
+    moved = removed = 0
+    for record in scan_items(
+        USERS_TABLE,
+        DDB_SCAN_SEGMENTS,
+        FilterExpression='begins_with(username, :prefix)',
+        ExpressionAttributeValues={':prefix': {'S': 'verification_'}}
+    ):
+        expires_at = int(record.get('ttl', {}).get('N', '0'))
+        email = record.get('email', {}).get('S') or record['username']['S'][len('verification_'):]
+        if dry_run:
+            info(f"{record['username']['S']}: {'move' if expires_at > now else 'delete'}")
+            continue
+        
+        if expires_at > now and 'verification_code' in record:
+            item = {
+                'email': {'S': email.lower()},
+                'verification_code': record['verification_code'],
+                TTL_ATTRIBUTE: {'N': str(expires_at)},
+            }
+            if 'created_at' in record:
+                item['created_at'] = record['created_at']
+            ddb.put_item(TableName=VERIFICATION_TABLE, Item=item)
+            moved += 1
+        ddb.delete_item(TableName=USERS_TABLE, Key={'username': record['username']})
+        removed += 1
+    
+    info(f"Moved {moved} live verification codes and removed {removed} rows from {USERS_TABLE}")
+    return moved
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="list the rows without creating or moving anything")
+    args = parser.parse_args()
+    
+    if not USERS_TABLE or not VERIFICATION_TABLE:
+        raise Exception("USERS_TABLE and VERIFICATION_TABLE must be configured")
+    if not args.dry_run:
+        ensure_table()
+    move_verification_rows(args.dry_run)
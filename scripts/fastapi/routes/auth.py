@@ -9,7 +9,7 @@ from dotenv import load_dotenv
 from models import EmailOTPRequest, EmailOTPResponse
 from auth import verify_api_key, check_rate_limit
 from email_service import send_email_otp
-from aws import VerificationOperations
+from aws import AsyncVerificationOperations
 
 # Load environment variables
 load_dotenv()
@@ -79,7 +79,7 @@ async def store_verification_code_endpoint(
 ):
     """Store verification code in DynamoDB"""
     try:
-        success = VerificationOperations.store_verification_code(request.email, request.code)
+        success = await AsyncVerificationOperations.store_verification_code(request.email, request.code)
         return {"success": success, "message": "Verification code stored"}
     except Exception as error:
         return {"success": False, "error": str(error)}
@@ -92,7 +92,7 @@ async def verify_code_endpoint(
 ):
     """Verify code and get user data"""
     try:
-        result = VerificationOperations.verify_code_and_get_user(request.email, request.code)
+        result = await AsyncVerificationOperations.verify_code_and_get_user(request.email, request.code)
         return result
     except Exception as error:
         return {"success": False, "error": str(error)}
@@ -6,7 +6,7 @@ from fastapi import APIRouter, Depends
 
 from models import BountyRequest
 from auth import verify_api_key
-from aws import BountyOperations
+from aws import AsyncBountyOperations
 from cache_manager import cache_manager, CacheType
 
 router = APIRouter(tags=["Bounties"])
@@ -26,31 +26,32 @@ async def get_user_bounties_endpoint(
         if refresh:
             cache_manager.invalidate_all(CacheType.BOUNTY_COMPETITIONS)
         
-        # Check cache first for bounties
-        cached_bounties = cache_manager.get(CacheType.BOUNTIES)
-        cached_competitions = cache_manager.get(CacheType.BOUNTY_COMPETITIONS)
-        
-        if cached_bounties and cached_competitions and not refresh:
-            # Use cached data
-            bounties_data = cached_bounties.get('data', [])
-            competitions_data = cached_competitions
-            
-            # Filter bounties for this user
-            user_bounties = []
-            for bounty in bounties_data:
-                bounty_id = bounty.get('id')
-                if bounty_id and bounty_id in competitions_data:
-                    user_progress = competitions_data[bounty_id].get('data', {}).get(username, {})
-                    bounty['user_progress'] = user_progress
-                user_bounties.append(bounty)
+        if not refresh:
+            # Both caches load once for all concurrent requests on a miss
+            cached_bounties = await cache_manager.get_or_load(CacheType.BOUNTIES)
+            cached_competitions = await cache_manager.get_or_load(CacheType.BOUNTY_COMPETITIONS)
             
-            return {
-                "success": True,
-                "data": user_bounties
-            }
+            if cached_bounties and cached_competitions:
+                # Use cached data
+                bounties_data = cached_bounties.get('data', [])
+                competitions_data = cached_competitions
+                
+                # Filter bounties for this user
+                user_bounties = []
+                for bounty in bounties_data:
+                    bounty_id = bounty.get('id')
+                    if bounty_id and bounty_id in competitions_data:
+                        user_progress = competitions_data[bounty_id].get('data', {}).get(username, {})
+                        bounty['user_progress'] = user_progress
+                    user_bounties.append(bounty)
+                
+                return {
+                    "success": True,
+                    "data": user_bounties
+                }
         
         # Fallback to database (or forced refresh)
-        result = BountyOperations.get_user_bounties(username)
+        result = await AsyncBountyOperations.get_user_bounties(username)
         return result
     except Exception as error:
         return {"success": False, "error": str(error)}
@@ -62,13 +63,8 @@ async def get_all_bounties_endpoint(
 ):
     """Get all bounties"""
     try:
-        # Check cache first for bounties
-        cached_bounties = cache_manager.get(CacheType.BOUNTIES)
-        if cached_bounties:
-            return cached_bounties
-        
-        # Fallback to database
-        result = BountyOperations.get_all_bounties()
+        # Served from cache; concurrent misses share one load
+        result = await cache_manager.get_or_load(CacheType.BOUNTIES)
         return result
     except Exception as error:
         return {"success": False, "error": str(error)}
@@ -89,7 +85,7 @@ async def get_bounty_endpoint(
                     return {"success": True, "data": bounty}
         
         # Fallback to database
-        result = BountyOperations.get_bounty_by_id(bounty_id)
+        result = await AsyncBountyOperations.get_bounty_by_id(bounty_id)
         return result
     except Exception as error:
         return {"success": False, "error": str(error)}
@@ -108,7 +104,7 @@ async def get_bounty_progress_endpoint(
             return cached_competitions[bounty_id]
         
         # Fallback to database
-        result = BountyOperations.get_bounty_progress(bounty_id)
+        result = await AsyncBountyOperations.get_bounty_progress(bounty_id)
         return result
     except Exception as error:
         return {"success": False, "error": str(error)}
@@ -0,0 +1,66 @@
+"""
+Cache monitoring and administration routes
+"""
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+
+from auth import verify_api_key
+from cache_manager import cache_manager, CacheType
+
+router = APIRouter(tags=["Cache"])
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Get per-type cache counters, hit ratios, load latency and sizes"""
+    return cache_manager.get_cache_stats()
+
+
+@router.get("/cache/metrics", response_class=PlainTextResponse)
+async def get_cache_metrics():
+    """Cache statistics in the Prometheus text format, for scraping"""
+    return cache_manager.prometheus_metrics()
+
+
+@router.get("/cache/entries")
+async def get_cache_entries(
+    cache_type: Optional[CacheType] = None,
+    api_key: str = Depends(verify_api_key)
+):
+    """List cached entries (optionally of one type) with their size, age and TTL"""
+    return {"success": True, "data": cache_manager.inspect(cache_type)}
+
+
+@router.get("/cache/entries/{key}")
+async def get_cache_entry(
+    key: str,
+    api_key: str = Depends(verify_api_key)
+):
+    """Inspect one cached entry, including its data"""
+    entry = cache_manager.inspect_key(key)
+    if entry is None:
+        return {"success": False, "error": "Entry not cached"}
+    return {"success": True, "data": entry}
+
+
+@router.post("/cache/flush")
+async def flush_cache(
+    cache_type: Optional[CacheType] = None,
+    identifier: Optional[str] = None,
+    api_key: str = Depends(verify_api_key)
+):
+    """Flush one entry (cache_type and identifier), one type (cache_type) or everything (neither), in every worker"""
+    if cache_type is None:
+        if identifier:
+            return {"success": False, "error": "identifier requires cache_type"}
+        cache_manager.clear()
+        return {"success": True, "message": "Cache cleared"}
+    
+    if identifier:
+        cache_manager.invalidate(cache_type, identifier)
+        return {"success": True, "message": f"Flushed {cache_type.value}:{identifier}"}
+    
+    cache_manager.invalidate_all(cache_type)
+    return {"success": True, "message": f"Flushed {cache_type.value}"}
@@ -6,7 +6,7 @@ from fastapi import APIRouter, Depends
 
 from models import DailyProblemRequest
 from auth import verify_api_key
-from aws import DailyProblemOperations
+from aws import AsyncDailyProblemOperations, DailyProblemOperations
 from cache_manager import cache_manager, CacheType
 
 router = APIRouter(tags=["Daily Problems"])
@@ -23,32 +23,23 @@ async def get_daily_problem_endpoint(
     try:
         print(f"[DEBUG] Getting daily problem for user: {username}")
         
-        # Check cache first for daily problem
-        cached_problem = cache_manager.get(CacheType.DAILY_PROBLEM)
-        cached_completions = cache_manager.get(CacheType.DAILY_COMPLETIONS)
+        # Daily problem from cache, loaded once for all concurrent requests on a miss
+        problem_data = await cache_manager.get_or_load(CacheType.DAILY_PROBLEM)
         
-        print(f"[DEBUG] Cached problem: {'Found' if cached_problem else 'Not found'}")
-        print(f"[DEBUG] Cached completions: {'Found' if cached_completions else 'Not found'}")
+        print(f"[DEBUG] Cached problem: {'Found' if problem_data else 'Not found'}")
         
-        if cached_problem:
-            # Have cached problem
-            problem_data = cached_problem
-            
-            # Check or create completions cache
-            if cached_completions:
-                completions_data = cached_completions
-            else:
-                # Create completions data from the cached problem
-                print("[DEBUG] Populating missing completions cache")
-                completions_data = {
+        if problem_data:
+            # Completions can be built from the cached problem itself
+            completions_data = await cache_manager.get_or_load(
+                CacheType.DAILY_COMPLETIONS,
+                loader=lambda: {
                     "success": True,
                     "data": {
                         "users": problem_data.get('users', {}),
                         "problem_date": problem_data.get('date')
                     }
                 }
-                # Cache the completions
-                cache_manager.set(CacheType.DAILY_COMPLETIONS, completions_data)
+            )
             
             # Check if user completed today's problem
             users_data = completions_data.get('data', {}).get('users', {})
@@ -63,17 +54,12 @@ async def get_daily_problem_endpoint(
                 else:
                     user_completed = True  # Default to true if user exists in the users field
             
-            # Check cache for user's streak data
-            cached_user_data = cache_manager.get(CacheType.USER_DAILY_DATA, username)
-            if cached_user_data:
-                # Use cached user data
-                user_data = cached_user_data
-                print(f"[CACHE] Using cached user daily data for {username}")
-            else:
-                # Get user's streak from database and cache it
-                user_data = DailyProblemOperations.get_user_daily_data(username)
-                cache_manager.set(CacheType.USER_DAILY_DATA, user_data, username)
-                print(f"[CACHE] Cached user daily data for {username}")
+            # User's streak data, cached per user
+            user_data = await cache_manager.get_or_load(
+                CacheType.USER_DAILY_DATA,
+                username,
+                loader=lambda: DailyProblemOperations.get_user_daily_data(username)
+            )
             
             return {
                 "success": True,
@@ -86,7 +72,7 @@ async def get_daily_problem_endpoint(
             }
         
         # Fallback to database if cache miss
-        result = DailyProblemOperations.get_daily_problem_data(username)
+        result = await AsyncDailyProblemOperations.get_daily_problem_data(username)
         return result
         
     except Exception as error:
@@ -101,7 +87,7 @@ async def complete_daily_problem_endpoint(
     """Mark daily problem as completed for a user"""
     try:
         # Complete the problem in database
-        result = DailyProblemOperations.complete_daily_problem(request.username)
+        result = await AsyncDailyProblemOperations.complete_daily_problem(request.username)
         
         # Invalidate cache to force refresh
         cache_manager.invalidate_all(CacheType.DAILY_COMPLETIONS)
@@ -119,13 +105,13 @@ async def get_top_daily_problems_endpoint(
 ):
     """Get top 2 daily problems for caching"""
     try:
-        # Check cache first
-        cached_problems = cache_manager.get(CacheType.DAILY_PROBLEM)
+        # Check cache first, loading it once on a miss
+        cached_problems = await cache_manager.get_or_load(CacheType.DAILY_PROBLEM)
         if cached_problems:
             return {"success": True, "data": [cached_problems]}
         
         # Fallback to database
-        result = DailyProblemOperations.get_top_daily_problems()
+        result = await AsyncDailyProblemOperations.get_top_daily_problems()
         return result
     except Exception as error:
         return {"success": False, "error": str(error)}
@@ -137,13 +123,8 @@ async def get_daily_completions_endpoint(
 ):
     """Get today's daily problem completions"""
     try:
-        # Check cache first
-        cached_completions = cache_manager.get(CacheType.DAILY_COMPLETIONS)
-        if cached_completions:
-            return cached_completions
-        
-        # Fallback to database
-        result = DailyProblemOperations.get_todays_completions()
+        # Served from cache; concurrent misses share one load
+        result = await cache_manager.get_or_load(CacheType.DAILY_COMPLETIONS)
         return result
     except Exception as error:
         return {"success": False, "error": str(error)}
\ No newline at end of file
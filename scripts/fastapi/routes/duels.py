@@ -2,11 +2,12 @@
 Duel routes
 """
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
 
 from models import DuelRequest
 from auth import verify_api_key
-from aws import DuelOperations
+from aws import AsyncDuelOperations, DuelOperations
 from cache_manager import cache_manager, CacheType
 
 router = APIRouter(tags=["Duels"])
@@ -17,12 +18,15 @@ DEBUG_MODE = True
 @router.get("/duels/{username}")
 async def get_user_duels_endpoint(
     username: str,
+    status: Optional[str] = None,
+    since: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
     api_key: str = Depends(verify_api_key)
 ):
-    """Get duels for a user and automatically clean up expired duels"""
+    """Get duels for a user (optionally by status, createdAt >= since and limit) and clean up expired duels"""
     try:
         # First, clean up any expired duels automatically
-        cleanup_result = DuelOperations.cleanup_expired_duels()
+        cleanup_result = await AsyncDuelOperations.cleanup_expired_duels()
         if cleanup_result.get('count', 0) > 0:
             print(f"[DEBUG] Cleaned up {cleanup_result.get('count', 0)} expired duels during get_user_duels")
         
@@ -30,11 +34,7 @@ async def get_user_duels_endpoint(
         cached_duels = cache_manager.get(CacheType.DUELS)
         if cached_duels:
             # Filter duels for this user
-            user_duels = []
-            for duel in cached_duels.get('data', []):
-                if (duel.get('username') == username or 
-                    duel.get('opponent') == username):
-                    user_duels.append(duel)
+            user_duels = DuelOperations.filter_duels(cached_duels.get('data', []), username, status, since, limit)
             
             return {
                 "success": True,
@@ -42,7 +42,7 @@ async def get_user_duels_endpoint(
             }
         
         # Fallback to database
-        result = DuelOperations.get_user_duels(username)
+        result = await AsyncDuelOperations.get_user_duels(username, status, since, limit)
         return result
     except Exception as error:
         return {"success": False, "error": str(error)}
@@ -58,16 +58,13 @@ async def create_duel_endpoint(
         if DEBUG_MODE:
             print(f"[DEBUG] Creating duel - username: {request.username}, opponent: {request.opponent}, problem_slug: {request.problem_slug}, difficulty: {request.difficulty}")
         
-        result = DuelOperations.create_duel(
+        result = await AsyncDuelOperations.create_duel(
             request.username, 
             request.opponent, 
             request.problem_slug,
             request.difficulty
         )
         
-        # Invalidate cache to force refresh
-        cache_manager.invalidate_all(CacheType.DUELS)
-        
         return result
     except Exception as error:
         return {"success": False, "error": str(error)}
@@ -80,10 +77,7 @@ async def accept_duel_endpoint(
 ):
     """Accept a duel"""
     try:
-        result = DuelOperations.accept_duel(request.username, request.duel_id)
-        
-        # Invalidate cache to force refresh
-        cache_manager.invalidate_all(CacheType.DUELS)
+        result = await AsyncDuelOperations.accept_duel(request.username, request.duel_id)
         
         return result
     except Exception as error:
@@ -97,10 +91,7 @@ async def start_duel_endpoint(
 ):
     """Mark that a user has started working on a duel"""
     try:
-        result = DuelOperations.start_duel(request.username, request.duel_id)
-        
-        # Invalidate cache to force refresh
-        cache_manager.invalidate_all(CacheType.DUELS)
+        result = await AsyncDuelOperations.start_duel(request.username, request.duel_id)
         
         return result
     except Exception as error:
@@ -115,10 +106,7 @@ async def complete_duel_endpoint(
     """Complete a duel submission"""
     try:
         # Legacy endpoint - redirects to record submission
-        result = DuelOperations.record_duel_submission(request.username, request.duel_id, 0)
-        
-        # Invalidate cache to force refresh
-        cache_manager.invalidate_all(CacheType.DUELS)
+        result = await AsyncDuelOperations.record_duel_submission(request.username, request.duel_id, 0)
         
         return result
     except Exception as error:
@@ -136,10 +124,7 @@ async def reject_duel_endpoint(
         if not duel_id:
             return {"success": False, "error": "Duel ID required"}
         
-        result = DuelOperations.reject_duel(duel_id)
-        
-        # Invalidate cache to force refresh
-        cache_manager.invalidate_all(CacheType.DUELS)
+        result = await AsyncDuelOperations.reject_duel(duel_id)
         
         return result
     except Exception as error:
@@ -160,10 +145,7 @@ async def record_duel_submission_endpoint(
         if not duel_id or not username:
             return {"success": False, "error": "Duel ID and username required"}
         
-        result = DuelOperations.record_duel_submission(username, duel_id, elapsed_ms)
-        
-        # Invalidate cache to force refresh
-        cache_manager.invalidate_all(CacheType.DUELS)
+        result = await AsyncDuelOperations.record_duel_submission(username, duel_id, elapsed_ms)
         
         return result
     except Exception as error:
@@ -177,15 +159,13 @@ async def get_duel_endpoint(
 ):
     """Get a specific duel by ID"""
     try:
-        # Check cache first for duels
-        cached_duels = cache_manager.get(CacheType.DUELS)
+        # Check the cached duels' id index first
+        cached_duels = await cache_manager.lookup(CacheType.DUELS, 'duelId', duel_id, load=False)
         if cached_duels:
-            for duel in cached_duels.get('data', []):
-                if duel.get('id') == duel_id:
-                    return {"success": True, "data": duel}
+            return {"success": True, "data": cached_duels[0]}
         
         # Fallback to database
-        result = DuelOperations.get_duel_by_id(duel_id)
+        result = await AsyncDuelOperations.get_duel_by_id(duel_id)
         return result
     except Exception as error:
         return {"success": False, "error": str(error)}
\ No newline at end of file
@@ -2,13 +2,13 @@
 User routes
 """
 
-from fastapi import APIRouter, Depends
-from typing import Dict
+from fastapi import APIRouter, Depends, Query
+from typing import Dict, Optional
 from pydantic import BaseModel
 
 from models import UserData
 from auth import verify_api_key
-from aws import UserOperations
+from aws import AsyncUserOperations, xp_accumulator
 from cache_manager import cache_manager, CacheType
 
 router = APIRouter(tags=["Users"])
@@ -29,15 +29,14 @@ async def get_user_endpoint(
 ):
     """Get user data from DynamoDB"""
     try:
-        # Check cache first for user data
-        cached_users = cache_manager.get(CacheType.USERS)
+        # Check the cached users' username index first
+        cached_users = await cache_manager.lookup(CacheType.USERS, 'username', username)
         if cached_users:
-            user_data = cached_users.get('data', {}).get(username)
-            if user_data:
-                return {"success": True, "data": user_data}
+            # The cached copy only gains accumulated XP once it is flushed
+            return {"success": True, "data": xp_accumulator.overlay_user(cached_users[0])}
         
         # Fallback to database
-        user_data = UserOperations.get_user_data(username)
+        user_data = await AsyncUserOperations.get_user_data(username)
         if user_data:
             return {"success": True, "data": user_data}
         else:
@@ -56,16 +55,13 @@ async def update_user_endpoint(
     try:
         updates = {}
         if user_data.display_name is not None:
-            updates['display_name'] = {'S': user_data.display_name}
+            updates['display_name'] = user_data.display_name
         if user_data.email is not None:
-            updates['email'] = {'S': user_data.email.lower()}
+            updates['email'] = user_data.email.lower()
         if user_data.group_id is not None:
-            updates['group_id'] = {'S': user_data.group_id}
+            updates['group_id'] = user_data.group_id
             
-        success = UserOperations.update_user_data(username, updates)
-        
-        # Invalidate cache to force refresh
-        cache_manager.invalidate_all(CacheType.USERS)
+        success = await AsyncUserOperations.update_user_data(username, updates)
         
         return {"success": success, "message": "User updated successfully"}
     except Exception as error:
@@ -79,15 +75,14 @@ async def get_user_data_endpoint(
 ):
     """Get user data"""
     try:
-        # Check cache first for user data
-        cached_users = cache_manager.get(CacheType.USERS)
+        # Check the cached users' username index first
+        cached_users = await cache_manager.lookup(CacheType.USERS, 'username', username)
         if cached_users:
-            user_data = cached_users.get('data', {}).get(username)
-            if user_data:
-                return {"success": True, "data": user_data}
+            # The cached copy only gains accumulated XP once it is flushed
+            return {"success": True, "data": xp_accumulator.overlay_user(cached_users[0])}
         
         # Fallback to database
-        user_data = UserOperations.get_user_data(username)
+        user_data = await AsyncUserOperations.get_user_data(username)
         if user_data:
             return {"success": True, "data": user_data}
         else:
@@ -104,17 +99,10 @@ async def update_user_data_endpoint(
 ):
     """Update user data"""
     try:
-        # Build update expression dynamically
-        updates = {}
-        
-        for key, value in user_data.items():
-            if key != 'username':  # Don't update username
-                updates[key] = {'S': str(value)} if isinstance(value, str) else {'N': str(value)}
+        # Don't update username
+        updates = {key: value for key, value in user_data.items() if key != 'username'}
         
-        success = UserOperations.update_user_data(username, updates)
-        
-        # Invalidate cache to force refresh
-        cache_manager.invalidate_all(CacheType.USERS)
+        success = await AsyncUserOperations.update_user_data(username, updates)
         
         return {"success": success}
     except Exception as error:
@@ -136,10 +124,7 @@ async def create_user_with_username_endpoint(
         if DEBUG_MODE:
             print(f"[DEBUG] Creating user with username: {username}, email: {email}, display_name: {display_name}, university: {university}")
         
-        result = UserOperations.create_user_with_username(username, email, display_name, university)
-        
-        # Invalidate cache to force refresh
-        cache_manager.invalidate_all(CacheType.USERS)
+        result = await AsyncUserOperations.create_user_with_username(username, email, display_name, university)
         
         return {"success": True, "data": result}
     except Exception as error:
@@ -161,10 +146,7 @@ async def award_xp_endpoint(
         if not username or xp_amount <= 0:
             return {"success": False, "error": "Username and positive XP amount required"}
         
-        success = UserOperations.award_xp(username, xp_amount)
-        
-        # Invalidate cache to force refresh
-        cache_manager.invalidate_all(CacheType.USERS)
+        success = await AsyncUserOperations.award_xp(username, xp_amount)
         
         return {"success": success, "message": f"Awarded {xp_amount} XP to {username}"}
     except Exception as error:
@@ -173,17 +155,14 @@ async def award_xp_endpoint(
 
 @router.get("/leaderboard")
 async def get_leaderboard_endpoint(
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
     api_key: str = Depends(verify_api_key)
 ):
-    """Get leaderboard data"""
+    """Get leaderboard data, ranked by total XP"""
     try:
-        # Check cache first for users data
-        cached_users = cache_manager.get(CacheType.USERS)
-        if cached_users:
-            return cached_users
-        
-        # Fallback to database
-        result = UserOperations.get_leaderboard()
+        # Served from the in-process ranked leaderboard
+        result = await AsyncUserOperations.get_leaderboard(limit, offset)
         return result
     except Exception as error:
         return {"success": False, "error": str(error)}
@@ -198,16 +177,13 @@ async def get_user_by_email_endpoint(
 ):
     """Get user data by email address"""
     try:
-        # Check cache first for users data
-        cached_users = cache_manager.get(CacheType.USERS)
-        if cached_users:
-            # Find user by email in cached data
-            for user in cached_users.get('data', []):
-                if user.get('email', '').lower() == email.lower():
-                    return {"success": True, "data": user}
+        # Check the cached users' email index first
+        cached_user = await cache_manager.get_user_by_email(email)
+        if cached_user:
+            return {"success": True, "data": xp_accumulator.overlay_user(cached_user)}
         
-        # Fallback to database
-        result = UserOperations.get_user_by_email(email)
+        # Fallback to database (email GSI)
+        result = await AsyncUserOperations.get_user_by_email(email)
         if result:
             if DEBUG_MODE:
                 print(f"[DEBUG] User found by email: {result}")
@@ -229,17 +205,13 @@ async def get_group_users_endpoint(
 ):
     """Get users in a specific group"""
     try:
-        # Check cache first for users data
-        cached_users = cache_manager.get(CacheType.USERS)
-        if cached_users:
-            group_users = [
-                user for user in cached_users.get('data', []) 
-                if user.get('group_id') == group_id
-            ]
+        # Check the cached users' group index first
+        group_users = await cache_manager.lookup(CacheType.USERS, 'group_id', group_id)
+        if group_users is not None:
             return {"success": True, "data": group_users}
         
         # Fallback to database
-        result = UserOperations.get_group_users(group_id)
+        result = await AsyncUserOperations.get_group_users(group_id)
         return result
     except Exception as error:
         return {"success": False, "error": str(error)}
\ No newline at end of file
@@ -0,0 +1,217 @@
+"""
+Background job scheduler running on the server's event loop
+
+Jobs fire on an interval or a cron expression (UTC), optionally jittered so
+workers started together don't all hit DynamoDB in the same second. A job
+that is still running when it comes due again is skipped rather than
+overlapped. Synchronous jobs run in a worker thread. Each job records its
+runs, failures, last duration and last success for /scheduler/stats.
+"""
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional, Set
+
+from logger import debug, warning
+
+# Longest single sleep, so a wall-clock change delays a job by at most this much
+MAX_SLEEP_SECONDS = 60
+
+
+class IntervalTrigger:
+    """Every `seconds`, plus up to `jitter` seconds"""
+    
+    def __init__(self, seconds: float, jitter: float = 0.0):
+        if seconds <= 0:
+            raise ValueError("Interval must be positive")
+        self.seconds = seconds
+        self.jitter = jitter
+    
+    def next_run(self, after: float) -> float:
+        return after + self.seconds + random.uniform(0, self.jitter)
+    
+    def __str__(self) -> str:
+        return f"every {self.seconds}s"
+
+
+def _parse_cron_field(field: str, low: int, high: int) -> Set[int]:
+    """Values matched by one cron field: *, */n, a, a-b, a-b/n and comma-separated lists of those"""
+    values: Set[int] = set()
+    for part in field.split(','):
+        expression, _, step = part.partition('/')
+        if expression == '*':
+            start, end = low, high
+        elif '-' in expression:
+            start, end = (int(bound) for bound in expression.split('-', 1))
+        else:
+            start = end = int(expression)
+        if not low <= start <= end <= high:
+            raise ValueError(f"Cron field '{field}' is outside {low}-{high}")
+        values.update(range(start, end + 1, int(step) if step else 1))
+    return values
+
+
+class CronTrigger:
+    """A five-field cron expression (minute hour day month weekday) in UTC, plus up to `jitter` seconds"""
+    
+    def __init__(self, expression: str, jitter: float = 0.0):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression '{expression}' needs 5 fields")
+        self.expression = expression
+        self.jitter = jitter
+        self.minutes = _parse_cron_field(fields[0], 0, 59)
+        self.hours = _parse_cron_field(fields[1], 0, 23)
+        self.days = _parse_cron_field(fields[2], 1, 31)
+        self.months = _parse_cron_field(fields[3], 1, 12)
+        # 0 and 7 are both Sunday
+        self.weekdays = {weekday % 7 for weekday in _parse_cron_field(fields[4], 0, 7)}
+        # As in cron, a restricted day and weekday match either one
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+    
+    def _day_matches(self, moment: datetime) -> bool:
+        if moment.month not in self.months:
+            return False
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day and weekday
+        return day or weekday
+    
+    def next_run(self, after: float) -> float:
+        moment = datetime.fromtimestamp(after, tz=timezone.utc).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if not self._day_matches(moment):
+                moment = (moment + timedelta(days=1)).replace(hour=0, minute=0)
+            elif moment.hour not in self.hours:
+                moment = (moment + timedelta(hours=1)).replace(minute=0)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment.timestamp() + random.uniform(0, self.jitter)
+        raise ValueError(f"Cron expression '{self.expression}' never fires")
+    
+    def __str__(self) -> str:
+        return f"cron '{self.expression}' UTC"
+
+
+@dataclass
+class Job:
+    name: str
+    func: Callable[[], Any]
+    trigger: Any  # IntervalTrigger or CronTrigger
+    next_run: float
+    running: bool = False
+    runs: int = 0
+    failures: int = 0
+    skipped: int = 0  # Times it came due while the previous run was still going
+    last_started: Optional[float] = None
+    last_duration: Optional[float] = None
+    last_success: Optional[float] = None
+    last_error: Optional[str] = None
+    
+    def to_dict(self) -> Dict:
+        return {
+            "trigger": str(self.trigger),
+            "running": self.running,
+            "next_run": self.next_run,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "last_started": self.last_started,
+            "last_duration": self.last_duration,
+            "last_success": self.last_success,
+            "last_error": self.last_error,
+        }
+
+
+class Scheduler:
+    """Runs registered jobs on the event loop when they are due, one run per job at a time"""
+    
+    def __init__(self):
+        self._jobs: Dict[str, Job] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+        self._wake: Optional[asyncio.Event] = None
+    
+    def add_job(self, name: str, func: Callable[[], Any], trigger: Any, run_now: bool = False) -> Job:
+        """Register func (sync or async) under a unique name; run_now also runs it as soon as the scheduler starts"""
+        if name in self._jobs:
+            raise ValueError(f"Job '{name}' is already scheduled")
+        job = Job(name=name, func=func, trigger=trigger, next_run=time.time() if run_now else trigger.next_run(time.time()))
+        self._jobs[name] = job
+        if self._wake is not None:
+            self._wake.set()
+        return job
+    
+    def start(self) -> None:
+        """Start dispatching jobs on the running event loop"""
+        if self._task is not None:
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._dispatch())
+    
+    async def stop(self) -> None:
+        """Stop dispatching and cancel runs in progress (threads finish their current call)"""
+        tasks = [self._task, *self._running] if self._task else list(self._running)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+    
+    async def _dispatch(self) -> None:
+        while True:
+            self._wake.clear()
+            now = time.time()
+            for job in self._jobs.values():
+                if job.next_run > now:
+                    continue
+                job.next_run = job.trigger.next_run(now)
+                if job.running:
+                    job.skipped += 1
+                    debug(f"[SCHEDULER] Skipped {job.name}: previous run still going")
+                    continue
+                job.running = True
+                task = asyncio.create_task(self._execute(job))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+            
+            delay = min([job.next_run for job in self._jobs.values()], default=now + MAX_SLEEP_SECONDS) - time.time()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=min(max(delay, 0), MAX_SLEEP_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+    
+    async def _execute(self, job: Job) -> None:
+        job.last_started = time.time()
+        started = time.perf_counter()
+        try:
+            if asyncio.iscoroutinefunction(job.func):
+                await job.func()
+            else:
+                await asyncio.to_thread(job.func)
+            job.last_success = time.time()
+            job.last_error = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as job_error:
+            job.failures += 1
+            job.last_error = str(job_error)
+            warning(f"[SCHEDULER] {job.name} failed: {job_error}")
+        finally:
+            job.runs += 1
+            job.last_duration = time.perf_counter() - started
+            job.running = False
+    
+    def stats(self) -> Dict[str, Dict]:
+        """Per-job counters and timings for monitoring"""
+        return {name: job.to_dict() for name, job in self._jobs.items()}
+
+
+# Global scheduler instance
+scheduler = Scheduler()
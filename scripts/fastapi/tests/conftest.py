@@ -0,0 +1,19 @@
+"""
+Shared pytest setup
+
+Run from scripts/fastapi:  python -m pytest tests
+The server modules import each other by bare name, so their directory goes on
+the path, and table names are set before aws reads them at import time.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("USERS_TABLE", "test-users")
+os.environ.setdefault("DUELS_TABLE", "test-duels")
+os.environ.setdefault("GROUPS_TABLE", "test-groups")
+os.environ.setdefault("DAILY_TABLE", "test-daily")
+os.environ.setdefault("VERIFICATION_TABLE", "test-verification")
+os.environ.setdefault("AWS_REGION", "us-east-1")
@@ -0,0 +1,42 @@
+"""Shared cache tier backends"""
+
+import pytest
+
+from cache_backends import SQLiteBackend, SharedCacheBackend
+
+
+@pytest.fixture
+def backend(tmp_path):
+    sqlite = SQLiteBackend(path=str(tmp_path / "cache.sqlite3"), poll_interval=0.01)
+    yield sqlite
+    sqlite.close()
+
+
+def test_incomplete_backend_fails_when_constructed():
+    class GetOnly(SharedCacheBackend):
+        def get(self, key):
+            return None
+    
+    with pytest.raises(TypeError):
+        GetOnly()
+
+
+def test_entries_round_trip_and_delete_by_prefix(backend):
+    backend.set("users", {"data": [1]}, 100.0, 60, 120)
+    backend.set("user_daily_data:alice", ["a"], 100.0, 60, 120)
+    backend.set("user_daily_data:bob", ["b"], 100.0, 60, 120)
+    assert backend.get("users") == ({"data": [1]}, 100.0, 60)
+    backend.delete_all("user_daily_data")
+    assert backend.get("user_daily_data:alice") is None and backend.get("user_daily_data:bob") is None
+    backend.delete("users")
+    assert backend.get("users") is None
+
+
+def test_load_lock_is_exclusive_until_released(backend):
+    token = backend.acquire_lock("users", 30)
+    assert token is not None
+    assert backend.acquire_lock("users", 30) is None
+    backend.release_lock("users", "someone-else")
+    assert backend.acquire_lock("users", 30) is None
+    backend.release_lock("users", token)
+    assert backend.acquire_lock("users", 30) is not None
@@ -0,0 +1,127 @@
+"""LRU byte budgets and single-flight loading"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from aws import ItemWrite
+from cache_manager import CacheManager, CacheType, deep_sizeof
+
+
+@pytest.fixture
+def manager():
+    return CacheManager()
+
+
+def _value(tag: str) -> dict:
+    return {'user': tag, 'payload': 'x' * 200}
+
+
+def test_type_budget_evicts_least_recently_used(manager):
+    entry_size = deep_sizeof(_value('a'))
+    manager._cache_config[CacheType.USER_DAILY_DATA]["max_bytes"] = entry_size * 3
+    for tag in ('a', 'b', 'c'):
+        manager.set(CacheType.USER_DAILY_DATA, _value(tag), identifier=tag)
+    # Reading a makes b the least recently used
+    assert manager.get(CacheType.USER_DAILY_DATA, 'a') == _value('a')
+    manager.set(CacheType.USER_DAILY_DATA, _value('d'), identifier='d')
+    
+    assert manager.get(CacheType.USER_DAILY_DATA, 'b') is None
+    for tag in ('a', 'c', 'd'):
+        assert manager.get(CacheType.USER_DAILY_DATA, tag) == _value(tag)
+    assert manager._type_bytes[CacheType.USER_DAILY_DATA] == entry_size * 3
+    assert manager._evictions[CacheType.USER_DAILY_DATA] == 1
+
+
+def test_budgets_are_per_type(manager):
+    entry_size = deep_sizeof(_value('a'))
+    manager._cache_config[CacheType.USER_DAILY_DATA]["max_bytes"] = entry_size
+    manager.set(CacheType.BOUNTIES, _value('bounties'))
+    manager.set(CacheType.USER_DAILY_DATA, _value('a'), identifier='a')
+    manager.set(CacheType.USER_DAILY_DATA, _value('b'), identifier='b')
+    assert manager.get(CacheType.BOUNTIES) == _value('bounties')
+    assert manager.get(CacheType.USER_DAILY_DATA, 'a') is None
+
+
+def test_entry_over_the_budget_is_not_cached(manager):
+    manager._cache_config[CacheType.USER_DAILY_DATA]["max_bytes"] = 10
+    manager.set(CacheType.USER_DAILY_DATA, _value('a'), identifier='a')
+    assert manager.get(CacheType.USER_DAILY_DATA, 'a') is None
+    assert manager._type_bytes[CacheType.USER_DAILY_DATA] == 0
+
+
+def test_replacing_an_entry_releases_its_bytes(manager):
+    manager.set(CacheType.USER_DAILY_DATA, _value('a'), identifier='a')
+    manager.set(CacheType.USER_DAILY_DATA, {'user': 'a'}, identifier='a')
+    assert manager._type_bytes[CacheType.USER_DAILY_DATA] == deep_sizeof({'user': 'a'})
+
+
+def test_concurrent_misses_share_one_load(manager):
+    calls = []
+    release = threading.Event()
+    
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return {'success': True, 'data': ['problem']}
+    
+    async def scenario():
+        requests = [asyncio.ensure_future(manager.get_or_load(CacheType.USER_DAILY_DATA, 'alice', loader)) for _ in range(10)]
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*requests)
+    
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(result == {'success': True, 'data': ['problem']} for result in results)
+    assert manager._coalesced[CacheType.USER_DAILY_DATA] == 9
+    # The loaded value is cached for the next read
+    assert manager.get(CacheType.USER_DAILY_DATA, 'alice') == {'success': True, 'data': ['problem']}
+
+
+def test_failed_load_is_not_cached_and_is_retried(manager):
+    calls = []
+    
+    def loader():
+        calls.append(1)
+        return {'success': False, 'error': 'throttled'}
+    
+    async def scenario():
+        await manager.get_or_load(CacheType.USER_DAILY_DATA, 'alice', loader)
+        return await manager.get_or_load(CacheType.USER_DAILY_DATA, 'alice', loader)
+    
+    assert asyncio.run(scenario()) == {'success': False, 'error': 'throttled'}
+    assert len(calls) == 2
+    assert manager._load_errors[CacheType.USER_DAILY_DATA] == 2
+
+
+def test_stale_entry_is_served_while_one_reload_runs(manager):
+    manager.set(CacheType.USER_DAILY_DATA, 'old', identifier='alice', ttl=1)
+    manager._cache['user_daily_data:alice'].timestamp = time.time() - 2
+    
+    async def scenario():
+        first = await manager.get_or_load(CacheType.USER_DAILY_DATA, 'alice', lambda: 'new', ttl=1)
+        await asyncio.gather(*manager._loading.values())
+        return first, await manager.get_or_load(CacheType.USER_DAILY_DATA, 'alice', lambda: 'newer', ttl=1)
+    
+    assert asyncio.run(scenario()) == ('old', 'new')
+    assert manager._stale_hits[CacheType.USER_DAILY_DATA] == 1
+
+
+def test_patches_replace_items_instead_of_modifying_them(manager):
+    alice, bob = {'username': 'alice', 'xp': 10}, {'username': 'bob', 'xp': 5}
+    manager.set(CacheType.USERS, {'success': True, 'data': [alice, bob]})
+    served = manager.get(CacheType.USERS)
+    
+    assert manager._patch_item(CacheType.USERS, 'username', ItemWrite('users', 'alice', increments={'xp': 5}))
+    assert manager._patch_item(CacheType.USERS, 'username', ItemWrite('users', 'bob', deleted=True))
+    assert manager._patch_item(CacheType.USERS, 'username', ItemWrite('users', 'carol', {'username': 'carol'}, complete=True))
+    
+    # What a route was already handed is left as it was
+    assert served['data'] == [{'username': 'alice', 'xp': 10}, {'username': 'bob', 'xp': 5}]
+    assert manager.get(CacheType.USERS)['data'] == [{'username': 'alice', 'xp': 15}, {'username': 'carol'}]
+    assert asyncio.run(manager.lookup(CacheType.USERS, 'username', 'ALICE', load=False)) == [{'username': 'alice', 'xp': 15}]
+    assert asyncio.run(manager.lookup(CacheType.USERS, 'username', 'bob', load=False)) == []
+    assert manager._type_bytes[CacheType.USERS] == manager._cache['users'].size
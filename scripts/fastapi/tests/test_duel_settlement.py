@@ -0,0 +1,118 @@
+"""Settlement transactions: cancellation reasons decide between skipping, retrying and failing"""
+
+import pytest
+from botocore.exceptions import BotoCoreError, ClientError
+
+import aws
+from aws import DuelOperations, MAX_SETTLEMENT_ATTEMPTS
+
+
+def _cancelled(*codes) -> ClientError:
+    return ClientError({
+        'Error': {'Code': 'TransactionCanceledException', 'Message': 'Transaction cancelled'},
+        'CancellationReasons': [{'Code': code} for code in codes],
+    }, 'TransactWriteItems')
+
+
+class TransactionClient:
+    """Stands in for the DynamoDB client: raises the queued errors, then succeeds"""
+    
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.requests = []
+    
+    def transact_write_items(self, **request):
+        self.requests.append(request)
+        if self.errors:
+            raise self.errors.pop(0)
+        return {}
+
+
+@pytest.fixture
+def settlement(monkeypatch):
+    monkeypatch.setattr(aws, 'DUELS_TABLE', 'test-duels')
+    monkeypatch.setattr(aws, 'USERS_TABLE', 'test-users')
+    monkeypatch.setattr(aws.time, 'sleep', lambda seconds: None)
+    return {'duel_id': 'duel-1', 'fields': {'winner': 'alice'}, 'xp': {'alice': 50, 'Bob': 25}}
+
+
+def _use(monkeypatch, *errors) -> TransactionClient:
+    client = TransactionClient(errors)
+    monkeypatch.setattr(aws, 'ddb', client)
+    return client
+
+
+def test_commit_builds_guarded_duel_update_and_merged_xp(monkeypatch, settlement):
+    client = _use(monkeypatch)
+    second = {'duel_id': 'duel-2', 'fields': {}, 'xp': {'alice': 25, 'carol': 0}}
+    assert DuelOperations._commit_settlements([settlement, second]) is True
+    actions = client.requests[0]['TransactItems']
+    assert [action['Update'].get('ConditionExpression') for action in actions[:2]] == ['#status <> :completedStatus'] * 2
+    awards = {action['Update']['Key']['username']['S']: action['Update']['ExpressionAttributeValues'][':xp']['N'] for action in actions[2:]}
+    assert awards == {'alice': '75', 'bob': '25'}
+
+
+def test_already_settled_duel_is_skipped(monkeypatch, settlement):
+    client = _use(monkeypatch, _cancelled('ConditionalCheckFailed', 'None', 'None'))
+    assert DuelOperations._commit_settlements([settlement]) is False
+    assert len(client.requests) == 1
+
+
+def test_conflict_is_retried(monkeypatch, settlement):
+    client = _use(monkeypatch, _cancelled('None', 'TransactionConflict', 'None'))
+    assert DuelOperations._commit_settlements([settlement]) is True
+    assert len(client.requests) == 2
+
+
+def test_throttling_is_retried(monkeypatch, settlement):
+    throttled = ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'TransactWriteItems')
+    client = _use(monkeypatch, throttled, _cancelled('ThrottlingError', 'None', 'None'))
+    assert DuelOperations._commit_settlements([settlement]) is True
+    assert len(client.requests) == 3
+
+
+def test_conflict_that_persists_raises(monkeypatch, settlement):
+    client = _use(monkeypatch, *[_cancelled('None', 'TransactionConflict', 'None')] * MAX_SETTLEMENT_ATTEMPTS)
+    with pytest.raises(ClientError):
+        DuelOperations._commit_settlements([settlement])
+    assert len(client.requests) == MAX_SETTLEMENT_ATTEMPTS
+
+
+def test_failed_xp_condition_is_not_mistaken_for_a_settled_duel(monkeypatch, settlement):
+    _use(monkeypatch, _cancelled('None', 'ConditionalCheckFailed', 'None'))
+    with pytest.raises(ClientError):
+        DuelOperations._commit_settlements([settlement])
+
+
+def test_validation_error_raises(monkeypatch, settlement):
+    _use(monkeypatch, _cancelled('ValidationError', 'None', 'None'))
+    with pytest.raises(ClientError):
+        DuelOperations._commit_settlements([settlement])
+
+
+def test_settle_duels_reports_only_the_duels_it_settled(monkeypatch, settlement):
+    _use(monkeypatch, _cancelled('ConditionalCheckFailed', 'None', 'None'))
+    monkeypatch.setattr(aws, 'notify_write', lambda write: None)
+    monkeypatch.setattr(aws.leaderboard, 'add_xp', lambda username, amount: None)
+    assert DuelOperations.settle_duels([settlement]) == []
+    _use(monkeypatch)
+    assert DuelOperations.settle_duels([settlement]) == ['duel-1']
+
+
+@pytest.mark.parametrize("code, reasons, expected", [
+    ('TransactionCanceledException', ['None', 'TransactionConflict'], True),
+    ('TransactionCanceledException', ['ThrottlingError'], True),
+    ('TransactionCanceledException', ['ValidationError'], False),
+    ('ProvisionedThroughputExceededException', [], True),
+    ('InternalServerError', [], True),
+    ('ValidationException', [], False),
+    ('IdempotentParameterMismatchException', [], False),
+])
+def test_transaction_retryable(code, reasons, expected):
+    failure = ClientError({'Error': {'Code': code}, 'CancellationReasons': [{'Code': reason} for reason in reasons]}, 'TransactWriteItems')
+    assert aws.transaction_retryable(failure) is expected
+
+
+def test_transport_errors_are_retryable_and_bugs_are_not():
+    assert aws.transaction_retryable(BotoCoreError()) is True
+    assert aws.transaction_retryable(TypeError('bad increment')) is False
@@ -0,0 +1,76 @@
+"""Round trips through the DynamoDB attribute value codec"""
+
+from decimal import Decimal
+
+import pytest
+
+from dynamodb_codec import deserialize_item, deserialize_value, serialize_item, serialize_value
+
+
+def test_round_trip_preserves_plain_values():
+    item = {
+        'username': 'alice',
+        'xp': 1250,
+        'ratio': 0.75,
+        'active': True,
+        'group_id': None,
+        'solved': ['two-sum', 'lru-cache'],
+        'stats': {'easy': 3, 'medium': 2, 'hard': 0},
+    }
+    assert deserialize_item(serialize_item(item)) == item
+
+
+@pytest.mark.parametrize("text, expected", [('-5', -5), ('-0.25', -0.25), ('0', 0), ('-1E+3', -1000)])
+def test_negative_and_zero_numbers(text, expected):
+    assert deserialize_item({'n': {'N': text}}) == {'n': expected}
+    assert deserialize_value({'N': text}) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    (Decimal('1E+3'), 1000),
+    (Decimal('5.0'), 5),
+    (Decimal('1.5E-2'), 0.015),
+    (Decimal('-2.50'), -2.5),
+])
+def test_decimal_exponents(value, expected):
+    result = deserialize_value(serialize_value(value))
+    assert result == expected
+    assert type(result) is type(expected)
+
+
+def test_large_integers_stay_exact():
+    assert deserialize_value(serialize_value(2 ** 63 + 1)) == 2 ** 63 + 1
+
+
+def test_sets():
+    assert sorted(deserialize_value(serialize_value({'b', 'a'}))) == ['a', 'b']
+    assert sorted(deserialize_value(serialize_value({3, -1, 2.5}))) == [-1, 2.5, 3]
+    assert deserialize_value(serialize_value({b'\x00'})) == [b'\x00']
+
+
+def test_empty_set_is_rejected():
+    with pytest.raises(ValueError):
+        serialize_value(set())
+
+
+def test_null():
+    assert serialize_value(None) == {'NULL': True}
+    assert deserialize_item({'group_id': {'NULL': True}}) == {'group_id': None}
+
+
+def test_non_finite_floats_are_rejected():
+    with pytest.raises(ValueError):
+        serialize_value(float('nan'))
+
+
+def test_uniform_map_fast_path_matches_general_path():
+    users = {f"user{index}": {'BOOL': index % 2 == 0} for index in range(64)}
+    numbers = {f"user{index}": {'N': str(-index)} for index in range(64)}
+    assert deserialize_value({'M': users}) == {key: value['BOOL'] for key, value in users.items()}
+    assert deserialize_value({'M': numbers}) == {key: -int(key[4:]) for key in numbers}
+
+
+def test_mixed_map_past_the_fast_path_threshold():
+    attributes = {f"key{index}": {'S': 'text'} for index in range(40)}
+    attributes['key39'] = {'N': '7'}
+    assert deserialize_value({'M': attributes})['key39'] == 7
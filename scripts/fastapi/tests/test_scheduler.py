@@ -0,0 +1,68 @@
+"""Cron parsing and trigger times"""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from scheduler import CronTrigger, IntervalTrigger, _parse_cron_field
+
+
+def _at(*fields) -> float:
+    return datetime(*fields, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.mark.parametrize("field, expected", [
+    ('*', set(range(0, 10))),
+    ('*/3', {0, 3, 6, 9}),
+    ('4', {4}),
+    ('2-5', {2, 3, 4, 5}),
+    ('1-9/4', {1, 5, 9}),
+    ('1,3,7-8', {1, 3, 7, 8}),
+])
+def test_parse_cron_field(field, expected):
+    assert _parse_cron_field(field, 0, 9) == expected
+
+
+@pytest.mark.parametrize("field", ['10', '5-2', '-1', 'x'])
+def test_parse_cron_field_rejects_out_of_range(field):
+    with pytest.raises(ValueError):
+        _parse_cron_field(field, 0, 9)
+
+
+def test_cron_needs_five_fields():
+    with pytest.raises(ValueError):
+        CronTrigger('0 0 * *')
+
+
+def test_daily_cron_fires_next_day_after_its_time():
+    trigger = CronTrigger('2 0 * * *')
+    assert trigger.next_run(_at(2026, 10, 17, 0, 1, 30)) == _at(2026, 10, 17, 0, 2)
+    assert trigger.next_run(_at(2026, 10, 17, 0, 2)) == _at(2026, 10, 18, 0, 2)
+
+
+def test_cron_crosses_month_and_year():
+    trigger = CronTrigger('30 12 1 * *')
+    assert trigger.next_run(_at(2026, 12, 15)) == _at(2027, 1, 1, 12, 30)
+
+
+def test_seven_is_sunday():
+    # 2026-10-17 is a Saturday
+    assert CronTrigger('0 9 * * 7').next_run(_at(2026, 10, 17)) == _at(2026, 10, 18, 9, 0)
+    assert CronTrigger('0 9 * * 0').next_run(_at(2026, 10, 17)) == _at(2026, 10, 18, 9, 0)
+
+
+def test_restricted_day_and_weekday_match_either():
+    # The 20th or any Monday, whichever comes first
+    assert CronTrigger('0 0 20 * 1').next_run(_at(2026, 10, 17)) == _at(2026, 10, 19)
+
+
+def test_cron_that_never_fires():
+    with pytest.raises(ValueError):
+        CronTrigger('0 0 31 2 *').next_run(_at(2026, 1, 1))
+
+
+def test_interval_trigger():
+    assert IntervalTrigger(30).next_run(100.0) == 130.0
+    assert 130.0 <= IntervalTrigger(30, jitter=3).next_run(100.0) <= 133.0
+    with pytest.raises(ValueError):
+        IntervalTrigger(0)
@@ -0,0 +1,52 @@
+"""Email lookups go through the email index and only scan when it is unavailable"""
+
+import pytest
+from botocore.exceptions import ClientError
+
+import aws
+from aws import UserOperations
+
+
+class EmailIndexClient:
+    """Stands in for the DynamoDB client: the index query raises error_code, or returns items"""
+    
+    def __init__(self, error_code=None, items=()):
+        self.error_code = error_code
+        self.items = list(items)
+        self.queries = 0
+    
+    def query(self, **request):
+        self.queries += 1
+        if self.error_code:
+            raise ClientError({'Error': {'Code': self.error_code}}, 'Query')
+        return {'Items': self.items}
+
+
+@pytest.fixture
+def scans(monkeypatch):
+    monkeypatch.setattr(aws, 'USERS_TABLE', 'test-users')
+    calls = []
+    monkeypatch.setattr(aws, 'scan_all', lambda *args, **kwargs: calls.append(kwargs) or [
+        {'username': {'S': 'alice'}, 'email': {'S': 'alice@example.com'}}
+    ])
+    return calls
+
+
+def test_index_hit_does_not_scan(monkeypatch, scans):
+    monkeypatch.setattr(aws, 'ddb', EmailIndexClient(items=[{'username': {'S': 'alice'}, 'email': {'S': 'alice@example.com'}}]))
+    assert UserOperations.get_user_by_email('Alice@example.com')['username'] == 'alice'
+    assert scans == []
+
+
+@pytest.mark.parametrize("code", ['ResourceNotFoundException', 'ValidationException'])
+def test_missing_index_falls_back_to_a_scan(monkeypatch, scans, code):
+    monkeypatch.setattr(aws, 'ddb', EmailIndexClient(code))
+    assert UserOperations.get_user_by_email('alice@example.com')['username'] == 'alice'
+    assert len(scans) == 1
+
+
+def test_throttled_index_raises_instead_of_scanning(monkeypatch, scans):
+    monkeypatch.setattr(aws, 'ddb', EmailIndexClient('ProvisionedThroughputExceededException'))
+    with pytest.raises(ClientError):
+        UserOperations.get_user_by_email('alice@example.com')
+    assert scans == []
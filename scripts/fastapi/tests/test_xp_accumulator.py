@@ -0,0 +1,96 @@
+"""XP batching: failed batches keep their token, rejected ones are dropped"""
+
+import pytest
+
+import xp_accumulator
+from xp_accumulator import XPAccumulator
+
+
+class Rejected(Exception):
+    pass
+
+
+class Flaky:
+    """Flush function that raises the queued errors, then records each write"""
+    
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = []
+        self.applied = []
+    
+    def __call__(self, increments, token):
+        self.calls.append((dict(increments), token))
+        if self.errors:
+            raise self.errors.pop(0)
+        self.applied.append(dict(increments))
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(xp_accumulator.time, 'sleep', lambda seconds: None)
+
+
+def _accumulator(flush, max_batch_size=25):
+    return XPAccumulator(flush, max_batch_size, lambda error: not isinstance(error, Rejected), enabled=True)
+
+
+def test_awards_to_a_user_are_merged_into_one_write():
+    flush = Flaky()
+    accumulator = _accumulator(flush)
+    accumulator.add('Alice', 10)
+    accumulator.add('alice', 5)
+    accumulator.add('bob', 1)
+    assert accumulator.flush() == 2
+    assert flush.applied == [{'alice': 15, 'bob': 1}]
+    assert accumulator.pending_xp('alice') == 0
+
+
+def test_failed_batch_is_retried_unchanged_before_new_awards():
+    flush = Flaky(*[TimeoutError()] * xp_accumulator.XP_FLUSH_ATTEMPTS)
+    accumulator = _accumulator(flush)
+    accumulator.add('alice', 10)
+    assert accumulator.flush() == 0
+    # Still counted on reads while it waits for the retry
+    assert accumulator.pending_xp('alice') == 10
+    assert accumulator.pending() == {'alice': 10}
+    
+    accumulator.add('alice', 5)
+    assert accumulator.flush() == 1
+    first_token = flush.calls[0][1]
+    assert all(token == first_token for _, token in flush.calls[:xp_accumulator.XP_FLUSH_ATTEMPTS + 1])
+    assert flush.applied == [{'alice': 10}, {'alice': 5}]
+    assert flush.calls[-1][1] != first_token
+    assert accumulator.pending_xp('alice') == 0
+    assert accumulator.stats()['failed_flushes'] == 1
+
+
+def test_rejected_batch_is_dropped_without_retrying():
+    flush = Flaky(Rejected())
+    accumulator = _accumulator(flush)
+    accumulator.add('alice', 10)
+    assert accumulator.flush() == 0
+    assert len(flush.calls) == 1
+    assert accumulator.pending_xp('alice') == 0
+    assert accumulator.stats()['dropped_xp'] == 10
+    assert accumulator.flush() == 0
+    assert len(flush.calls) == 1
+
+
+def test_batches_are_split_and_listeners_see_what_was_written():
+    flush = Flaky()
+    accumulator = _accumulator(flush, max_batch_size=2)
+    seen = []
+    accumulator.add_flush_listener(seen.append)
+    for username in ('a', 'b', 'c'):
+        accumulator.add(username, 1)
+    assert accumulator.flush() == 3
+    assert [len(increments) for increments in flush.applied] == [2, 1]
+    assert seen == [{'a': 1, 'b': 1, 'c': 1}]
+
+
+def test_overlay_adds_unwritten_xp():
+    accumulator = _accumulator(Flaky())
+    accumulator.add('alice', 7)
+    assert accumulator.overlay([{'username': 'alice', 'xp': 3}, {'username': 'bob'}]) == [
+        {'username': 'alice', 'xp': 10}, {'username': 'bob'}
+    ]
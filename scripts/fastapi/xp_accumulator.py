@@ -0,0 +1,218 @@
+"""
+Write-coalescing XP accumulator
+
+Merges XP awards per user in memory and writes them in batches every
+XP_FLUSH_INTERVAL seconds, so a burst of awards to the same users costs one
+write per user per window. Pending and in-flight deltas are exposed for
+overlaying onto reads, so leaderboards never lag behind an award.
+
+Each batch keeps one idempotency token until it is written: a batch whose
+write failed is retried unchanged on the next flush, so a write that timed
+out after landing is not applied twice. Batches DynamoDB rejects outright
+(e.g. a ValidationException) are dropped and logged instead of retried.
+"""
+
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from logger import debug, error, warning
+
+XP_ACCUMULATOR_ENABLED = os.getenv("XP_ACCUMULATOR_ENABLED", "false").lower() == "true"
+XP_FLUSH_INTERVAL = float(os.getenv("XP_FLUSH_INTERVAL", "2"))
+XP_MAX_PENDING_USERS = int(os.getenv("XP_MAX_PENDING_USERS", "500"))
+XP_FLUSH_ATTEMPTS = 3
+
+# (increments, idempotency token) - must apply every increment or raise
+FlushFunction = Callable[[Dict[str, int], str], None]
+# Whether a write that raised may succeed if sent again unchanged
+RetryableFunction = Callable[[Exception], bool]
+
+
+class XPAccumulator:
+    """Thread-safe per-user XP delta buffer with a background flusher"""
+    
+    def __init__(self, flush: FlushFunction, max_batch_size: int, retryable: RetryableFunction,
+                 enabled: bool = XP_ACCUMULATOR_ENABLED, interval: float = XP_FLUSH_INTERVAL,
+                 max_pending_users: int = XP_MAX_PENDING_USERS):
+        self.enabled = enabled
+        self._flush_function = flush
+        self._retryable = retryable
+        self._max_batch_size = max_batch_size
+        self._interval = interval
+        self._max_pending_users = max_pending_users
+        
+        self._pending: Dict[str, int] = {}
+        self._chunks: List[Tuple[Dict[str, int], str]] = []  # Handed to a flush and not yet written, with their tokens
+        self._in_flight: Dict[str, int] = {}  # Per-user totals of _chunks
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # One flush at a time
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[Dict[str, int]], None]] = []
+        
+        self.awards = 0
+        self.writes = 0
+        self.failed_flushes = 0
+        self.dropped_xp = 0
+    
+    def add(self, username: str, amount: int) -> None:
+        """Queue an XP increment; it is written on the next flush"""
+        with self._lock:
+            if self._stopped:
+                raise Exception("XP accumulator is stopped")
+            key = username.lower()
+            self._pending[key] = self._pending.get(key, 0) + amount
+            self.awards += 1
+            full = len(self._pending) >= self._max_pending_users
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._flush_worker, name="xp-flush", daemon=True)
+                self._thread.start()
+        if full:
+            self._wake.set()
+    
+    def pending_xp(self, username: str) -> int:
+        """XP awarded to a user that the table may not reflect yet"""
+        key = username.lower()
+        with self._lock:
+            return self._pending.get(key, 0) + self._in_flight.get(key, 0)
+    
+    def pending(self) -> Dict[str, int]:
+        """Copy of the XP not yet written, per user"""
+        with self._lock:
+            pending = dict(self._pending)
+            for username, amount in self._in_flight.items():
+                pending[username] = pending.get(username, 0) + amount
+            return pending
+    
+    def overlay_user(self, user: Dict) -> Dict:
+        """Copy of a user record with unflushed XP added"""
+        pending = self.pending_xp(user.get('username', ''))
+        if not pending:
+            return user
+        return {**user, 'xp': int(user.get('xp', 0)) + pending}
+    
+    def overlay(self, users: Iterable[Dict]) -> List[Dict]:
+        """Apply overlay_user to every record that has unflushed XP"""
+        with self._lock:
+            if not self._pending and not self._in_flight:
+                return list(users)
+        return [self.overlay_user(user) for user in users]
+    
+    @contextmanager
+    def paused(self) -> Iterator[None]:
+        """Hold off flushes (waiting out one in progress), so the table gains no XP until the block exits"""
+        with self._flush_lock:
+            yield
+    
+    def add_flush_listener(self, listener: Callable[[Dict[str, int]], None]) -> None:
+        """Call listener(increments) after every successful batch write"""
+        self._listeners.append(listener)
+    
+    def flush(self) -> int:
+        """Write everything pending now; failed batches are kept for the next flush. Returns users written"""
+        with self._flush_lock:
+            with self._lock:
+                items = list(self._pending.items())
+                self._pending = {}
+                for start in range(0, len(items), self._max_batch_size):
+                    chunk = dict(items[start:start + self._max_batch_size])
+                    self._chunks.append((chunk, str(uuid.uuid4())))
+                    for username, amount in chunk.items():
+                        self._in_flight[username] = self._in_flight.get(username, 0) + amount
+                # Batches left by a failed flush go first, with the increments and token they were sent with
+                chunks = list(self._chunks)
+            
+            written: Dict[str, int] = {}
+            for chunk, token in chunks:
+                try:
+                    if not self._write_chunk(chunk, token):
+                        self.failed_flushes += 1
+                        warning(f"[XP] Will retry XP for {len(chunk)} users after failed flush")
+                        continue
+                    for username, amount in chunk.items():
+                        written[username] = written.get(username, 0) + amount
+                except Exception as rejection:
+                    self.dropped_xp += sum(chunk.values())
+                    error(f"[XP] Dropped {sum(chunk.values())} XP for {len(chunk)} users, the write can never succeed: {rejection}")
+                self._release(token)
+            
+            if written:
+                for listener in self._listeners:
+                    try:
+                        listener(written)
+                    except Exception as listener_error:
+                        warning(f"[XP] Flush listener failed: {listener_error}")
+            return len(written)
+    
+    def _write_chunk(self, chunk: Dict[str, int], token: str) -> bool:
+        """Try a batch a few times; False if it may still succeed later, raises if it never will"""
+        # The same token on every retry lets DynamoDB drop a repeat of a write that already landed
+        # (it remembers tokens for 10 minutes)
+        for attempt in range(XP_FLUSH_ATTEMPTS):
+            try:
+                self._flush_function(chunk, token)
+                self.writes += len(chunk)
+                return True
+            except Exception as flush_error:
+                if not self._retryable(flush_error):
+                    raise
+                debug(f"[XP] Flush attempt {attempt + 1} failed: {flush_error}")
+                if attempt < XP_FLUSH_ATTEMPTS - 1:
+                    time.sleep(0.2 * 2 ** attempt)
+        return False
+    
+    def _release(self, token: str) -> None:
+        """Forget a batch that was written or dropped"""
+        with self._lock:
+            index = next(index for index, (_, chunk_token) in enumerate(self._chunks) if chunk_token == token)
+            chunk, _ = self._chunks.pop(index)
+            for username, amount in chunk.items():
+                remaining = self._in_flight[username] - amount
+                if remaining:
+                    self._in_flight[username] = remaining
+                else:
+                    del self._in_flight[username]
+    
+    def _flush_worker(self) -> None:
+        while not self._stopped:
+            self._wake.wait(self._interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as flush_error:
+                warning(f"[XP] Flush failed: {flush_error}")
+    
+    def stop(self) -> None:
+        """Stop the flusher and write whatever is still pending"""
+        with self._lock:
+            self._stopped = True
+            thread = self._thread
+        self._wake.set()
+        if thread:
+            thread.join(timeout=self._interval + 5)
+        self.flush()
+        
+        with self._lock:
+            if self._pending or self._in_flight:
+                unwritten = set(self._pending) | set(self._in_flight)
+                total = sum(self._pending.values()) + sum(self._in_flight.values())
+                warning(f"[XP] {total} XP for {len(unwritten)} users was not written")
+    
+    def stats(self) -> Dict[str, int]:
+        """Counters for monitoring"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "pending_users": len(self._pending),
+                "pending_xp": sum(self._pending.values()),
+                "unwritten_batches": len(self._chunks),
+                "awards": self.awards,
+                "writes": self.writes,
+                "failed_flushes": self.failed_flushes,
+                "dropped_xp": self.dropped_xp,
+            }
@@ -1478,9 +1478,10 @@ ipcMain.handle('clear-daily-problem-cache', async () => {
     const apiKey = process.env.YETCODE_API_KEY;
 
     const response = await axios.post(
-      `${fastApiUrl}/cache/clear`,
+      `${fastApiUrl}/cache/flush`,
       {},
       {
+        params: { cache_type: 'daily_problem' },
         headers: {
           Authorization: `Bearer ${apiKey}`,
           'Content-Type': 'application/json',